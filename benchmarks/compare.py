@@ -0,0 +1,56 @@
+from pathlib import Path
+import argparse
+import json
+
+CASE_KEYS = (
+    "bench",
+    "size",
+    "profile",
+    "rows",
+    "members",
+    "batch_size",
+    "max_length",
+    "threads",
+    "bucketing",
+    "executor",
+)
+
+
+def load_results(path: str | Path) -> dict[tuple, dict]:
+    results = json.loads(Path(path).read_text())["results"]
+    return {tuple(result.get(key) for key in CASE_KEYS): result for result in results}
+
+
+def compare(base_path: str | Path, head_path: str | Path, threshold: float = 0.05):
+    base, head = load_results(base_path), load_results(head_path)
+    regressions = 0
+    for case in sorted(base.keys() & head.keys(), key=str):
+        speedup = head[case]["rows_per_sec"] / base[case]["rows_per_sec"]
+        memory = head[case]["peak_rss_mb"] - base[case]["peak_rss_mb"]
+        flag = ""
+        if speedup < 1 - threshold:
+            flag, regressions = " <- slower", regressions + 1
+        label = ", ".join(
+            f"{key}={value}" for key, value in zip(CASE_KEYS, case) if value is not None
+        )
+        print(
+            f"{label} : {base[case]['rows_per_sec']:.1f} -> "
+            f"{head[case]['rows_per_sec']:.1f} rows/s ({speedup:.2f}x), "
+            f"peak RSS {memory:+.1f} MB{flag}"
+        )
+
+    unmatched = len(base.keys() ^ head.keys())
+    print(
+        f"{len(base.keys() & head.keys())} case(s) compared, {regressions} slower "
+        f"by more than {threshold:.0%}, {unmatched} without a counterpart"
+    )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.05)
+    args = parser.parse_args()
+    compare(args.base, args.head, args.threshold)
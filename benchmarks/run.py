@@ -0,0 +1,277 @@
+from src.jigsaw.config import ConfigurationManager
+from src.jigsaw.components.inference import ModelInferenceComponent
+from src.jigsaw.core import (
+    ClassificationMetric,
+    Directory,
+    ModelInferenceConfig,
+    ModelTrainingArtifact,
+    MultiModelTrainingArtifact,
+)
+from src.jigsaw.pipelines.inference import PredictorPipeline
+from .synthetic import make_comments
+from .tiny_models import build_tiny_checkpoint
+from datetime import datetime
+from pathlib import Path
+import transformers
+import subprocess
+import itertools
+import threading
+import tempfile
+import platform
+import argparse
+import resource
+import torch
+import json
+import time
+import yaml
+import os
+
+MB = 2**20
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+class PeakMemory:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self) -> "PeakMemory":
+        self.peak = rss_bytes()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True
+        ).strip() + (
+            "-dirty" if subprocess.call(["git", "diff", "--quiet", "HEAD"]) else ""
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_component(
+    checkpoint: Path, data, outdir: Path, batch_size: int, max_length: int, **params
+) -> dict:
+    rss_before = rss_bytes()
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        component = ModelInferenceComponent(
+            ModelInferenceConfig(
+                name="component",
+                type="text-classification",
+                outdir=outdir,
+                model_path=checkpoint,
+                train_path=checkpoint,
+                batch_size=batch_size,
+                max_length=max_length,
+                **params,
+            )
+        )
+        load_seconds = time.perf_counter() - start
+        rss_loaded = rss_bytes()
+        # Warm up allocator and kernels before the measured run
+        component.predict(data.iloc[: batch_size * 2])
+        metrics = component(data).metrics
+
+    return {
+        **metrics.model_dump(exclude={"trace_path"}),
+        "load_seconds": load_seconds,
+        "model_rss_mb": (rss_loaded - rss_before) / MB,
+        "peak_rss_mb": memory.peak / MB,
+    }
+
+
+def bench_pipeline(
+    checkpoints: dict[str, Path],
+    data,
+    workdir: Path,
+    batch_size: int,
+    max_length: int,
+    executor: str,
+) -> dict:
+    workdir.mkdir(parents=True, exist_ok=True)
+    config_path = workdir / "config.yaml"
+    config_path.write_text(
+        yaml.safe_dump(
+            {
+                "artifact-root": str(workdir / "artifact"),
+                "seed": 2345,
+                "inference-batch-size": batch_size,
+                "max-length": max_length,
+                "inference-executor": executor,
+                "models": {
+                    model_name: {"type": "text-classification", "model": str(path)}
+                    for model_name, path in checkpoints.items()
+                },
+            }
+        )
+    )
+    training_artifact = MultiModelTrainingArtifact(
+        outdir=Directory(path=workdir / "models"),
+        models={
+            model_name: ModelTrainingArtifact(
+                name=model_name,
+                model_path=str(path),
+                metrics=ClassificationMetric(roc_auc=0.0, accuracy=0.0),
+            )
+            for model_name, path in checkpoints.items()
+        },
+    )
+
+    rss_before = rss_bytes()
+    with PeakMemory() as memory:
+        pipeline = PredictorPipeline(
+            ConfigurationManager(str(config_path)), training_artifact
+        )
+        artifact = pipeline(data)
+
+    return {
+        "seconds": artifact.wall_seconds,
+        "rows_per_sec": len(data) / artifact.wall_seconds,
+        "load_seconds": artifact.load_seconds,
+        "overlap_efficiency": artifact.overlap_efficiency,
+        "member_metrics": {
+            model_name: model_artifact.metrics.model_dump(exclude={"trace_path"})
+            for model_name, model_artifact in artifact.models.items()
+        },
+        "rss_growth_mb": (memory.peak - rss_before) / MB,
+        "peak_rss_mb": memory.peak / MB,
+    }
+
+
+def main(args: argparse.Namespace):
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="jigsaw-bench-"))
+    checkpoints = {
+        size: build_tiny_checkpoint(workdir / "checkpoints" / size, size)
+        for size in args.sizes
+    }
+
+    results = []
+    for profile in args.profiles:
+        data = make_comments(
+            args.rows, profile, duplicate_fraction=args.duplicate_fraction
+        )
+        for size, batch_size, max_length, threads, bucketing in itertools.product(
+            args.sizes, args.batch_sizes, args.max_lengths, args.threads, [False, True]
+        ):
+            torch.set_num_threads(threads)
+            case = {
+                "bench": "component",
+                "size": size,
+                "profile": profile,
+                "rows": args.rows,
+                "batch_size": batch_size,
+                "max_length": max_length,
+                "threads": threads,
+                "bucketing": bucketing,
+            }
+            print(json.dumps(case))
+            results.append(
+                {
+                    **case,
+                    **bench_component(
+                        checkpoints[size],
+                        data,
+                        workdir / "out",
+                        batch_size,
+                        max_length,
+                        bucketing=bucketing,
+                    ),
+                }
+            )
+
+        if args.members:
+            members = {
+                f"member{idx}": checkpoints[args.sizes[idx % len(args.sizes)]]
+                for idx in range(args.members)
+            }
+            for executor, threads in itertools.product(args.executors, args.threads):
+                torch.set_num_threads(threads)
+                case = {
+                    "bench": "pipeline",
+                    "profile": profile,
+                    "rows": args.rows,
+                    "members": args.members,
+                    "batch_size": args.batch_sizes[0],
+                    "max_length": args.max_lengths[0],
+                    "threads": threads,
+                    "executor": executor,
+                }
+                print(json.dumps(case))
+                results.append(
+                    {
+                        **case,
+                        **bench_pipeline(
+                            members,
+                            data,
+                            workdir / f"pipeline-{executor}-{threads}",
+                            args.batch_sizes[0],
+                            args.max_lengths[0],
+                            executor,
+                        ),
+                    }
+                )
+
+    commit = git_commit()
+    output = Path(args.output or Path("benchmarks/results") / f"{commit[:12]}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "meta": {
+                    "commit": commit,
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "torch": torch.__version__,
+                    "transformers": transformers.__version__,
+                    "machine": platform.machine(),
+                    "cpu_count": os.cpu_count(),
+                    "args": vars(args),
+                },
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Wrote {len(results)} result(s) to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline inference benchmarks")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--profiles", nargs="+", default=["short", "mixed", "long"])
+    parser.add_argument("--duplicate-fraction", type=float, default=0.0)
+    parser.add_argument("--sizes", nargs="+", default=["tiny", "small"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[8, 32])
+    parser.add_argument("--max-lengths", nargs="+", type=int, default=[128, 256])
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, os.cpu_count()])
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument(
+        "--executors", nargs="+", default=["sequential", "thread", "process"]
+    )
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--output", default=None)
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+from src.jigsaw.constants import SCHEMA_DIR
+from src.jigsaw.utils.common import load_yaml
+import pandas as pd
+import numpy as np
+import os
+
+WORDS = (
+    "the mod removed this post because it breaks the rule about spam links "
+    "and self promotion please read the sidebar before posting again buy now "
+    "free crypto giveaway click here check out my channel legal advice does "
+    "not count as a lawyer you should talk to someone qualified about this"
+).split()
+RULES = [
+    "No Advertising: Spam, referral links, unsolicited advertising, and "
+    "promotional content are not allowed.",
+    "No legal advice: Do not offer or request legal advice.",
+]
+SUBREDDITS = ["legaladvice", "AskReddit", "soccerstreams", "personalfinance"]
+# Median words per comment and the spread of the log-normal around it
+LENGTH_PROFILES = {
+    "short": (12, 0.5),
+    "mixed": (40, 1.0),
+    "long": (160, 0.4),
+}
+
+
+def schema_columns(schema_path: str = os.path.join(SCHEMA_DIR, "competition.yaml")):
+    return load_yaml(schema_path).columns
+
+
+def sample_lengths(
+    n_rows: int, profile: str, rng: np.random.Generator, max_words: int = 512
+) -> np.ndarray:
+    median, sigma = LENGTH_PROFILES[profile]
+    lengths = rng.lognormal(np.log(median), sigma, n_rows)
+    return np.clip(lengths.round().astype(int), 1, max_words)
+
+
+def sample_texts(lengths: np.ndarray, rng: np.random.Generator) -> list[str]:
+    words = rng.choice(WORDS, size=int(lengths.sum()))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [
+        " ".join(words[start:stop]) for start, stop in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+def make_comments(
+    n_rows: int,
+    profile: str = "mixed",
+    duplicate_fraction: float = 0.0,
+    seed: int = 2345,
+) -> pd.DataFrame:
+    """Synthetic comments with the competition columns, bodies drawn from a
+    length profile and optionally a share of exact repeats"""
+    rng = np.random.default_rng(seed)
+    columns = schema_columns()
+
+    data = dict()
+    for column, dtype in columns.items():
+        if column == "row_id":
+            data[column] = np.arange(n_rows)
+        elif column == "rule":
+            data[column] = rng.choice(RULES, n_rows)
+        elif column == "subreddit":
+            data[column] = rng.choice(SUBREDDITS, n_rows)
+        elif column == "body":
+            data[column] = sample_texts(sample_lengths(n_rows, profile, rng), rng)
+        elif dtype == "int64":
+            data[column] = rng.integers(0, 2, n_rows)
+        else:
+            data[column] = sample_texts(sample_lengths(n_rows, "short", rng), rng)
+    data = pd.DataFrame(data)[list(columns)]
+
+    n_repeats = int(n_rows * duplicate_fraction)
+    if n_repeats:
+        repeats = rng.choice(n_rows, n_repeats, replace=False)
+        sources = rng.choice(n_rows, n_repeats)
+        data.loc[repeats, ["rule", "body"]] = data.loc[
+            sources, ["rule", "body"]
+        ].to_numpy()
+    return data
@@ -0,0 +1,54 @@
+from .synthetic import WORDS
+from transformers import (
+    BertTokenizerFast,
+    DebertaV2Config,
+    DebertaV2ForSequenceClassification,
+)
+from pathlib import Path
+import string
+import torch
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+SIZES = {
+    "tiny": {"hidden_size": 32, "num_hidden_layers": 2, "num_attention_heads": 2},
+    "small": {"hidden_size": 128, "num_hidden_layers": 4, "num_attention_heads": 4},
+    "base": {"hidden_size": 256, "num_hidden_layers": 6, "num_attention_heads": 4},
+}
+
+
+def build_tiny_checkpoint(
+    path: str | Path, size: str = "tiny", max_length: int = 512, seed: int = 2345
+) -> Path:
+    """Randomly initialised DeBERTa-v2 classifier with a word-level vocab
+    covering the synthetic comments, saved like a trained checkpoint"""
+    path = Path(path)
+    if (path / "config.json").exists():
+        return path
+    path.mkdir(parents=True, exist_ok=True)
+
+    vocab = list(
+        dict.fromkeys(
+            SPECIAL_TOKENS
+            + sorted(set(WORDS))
+            + list(string.ascii_lowercase + string.digits + string.punctuation)
+            + [f"##{char}" for char in string.ascii_lowercase + string.digits]
+        )
+    )
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    tokenizer = BertTokenizerFast(str(path / "vocab.txt"))
+
+    torch.manual_seed(seed)
+    params = SIZES[size]
+    model = DebertaV2ForSequenceClassification(
+        DebertaV2Config(
+            vocab_size=len(vocab),
+            intermediate_size=4 * params["hidden_size"],
+            max_position_embeddings=max_length,
+            num_labels=2,
+            pad_token_id=tokenizer.pad_token_id,
+            **params,
+        )
+    )
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
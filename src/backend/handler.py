@@ -1,9 +1,55 @@
+from src.jigsaw.config import ConfigurationManager
+from src.jigsaw.core import MultiModelTrainingArtifact
+from src.jigsaw.pipelines.inference import PredictorPipeline
+from src.jigsaw.pipelines.serving import ensemble_predictor, serve
+from src.jigsaw.utils.common import load_json
+import pandas as pd
+import argparse
 import json
-import torch
+import os
+
+PREDICTOR = None
+
+
+def load_pipeline() -> PredictorPipeline:
+    artifact = MultiModelTrainingArtifact(
+        **load_json(os.environ["JIGSAW_TRAINING_ARTIFACT"])
+    )
+    return PredictorPipeline(ConfigurationManager(), artifact)
 
 
 def lambda_handler(event, context):
+    global PREDICTOR
+    if PREDICTOR is None:
+        PREDICTOR = ensemble_predictor(load_pipeline())
+
+    payload = event.get("body", event)
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+
+    scores = PREDICTOR(pd.DataFrame([payload])).iloc[0]
     return {
         "statusCode": 200,
-        "body": json.dumps({"name": "rizin", "age": 2}),
+        "body": json.dumps({key: float(value) for key, value in scores.items()}),
     }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local micro-batching inference")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue-size", type=int, default=1024)
+    parser.add_argument("--timeout-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    serve(
+        load_pipeline(),
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue_size=args.max_queue_size,
+        timeout_ms=args.timeout_ms,
+    )
@@ -1,5 +1,5 @@
-from typing import Callable, Collection
-from pydantic import BaseModel, field_validator, model_validator
+from typing import Callable, Collection, Optional
+from pydantic import BaseModel, PrivateAttr, field_validator, model_validator
 import random
 from .augment_utils import (
     url_cleaner,
@@ -15,6 +15,7 @@ from .augment_utils import (
 # import nlpaug.augmenter.char as nac
 # import nlpaug.augmenter.word as naw
 import pandas as pd
+import numpy as np
 import inspect
 
 AUGMENT_DICT = {
@@ -56,9 +57,12 @@ class Augment(BaseModel):
         else:
             raise
 
-    def apply(self, row):
-        if random.random() < self.p:
-            if "row" in inspect.signature(self.augment).parameters:
+    def apply(self, row, rng: random.Random = random):
+        if rng.random() < self.p:
+            params = inspect.signature(self.augment).parameters
+            if "row" in params:
+                if "rng" in params:
+                    return self.augment(row, rng=rng)
                 return self.augment(row)
             text = self.augment(row["body"])
             if isinstance(text, list):
@@ -77,11 +81,13 @@ class Augmentor(BaseModel):
     resample: int = 1
     include_original: bool = True
     weight: float = 1
+    seed: Optional[int] = None
+    _rng: random.Random = PrivateAttr(default_factory=random.Random)
 
     @field_validator("augments", mode="before")
     @classmethod
     def get_augment(cls, augment_list: Collection[Collection]):
-        return [Augment(augment=aug_name, prob=prob) for aug_name, prob in augment_list]
+        return [Augment(augment=aug_name, p=prob) for aug_name, prob in augment_list]
 
     @field_validator("frac", mode="before")
     @classmethod
@@ -95,6 +101,25 @@ class Augmentor(BaseModel):
         self.weight /= self.resample
         return self
 
+    def model_post_init(self, __context):
+        # Own generator, so a seeded run draws the same views whatever else
+        # touches the global random state
+        self._rng = random.Random(self.seed)
+
+    def views(self, data: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+        """Views in blocks of ``len(data)`` rows: the originals first when
+        they're included, then one augmented copy of the frame per
+        ``resample``. ``owners`` holds each view's source row"""
+        views = [data] if self.include_original else []
+        for _ in range(self.resample):
+            temp = data.copy()
+            for aug in self.augments:
+                temp = temp.apply(aug.apply, axis=1, rng=self._rng)
+            views.append(temp[data.columns])
+
+        owners = np.tile(np.arange(len(data)), len(views))
+        return pd.concat(views, axis=0, ignore_index=True), owners
+
     def augment(self, data):
         augs = []
         if self.include_original:
@@ -103,7 +128,7 @@ class Augmentor(BaseModel):
         for _ in range(self.resample):
             temp = data.copy()
             for aug in self.augments:
-                temp = temp.apply(aug.apply, axis=1)
+                temp = temp.apply(aug.apply, axis=1, rng=self._rng)
 
             if self.is_tta and "weight" in data.columns:
                 temp["weight"] = self.weight
@@ -4,7 +4,6 @@ from .... import logger
 import random
 import itertools
 import pronouncing
-import numpy as np
 # import nlpaug.augmenter.word as naw
 # import nlpaug.model.word_stats as nmw
 
@@ -27,17 +26,17 @@ import numpy as np
 #         return row
 
 
-def sentence_jumbling(row):
-    text = np.array(re.split(r"(\.\s|\n)+", row.body))
-    np.random.shuffle(text)
+def sentence_jumbling(row, rng: random.Random = random):
+    text = re.split(r"(\.\s|\n)+", row.body)
+    rng.shuffle(text)
     row.body = ". ".join(text)
     return row
 
 
-def random_sentence(row):
-    text = np.array(re.split("\s+", row.body))
-    np.random.shuffle(text)
-    row.body += " ".join(text[: np.random.randint(5, 15)])
+def random_sentence(row, rng: random.Random = random):
+    text = re.split("\s+", row.body)
+    rng.shuffle(text)
+    row.body += " ".join(text[: rng.randint(5, 14)])
     return row
 
 
@@ -130,10 +129,10 @@ class RandomURL:
         return row
 
 
-def transileration(row):
+def transileration(row, rng: random.Random = random):
     text = re.split(r"\s+", row.body)
-    nwords = random.randint(min(3, len(text)), min(10, len(text)))
-    iwords = random.sample(list(range(len(text))), nwords)
+    nwords = rng.randint(min(3, len(text)), min(10, len(text)))
+    iwords = rng.sample(list(range(len(text))), nwords)
 
     for idx in iwords:
         if len(text[idx]) <= 10:
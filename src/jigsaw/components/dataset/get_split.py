@@ -2,8 +2,10 @@ import pandas as pd
 from ..data.transformation.triplet import triplet_dataset
 from ..data import get_data
 from ...utils.common import load_csv
-from .prompts import zero_shot_chat_prompt
+from ...constants.prompt import render_prompts
+from .packing import encode_completions, pack_examples, to_arrow_lists
 from datasets import Dataset
+import pyarrow as pa
 from ..data.augmentation import do_aug
 import os
 
@@ -64,21 +66,16 @@ def get_train_test_split(
     if config.get("do_aug", None):
         train_data = do_aug(train_data, config)
 
-    train_data["prompt"] = train_data.apply(
-        zero_shot_chat_prompt, args=(tokenizer,), axis=1
-    )
+    train_data["prompt"] = render_prompts(train_data, tokenizer)
     train_data["rule_violation"] = train_data["rule_violation"].map(
         {
             1: " Yes",
             0: " No",
         }
     )
-    train_data["prompt"] += train_data["rule_violation"]
 
     if valid_data is not None:
-        valid_data["prompt"] = valid_data.apply(
-            zero_shot_chat_prompt, args=(tokenizer,), axis=1
-        )
+        valid_data["prompt"] = render_prompts(valid_data, tokenizer)
         valid_data["rule_violation"] = valid_data["rule_violation"].map(
             {
                 1: " Yes",
@@ -87,8 +84,28 @@ def get_train_test_split(
         )
         valid_data["prompt"] += valid_data["rule_violation"]
 
-    train_data["input_ids"] = train_data["prompt"].apply(
-        lambda x: tokenizer(x, add_special_tokens=False, truncation=False)["input_ids"]
+    input_ids, labels, offsets = encode_completions(
+        tokenizer,
+        train_data["prompt"].tolist(),
+        train_data["rule_violation"].tolist(),
     )
+    if config.get("packing", False):
+        train_data = Dataset(
+            pack_examples(
+                input_ids,
+                labels,
+                offsets,
+                max_length=config.get("pack_length", 4096),
+                seed=config.get("seed", 1234),
+            )
+        )
+    else:
+        train_data["prompt"] += train_data["rule_violation"]
+        table = pa.Table.from_pandas(train_data, preserve_index=False)
+        train_data = Dataset(
+            table.append_column(
+                "input_ids", to_arrow_lists(input_ids, offsets)
+            ).append_column("labels", to_arrow_lists(labels, offsets))
+        )
 
     return train_data, valid_data
@@ -0,0 +1,188 @@
+from ..inference.tokenization import TokenizedPrompts
+from ... import logger
+from bisect import bisect_left, insort
+from typing import Literal
+import pyarrow as pa
+import numpy as np
+import torch
+
+IGNORE_INDEX = -100
+
+
+def encode_completions(
+    tokenizer,
+    prompts: list[str],
+    answers: list[str],
+    chunk_size: int = 4096,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Tokenizes prompts in batches and appends each row's answer tokens,
+    returning flat ``input_ids`` and ``labels`` with their row offsets. Only
+    the answer tokens carry loss, the prompt is context"""
+    prompt_tokens = TokenizedPrompts.encode(
+        tokenizer, prompts, chunk_size=chunk_size, add_special_tokens=False
+    )
+    # Answers take few distinct values, each is tokenized once
+    choices, answer_index = np.unique(
+        np.asarray(answers, dtype=object), return_inverse=True
+    )
+    answer_ids = [
+        np.asarray(
+            tokenizer(str(answer), add_special_tokens=False)["input_ids"],
+            dtype=np.int32,
+        )
+        for answer in choices
+    ]
+    answer_lengths = np.array([len(ids) for ids in answer_ids])[answer_index]
+
+    prompt_lengths = prompt_tokens.lengths
+    lengths = prompt_lengths + answer_lengths
+    offsets = np.zeros(len(prompts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # Position of every token within its row decides prompt or answer
+    row_starts = np.repeat(offsets[:-1], lengths)
+    positions = np.arange(offsets[-1]) - row_starts
+    is_prompt = positions < np.repeat(prompt_lengths, lengths)
+
+    input_ids = np.empty(offsets[-1], dtype=np.int32)
+    input_ids[is_prompt] = prompt_tokens.input_ids
+    for choice, ids in enumerate(answer_ids):
+        rows = np.repeat(answer_index == choice, lengths) & ~is_prompt
+        input_ids[rows] = np.tile(ids, int((answer_index == choice).sum()))
+
+    labels = np.where(is_prompt, IGNORE_INDEX, input_ids).astype(np.int32)
+    return input_ids, labels, offsets
+
+
+def to_arrow_lists(values: np.ndarray, offsets: np.ndarray) -> pa.LargeListArray:
+    # Zero-copy view of flat values split at the offsets
+    return pa.LargeListArray.from_arrays(pa.array(offsets), pa.array(values))
+
+
+def pack_sequences(
+    lengths: np.ndarray, max_length: int, seed: int = 0
+) -> list[np.ndarray]:
+    """Best-fit decreasing: each example, longest first, goes to the pack
+    with the least room that still fits it, so packs come out nearly full"""
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    packs: list[list[int]] = []
+    # (room left, pack index), kept sorted for the best-fit lookup
+    rooms: list[tuple[int, int]] = []
+    for idx in order:
+        length = int(lengths[idx])
+        position = bisect_left(rooms, (length, -1))
+        if position == len(rooms):
+            packs.append([idx])
+            room, pack = max_length - length, len(packs) - 1
+        else:
+            room, pack = rooms.pop(position)
+            packs[pack].append(idx)
+            room -= length
+        insort(rooms, (room, pack))
+
+    shuffled = np.random.default_rng(seed).permutation(len(packs))
+    return [np.array(packs[pack], dtype=np.int64) for pack in shuffled]
+
+
+def pack_examples(
+    input_ids: np.ndarray,
+    labels: np.ndarray,
+    offsets: np.ndarray,
+    max_length: int,
+    seed: int = 0,
+) -> pa.Table:
+    """Concatenates tokenized examples into sequences of at most
+    ``max_length`` tokens, positions restarting at every example"""
+    starts, stops = offsets[:-1], offsets[1:]
+    # Prompts are cut from the left, so the answer always survives
+    truncated = int((stops - starts > max_length).sum())
+    if truncated:
+        logger.warning(
+            f"{truncated} example(s) are longer than {max_length} tokens, "
+            "keeping their last tokens"
+        )
+        starts = np.maximum(starts, stops - max_length)
+    lengths = stops - starts
+
+    packs = pack_sequences(lengths, max_length, seed=seed)
+    order = np.concatenate(packs) if packs else np.zeros(0, dtype=np.int64)
+    ordered_lengths = lengths[order]
+    example_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(ordered_lengths, out=example_offsets[1:])
+    pack_offsets = example_offsets[np.cumsum([0] + [len(pack) for pack in packs])]
+
+    positions = np.arange(example_offsets[-1]) - np.repeat(
+        example_offsets[:-1], ordered_lengths
+    )
+    source = np.repeat(starts[order], ordered_lengths) + positions
+
+    logger.info(
+        f"Packed {len(lengths)} example(s) into {len(packs)} sequence(s) of up to "
+        f"{max_length} tokens, {lengths.sum() / max(len(packs) * max_length, 1):.2%} "
+        "filled"
+    )
+    return pa.table(
+        {
+            "input_ids": to_arrow_lists(input_ids[source], pack_offsets),
+            "labels": to_arrow_lists(labels[source], pack_offsets),
+            "position_ids": to_arrow_lists(positions.astype(np.int32), pack_offsets),
+        }
+    )
+
+
+class PackedCompletionCollator:
+    """Pads packed sequences and keeps their examples apart, either with a
+    block-diagonal causal mask or, for flash attention, with position resets
+    alone. Features without ``position_ids`` hold a single example"""
+
+    def __init__(
+        self,
+        pad_token_id: int,
+        attention: Literal["block-diagonal", "position-ids"] = "block-diagonal",
+        dtype: torch.dtype = torch.float32,
+    ):
+        self.pad_token_id = pad_token_id
+        self.attention = attention
+        self.dtype = dtype
+
+    def __call__(self, features: list[dict]) -> dict[str, torch.Tensor]:
+        width = max(len(feature["input_ids"]) for feature in features)
+        input_ids = torch.full((len(features), width), self.pad_token_id)
+        labels = torch.full((len(features), width), IGNORE_INDEX)
+        position_ids = torch.zeros((len(features), width), dtype=torch.long)
+        for row, feature in enumerate(features):
+            length = len(feature["input_ids"])
+            input_ids[row, :length] = torch.as_tensor(feature["input_ids"])
+            labels[row, :length] = torch.as_tensor(feature["labels"])
+            position_ids[row, :length] = (
+                torch.as_tensor(feature["position_ids"])
+                if "position_ids" in feature
+                else torch.arange(length)
+            )
+
+        batch = {
+            "input_ids": input_ids,
+            "labels": labels,
+            "position_ids": position_ids,
+        }
+        if self.attention == "position-ids":
+            return batch
+
+        # Example k of a row is segment k + 1, padding is segment 0
+        lengths = torch.tensor([len(feature["input_ids"]) for feature in features])
+        padding = torch.arange(width)[None] >= lengths[:, None]
+        segments = torch.cumsum(position_ids == 0, dim=1).masked_fill(padding, 0)
+        # Padding attends to itself alone, so no softmax row is left empty
+        # for half precision to turn into NaN
+        allowed = (
+            (segments[:, :, None] == segments[:, None, :])
+            & (segments[:, :, None] > 0)
+            & torch.ones(width, width, dtype=torch.bool).tril()
+        ) | torch.eye(width, dtype=torch.bool)
+        # Additive form, which every attention implementation accepts
+        batch["attention_mask"] = (
+            torch.zeros(allowed.shape, dtype=self.dtype)
+            .masked_fill(~allowed, torch.finfo(self.dtype).min)
+            .unsqueeze(1)
+        )
+        return batch
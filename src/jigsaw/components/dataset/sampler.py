@@ -0,0 +1,87 @@
+from ..inference.batching import length_bucketed_batches, padding_ratio
+from torch.utils.data import Sampler
+from typing import Iterator
+import numpy as np
+
+
+class LengthGroupedBatchSampler(Sampler[list[int]]):
+    """Shuffles rows into mega-batches of ``batch_size * mega_batch_mult``,
+    sorts each by length and cuts it into batches, so a batch pads to a
+    similar length while the order still changes every epoch"""
+
+    def __init__(
+        self,
+        lengths: np.ndarray,
+        batch_size: int,
+        max_tokens: int | None = None,
+        mega_batch_mult: int = 50,
+        seed: int = 0,
+        drop_last: bool = False,
+    ):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.mega_batch_mult = mega_batch_mult
+        self.seed = seed
+        self.drop_last = drop_last
+        self.epoch = 0
+        self.cached: tuple[int, list[np.ndarray]] | None = None
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def batches(self, epoch: int | None = None) -> list[np.ndarray]:
+        epoch = self.epoch if epoch is None else epoch
+        if self.cached is not None and self.cached[0] == epoch:
+            return self.cached[1]
+
+        rng = np.random.default_rng(self.seed + epoch)
+        order = rng.permutation(len(self.lengths))
+        mega_batch_size = self.batch_size * self.mega_batch_mult
+
+        batches = []
+        for start in range(0, len(order), mega_batch_size):
+            mega_batch = order[start : start + mega_batch_size]
+            batches.extend(
+                mega_batch[batch]
+                for batch in length_bucketed_batches(
+                    self.lengths[mega_batch], self.batch_size, self.max_tokens
+                )
+            )
+        if self.drop_last and self.max_tokens is None:
+            batches = [batch for batch in batches if len(batch) == self.batch_size]
+
+        # Batches are shuffled across mega-batches, the longest one leading so
+        # that running out of memory happens on the first step
+        batches = [batches[idx] for idx in rng.permutation(len(batches))]
+        if batches:
+            longest = max(
+                range(len(batches)), key=lambda idx: self.lengths[batches[idx]].max()
+            )
+            batches.insert(0, batches.pop(longest))
+
+        self.cached = (epoch, batches)
+        return batches
+
+    def random_batches(self, epoch: int | None = None) -> list[np.ndarray]:
+        """The batches a plain shuffled sampler would draw, for comparison"""
+        epoch = self.epoch if epoch is None else epoch
+        order = np.random.default_rng(self.seed + epoch).permutation(len(self.lengths))
+        return [
+            order[start : start + self.batch_size]
+            for start in range(0, len(order), self.batch_size)
+        ]
+
+    def padding_waste(self, epoch: int | None = None) -> tuple[float, float]:
+        """Share of padded tokens with random batches and with grouped ones"""
+        return (
+            padding_ratio(self.lengths, self.random_batches(epoch)),
+            padding_ratio(self.lengths, self.batches(epoch)),
+        )
+
+    def __iter__(self) -> Iterator[list[int]]:
+        for batch in self.batches():
+            yield batch.tolist()
+
+    def __len__(self) -> int:
+        return len(self.batches())
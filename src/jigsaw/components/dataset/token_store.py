@@ -0,0 +1,126 @@
+from ...core import Directory, FilePath
+from ... import logger
+from hashlib import blake2b
+from itertools import chain
+from pathlib import Path
+import numpy as np
+import shutil
+import torch
+import json
+import os
+
+TOKEN_FIELDS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def store_key(
+    tokenizer, prompts: list[str], max_length: int | None = None, **params
+) -> str:
+    """Hash of the tokenizer, its truncation and every prompt, so any change
+    to the data or the tokenization lands in a new store"""
+    digest = blake2b(digest_size=16)
+    digest.update(
+        json.dumps(
+            {
+                "tokenizer": tokenizer.name_or_path,
+                "max_length": max_length,
+                "n_rows": len(prompts),
+                **params,
+            },
+            sort_keys=True,
+            default=str,
+        ).encode()
+    )
+    for prompt in prompts:
+        digest.update(prompt.encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class TokenStore:
+    """Tokenizer output of a whole dataset, each field a flat int32 array on
+    disk sharing one offsets index, memory mapped rather than held as lists"""
+
+    def __init__(self, path: FilePath):
+        self.path = Path(str(path))
+        self.offsets = np.load(self.path / "offsets.npy")
+        # Copy-on-write maps give writable arrays, so the tensors built over
+        # them need no copy and raise no warning
+        self.fields = {
+            field: np.memmap(self.path / f"{field}.bin", dtype=np.int32, mode="c")
+            if self.offsets[-1]
+            else np.zeros(0, dtype=np.int32)
+            for field in json.loads((self.path / "fields.json").read_text())
+        }
+
+    @classmethod
+    def build(
+        cls,
+        tokenizer,
+        prompts: list[str],
+        cache_dir: Directory | FilePath,
+        max_length: int | None = None,
+        chunk_size: int = 4096,
+    ) -> "TokenStore":
+        path = Path(str(cache_dir)) / store_key(tokenizer, prompts, max_length)
+        if (path / "offsets.npy").exists():
+            logger.info(f"Reusing {len(prompts)} tokenized row(s) from {path}")
+            return cls(path)
+
+        # Written aside and renamed, so a store that exists is always complete
+        temp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        temp_path.mkdir(parents=True, exist_ok=True)
+        offsets = np.zeros(len(prompts) + 1, dtype=np.int64)
+        fields, files = None, dict()
+        try:
+            for idx in range(0, len(prompts), chunk_size):
+                encoded = tokenizer(
+                    prompts[idx : idx + chunk_size],
+                    truncation=max_length is not None,
+                    max_length=max_length,
+                )
+                if fields is None:
+                    fields = [field for field in TOKEN_FIELDS if field in encoded]
+                    files = {
+                        field: open(temp_path / f"{field}.bin", "wb")
+                        for field in fields
+                    }
+                lengths = np.fromiter(
+                    map(len, encoded["input_ids"]),
+                    dtype=np.int64,
+                    count=len(encoded["input_ids"]),
+                )
+                offsets[idx + 1 : idx + 1 + len(lengths)] = lengths
+                for field in fields:
+                    np.fromiter(
+                        chain.from_iterable(encoded[field]), dtype=np.int32
+                    ).tofile(files[field])
+        finally:
+            for file in files.values():
+                file.close()
+
+        np.cumsum(offsets, out=offsets)
+        np.save(temp_path / "offsets.npy", offsets)
+        (temp_path / "fields.json").write_text(json.dumps(fields or ["input_ids"]))
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # Another run wrote the same store first
+            shutil.rmtree(temp_path, ignore_errors=True)
+        logger.info(
+            f"Tokenized {len(prompts)} row(s) into {offsets[-1]} token(s) at {path}"
+        )
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def __getitem__(self, idx: int) -> dict[str, torch.Tensor]:
+        start, stop = self.offsets[idx], self.offsets[idx + 1]
+        return {
+            field: torch.from_numpy(values[start:stop])
+            for field, values in self.fields.items()
+        }
@@ -0,0 +1,119 @@
+from ..core import (
+    FilePath,
+    EnsembleConfig,
+    EnsembleArtifact,
+    MultiModelInferenceArtifact,
+)
+from ..errors import DataNotFoundError, ValidationError
+from ..utils.common import load_json
+from .. import logger
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+BLENDS = ("weighted", "rank", "geometric")
+# Keeps log() finite for members that saturate at 0
+EPS = 1e-7
+
+
+class EnsembleComponent:
+    def __init__(self, config: FilePath | EnsembleConfig):
+        if isinstance(config, FilePath):
+            config = EnsembleConfig(**load_json(config))
+
+        self.config = config
+
+    def __call__(self, artifact: MultiModelInferenceArtifact) -> EnsembleArtifact:
+        scores = self.load_scores(artifact)
+        n_rows = len(next(iter(scores.values())))
+        weights = np.array(
+            [self.config.weights.get(model_name, 1.0) for model_name in scores],
+            dtype=np.float64,
+        )
+        weights /= weights.sum()
+
+        # Ranks need the whole column, so each member is sorted once and
+        # searched chunk by chunk from disk
+        ranked = {
+            model_name: self.sort_scores(model_name, member_scores)
+            for model_name, member_scores in scores.items()
+        }
+        ids = self.iter_ids(artifact, n_rows)
+
+        submission_path = self.config.outdir / "submission.csv"
+        blend_path = self.config.outdir / "blends.csv"
+        for start in range(0, n_rows, self.config.chunksize):
+            stop = min(start + self.config.chunksize, n_rows)
+            # Blends accumulate one member column at a time, so only a chunk
+            # of a single member is in memory
+            blends = {method: np.zeros(stop - start) for method in BLENDS}
+            for weight, (model_name, member_scores) in zip(weights, scores.items()):
+                chunk = np.asarray(member_scores[start:stop], dtype=np.float64)
+                blends["weighted"] += weight * chunk
+                blends["rank"] += weight * rank_scores(ranked[model_name], chunk)
+                blends["geometric"] += weight * np.log(np.clip(chunk, EPS, 1.0))
+            blends["geometric"] = np.exp(blends["geometric"])
+
+            output = pd.DataFrame({self.config.id_column: next(ids), **blends})
+            header, mode = start == 0, "w" if start == 0 else "a"
+            output[[self.config.id_column, self.config.method]].rename(
+                columns={self.config.method: self.config.target_column}
+            ).to_csv(submission_path, index=False, header=header, mode=mode)
+            output.to_csv(blend_path, index=False, header=header, mode=mode)
+
+        logger.info(
+            f"Blended {len(scores)} member(s) over {n_rows} row(s), "
+            f"submission uses the {self.config.method} blend"
+        )
+        return EnsembleArtifact(
+            submission_file_path=submission_path,
+            blend_file_path=blend_path,
+            method=self.config.method,
+            n_rows=n_rows,
+        )
+
+    def load_scores(
+        self, artifact: MultiModelInferenceArtifact
+    ) -> dict[str, np.ndarray]:
+        scores = dict()
+        for model_name, model_artifact in artifact.models.items():
+            if model_artifact.score_file_path is None:
+                e = DataNotFoundError(model_name, "member has no score file")
+                logger.error(e)
+                raise e
+            scores[model_name] = np.load(model_artifact.score_file_path, mmap_mode="r")
+
+        if len({len(member_scores) for member_scores in scores.values()}) > 1:
+            e = ValidationError(
+                list(scores), "ensemble members scored a different number of rows"
+            )
+            logger.error(e)
+            raise e
+        return scores
+
+    def sort_scores(self, model_name: str, scores: np.ndarray) -> np.ndarray:
+        path = self.config.outdir / f"{model_name}.sorted.npy"
+        np.save(path, np.sort(scores))
+        return np.load(path, mmap_mode="r")
+
+    def iter_ids(
+        self, artifact: MultiModelInferenceArtifact, n_rows: int
+    ) -> Iterator[np.ndarray]:
+        prediction_file_path = next(iter(artifact.models.values())).prediction_file_path
+        if self.config.id_column in pd.read_csv(prediction_file_path, nrows=0):
+            for chunk in pd.read_csv(
+                prediction_file_path,
+                usecols=[self.config.id_column],
+                chunksize=self.config.chunksize,
+            ):
+                yield chunk[self.config.id_column].to_numpy()
+        else:
+            for start in range(0, n_rows, self.config.chunksize):
+                yield np.arange(start, min(start + self.config.chunksize, n_rows))
+
+
+def rank_scores(sorted_scores: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    # Mid-rank for ties, scaled to [0, 1]
+    lower = np.searchsorted(sorted_scores, scores, side="left")
+    upper = np.searchsorted(sorted_scores, scores, side="right")
+    return (lower + upper - 1) / (2 * max(len(sorted_scores) - 1, 1))
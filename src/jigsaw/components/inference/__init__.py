@@ -0,0 +1,470 @@
+from ...core import FilePath, ModelInferenceConfig, ModelInferenceArtifact
+from ...utils.common import load_json, save_csv, save_json, get_physical_cores
+from .batching import sequential_batches, length_bucketed_batches, padding_ratio
+from .tokenization import TokenizedPrompts
+from .quantization import load_quantized_model
+from .onnx_backend import export_onnx, OnnxSequenceClassifier
+from .cache import PredictionCache, model_fingerprint, prompt_hashes
+from .parallel import parallel_score, share_weights
+from .completion import PrefixCachedScorer, PREFIX_COLUMNS
+from .embedding import TripletScorer, TRIPLET_COLUMNS, check_columns
+from .profiling import StageTimer
+from .overlap import iter_prefetched
+from ..data.augmentation import Augmentor
+from ...errors import ConfigurationError
+from ... import logger
+from transformers import (
+    AutoModel,
+    AutoModelForCausalLM,
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+)
+from sklearn.metrics import roc_auc_score
+from torch.nn.functional import softmax
+from typing import Iterator
+import numpy as np
+import pandas as pd
+import torch
+import time
+
+
+def join_columns(data: pd.DataFrame, columns: list[str]) -> list[str]:
+    # agg over the rows of an empty frame gives back a frame, not a series
+    if not len(data):
+        return []
+    return data[columns].astype(str).agg("[SEP]".join, axis=1).tolist()
+
+
+def score_settings(config: ModelInferenceConfig) -> dict:
+    """Every setting a member's scores depend on besides the checkpoint"""
+    settings = {
+        "type": config.type,
+        "max_length": config.max_length,
+        "quantization": config.quantization,
+        "backend": config.backend,
+    }
+    if config.type == "completion":
+        settings["prompt"] = config.prompt
+    if config.type == "triplet":
+        settings["pooling"] = config.pooling
+    return settings
+
+
+def member_fingerprint(config: ModelInferenceConfig) -> str:
+    return model_fingerprint(config.train_path, **score_settings(config))
+
+
+class ModelInferenceComponent:
+    def __init__(self, config: FilePath | ModelInferenceConfig):
+        if isinstance(config, FilePath):
+            config = ModelInferenceConfig(**load_json(config))
+
+        self.config = config
+        if self.config.type in ("completion", "triplet"):
+            if self.config.quantization or self.config.backend != "torch":
+                e = ConfigurationError(
+                    self.config.name,
+                    f"{self.config.type} models only run on the 'torch' backend without quantization",
+                )
+                logger.error(e)
+                raise e
+
+            auto_model = (
+                AutoModelForCausalLM if self.config.type == "completion" else AutoModel
+            )
+            self.model = auto_model.from_pretrained(
+                str(self.config.train_path), device_map="auto", torch_dtype="auto"
+            ).eval()
+        elif self.config.backend == "onnx":
+            if self.config.quantization:
+                e = ConfigurationError(
+                    self.config.name,
+                    "quantization isn't supported by the 'onnx' backend",
+                )
+                logger.error(e)
+                raise e
+
+            self.model = OnnxSequenceClassifier(
+                export_onnx(self.config.train_path, atol=self.config.onnx_atol)
+            )
+        elif self.config.quantization:
+            self.model = load_quantized_model(
+                self.config.train_path, mode=self.config.quantization
+            )
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(
+                str(self.config.train_path), device_map="auto"
+            )
+        self.device = self.model.device
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.config.train_path))
+        self.timer = StageTimer(self.device, trace=self.config.profile)
+
+        self.prefix_scorer = None
+        if self.config.type == "completion":
+            self.prefix_scorer = PrefixCachedScorer(
+                self.model,
+                self.tokenizer,
+                prompt=self.config.prompt,
+                batch_size=self.config.batch_size or 1,
+                max_length=self.config.max_length,
+                timer=self.timer,
+            )
+
+        self.triplet_scorer = None
+        if self.config.type == "triplet":
+            # Rule examples are encoded once and kept next to the checkpoint,
+            # so later runs only encode examples they haven't seen
+            self.triplet_scorer = TripletScorer(
+                self.model,
+                self.tokenizer,
+                self.config.train_path,
+                pooling=self.config.pooling,
+                batch_size=self.config.batch_size or 1,
+                max_length=self.config.max_length,
+                timer=self.timer,
+            )
+
+        self.n_workers, self.n_threads = 1, None
+        if self.config.n_workers != 1:
+            if self.device.type == "cpu":
+                physical_cores = get_physical_cores()
+                self.n_workers = self.config.n_workers or physical_cores
+                self.n_threads = max(1, physical_cores // self.n_workers)
+                share_weights(self.model)
+            else:
+                logger.warning(
+                    f"{self.config.name} : n_workers is ignored on {self.device}"
+                )
+
+        self.augmentor = None
+        if self.config.tta:
+            self.augmentor = Augmentor(
+                augments=self.config.tta_augments,
+                is_tta=True,
+                resample=self.config.tta_views,
+                include_original=True,
+                seed=self.config.seed,
+            )
+
+        self.cache = None
+        if self.config.cache_dir:
+            self.cache = PredictionCache(
+                self.config.cache_dir / f"{self.config.name}.sqlite",
+                fingerprint=member_fingerprint(self.config),
+                capacity=self.config.cache_size,
+            )
+
+    def __call__(self, data: pd.DataFrame) -> ModelInferenceArtifact:
+        if self.config.quantization and self.config.compare_reference:
+            self.quantization_report(data)
+
+        self.timer.reset()
+        start = time.perf_counter()
+        with self.timer.profiler(self.device) as profiler:
+            predictions = self.predict(data).astype(np.float32)
+            with self.timer.stage("write"):
+                # The frame is shared with the other ensemble members, so the
+                # predictions go to a new frame instead of a new column
+                save_csv(
+                    data.assign(prediction=predictions),
+                    self.config.outdir / "prediction.csv",
+                )
+                np.save(self.config.outdir / "prediction.npy", predictions)
+
+        trace_path = None
+        if profiler is not None:
+            trace_path = self.config.outdir / "trace.json"
+            profiler.export_chrome_trace(str(trace_path))
+
+        metrics = self.timer.metric(len(data), time.perf_counter() - start, trace_path)
+        logger.info(
+            f"{self.config.name} : {metrics.rows_per_sec:.1f} rows/s, "
+            f"{metrics.tokens_per_sec:.1f} tokens/s, padding "
+            f"{metrics.padding_fraction:.2%}, batch latency p50/p95/p99 "
+            f"{metrics.latency_p50_ms:.1f}/{metrics.latency_p95_ms:.1f}/"
+            f"{metrics.latency_p99_ms:.1f} ms, stages "
+            + ", ".join(
+                f"{stage} {seconds:.2f}s"
+                for stage, seconds in metrics.stage_seconds.items()
+            )
+        )
+        return ModelInferenceArtifact(
+            name=self.config.name,
+            prediction_file_path=self.config.outdir / "prediction.csv",
+            score_file_path=self.config.outdir / "prediction.npy",
+            metrics=metrics,
+        )
+
+    def build_prompts(self, data: pd.DataFrame) -> list[str]:
+        if self.prefix_scorer is not None:
+            return join_columns(data, PREFIX_COLUMNS[self.config.prompt] + ["body"])
+        if self.triplet_scorer is not None:
+            # Scores depend on the row's own examples, so they are part of the key
+            check_columns(data)
+            return join_columns(data, TRIPLET_COLUMNS + ["body"])
+        return (data["rule"] + "[SEP]" + data["body"]).tolist()
+
+    def tokenize(self, prompts: list[str]) -> TokenizedPrompts:
+        return TokenizedPrompts.encode(
+            self.tokenizer, prompts, max_length=self.config.max_length
+        )
+
+    def get_batches(self, lengths: np.ndarray, log: bool = True) -> list[np.ndarray]:
+        sequential = sequential_batches(len(lengths), self.config.batch_size or 1)
+        if not self.config.bucketing:
+            return sequential
+
+        batches = length_bucketed_batches(
+            lengths,
+            batch_size=self.config.batch_size,
+            max_tokens=self.config.max_tokens_per_batch,
+        )
+        if not log:
+            return batches
+
+        baseline = padding_ratio(lengths, sequential)
+        bucketed = padding_ratio(lengths, batches)
+        logger.info(
+            f"{self.config.name} : padding ratio {baseline:.2%} -> {bucketed:.2%} "
+            f"({baseline - bucketed:.2%} saved) over {len(batches)} batches"
+        )
+        return batches
+
+    def predict(
+        self, data: pd.DataFrame, model: torch.nn.Module | None = None
+    ) -> np.ndarray:
+        if self.augmentor is None:
+            return self.predict_rows(data, model=model)
+
+        with self.timer.stage("augment"):
+            views, owners = self.augmentor.views(data)
+        prompts = np.asarray(self.build_prompts(views), dtype=object)
+        # Views are scored once per distinct prompt, all of them in the same
+        # length-sorted batches
+        _, first, inverse = np.unique(prompts, return_index=True, return_inverse=True)
+        scores = self.predict_rows(views.iloc[first], model=model)[inverse]
+
+        # A view repeating another view of the same row only counts once
+        _, keep = np.unique(owners * len(first) + inverse, return_index=True)
+        counts = np.bincount(owners[keep], minlength=len(data))
+        logger.info(
+            f"{self.config.name} : TTA scored {len(first)} distinct input(s) for "
+            f"{len(prompts)} view(s) of {len(data)} row(s) "
+            f"({len(keep) / max(len(data), 1):.2f} view(s) per row)"
+        )
+        return (
+            np.bincount(owners[keep], weights=scores[keep], minlength=len(data))
+            / counts
+        )
+
+    def predict_rows(
+        self, data: pd.DataFrame, model: torch.nn.Module | None = None
+    ) -> np.ndarray:
+        with self.timer.stage("dedup"):
+            prompts = self.build_prompts(data)
+            keys = prompt_hashes(prompts)
+            # Rows sharing a normalized prompt are scored once and fanned back
+            # out through the inverse index
+            _, first, inverse = np.unique(
+                np.asarray(keys), return_index=True, return_inverse=True
+            )
+        logger.info(
+            f"{self.config.name} : {len(first)} unique prompt(s) for "
+            f"{len(prompts)} row(s) (dedup ratio "
+            f"{1 - len(first) / max(len(prompts), 1):.2%})"
+        )
+        return self.predict_unique(
+            data.iloc[first],
+            [prompts[idx] for idx in first],
+            [keys[idx] for idx in first],
+            model=model,
+        )[inverse]
+
+    def predict_unique(
+        self,
+        data: pd.DataFrame,
+        prompts: list[str],
+        keys: list[str],
+        model: torch.nn.Module | None = None,
+    ) -> np.ndarray:
+        # The cache is tied to the resident model, reference models bypass it
+        if self.cache is None or model is not None:
+            return self.score_rows(data, prompts, model=model)
+
+        with self.timer.stage("cache"):
+            outputs = self.cache.get_many(keys)
+        misses = np.flatnonzero(np.isnan(outputs))
+        if len(misses):
+            scores = self.score_rows(
+                data.iloc[misses], [prompts[idx] for idx in misses]
+            )
+            outputs[misses] = scores
+            with self.timer.stage("cache"):
+                self.cache.put_many([keys[idx] for idx in misses], scores)
+
+        stats = self.cache.stats()
+        logger.info(
+            f"{self.config.name} : cache {len(prompts) - len(misses)} hit(s), "
+            f"{len(misses)} miss(es) (lifetime hit rate {stats['hit_rate']:.2%})"
+        )
+        return outputs
+
+    def score_rows(
+        self,
+        data: pd.DataFrame,
+        prompts: list[str],
+        model: torch.nn.Module | None = None,
+    ) -> np.ndarray:
+        if self.prefix_scorer is not None:
+            with self.timer.stage("prefix_scoring"):
+                return self.prefix_scorer(data)
+        if self.triplet_scorer is not None:
+            with self.timer.stage("embedding_scoring"):
+                return self.triplet_scorer(data)
+        return self.score(prompts, model=model)
+
+    @torch.inference_mode()
+    def score(
+        self, prompts: list[str], model: torch.nn.Module | None = None
+    ) -> np.ndarray:
+        if self.config.overlap and not (self.n_workers > 1 and model is None):
+            return self.score_overlapped(prompts, model=model)
+
+        with self.timer.stage("tokenize"):
+            tokens = self.tokenize(prompts)
+            batches = self.get_batches(tokens.lengths)
+        self.timer.count(tokens.lengths, batches)
+
+        def score_batch(batch: np.ndarray) -> np.ndarray:
+            with self.timer.stage("collate"):
+                inputs = tokens.collate(
+                    batch, self.tokenizer.pad_token_id, self.tokenizer.padding_side
+                )
+            return self.forward(inputs, model=model)
+
+        if self.n_workers > 1 and model is None and len(batches) > 1:
+            costs = np.array(
+                [len(batch) * tokens.lengths[batch].max() for batch in batches]
+            )
+            # Stages inside forked workers aren't visible here, only their
+            # batch latencies come back
+            with self.timer.stage("parallel_forward"):
+                return parallel_score(
+                    score_batch,
+                    batches,
+                    costs,
+                    len(tokens),
+                    self.n_workers,
+                    self.n_threads,
+                    latencies=self.timer.latencies,
+                )
+
+        outputs = np.zeros(len(tokens), dtype=np.float64)
+        for batch in batches:
+            start = time.perf_counter()
+            outputs[batch] = score_batch(batch)
+            self.timer.latencies.append(time.perf_counter() - start)
+        return outputs
+
+    def produce_batches(
+        self, prompts: list[str], pin_memory: bool = False
+    ) -> Iterator[tuple[np.ndarray, dict[str, torch.Tensor]]]:
+        # Prompts are tokenized a window at a time, so the first batch is
+        # ready long before the last prompt is encoded
+        window = (self.config.batch_size or 1) * self.config.overlap_window
+        for start in range(0, len(prompts), window):
+            with self.timer.stage("tokenize"):
+                tokens = self.tokenize(prompts[start : start + window])
+                batches = self.get_batches(tokens.lengths, log=False)
+            self.timer.count(tokens.lengths, batches)
+
+            for batch in batches:
+                with self.timer.stage("collate"):
+                    inputs = tokens.collate(
+                        batch, self.tokenizer.pad_token_id, self.tokenizer.padding_side
+                    )
+                    if pin_memory:
+                        inputs = {k: v.pin_memory() for k, v in inputs.items()}
+                yield start + batch, inputs
+
+    @torch.inference_mode()
+    def score_overlapped(
+        self, prompts: list[str], model: torch.nn.Module | None = None
+    ) -> np.ndarray:
+        """Tokenizes and collates on a producer thread while the model runs,
+        and keeps scores on the device until a chunk of batches is done"""
+        model = model or self.model
+        on_cuda = model.device.type == "cuda"
+        outputs = np.zeros(len(prompts), dtype=np.float64)
+        pending_indices, pending_scores = [], []
+
+        def flush():
+            with self.timer.stage("softmax_to_cpu"):
+                outputs[np.concatenate(pending_indices)] = (
+                    torch.cat(pending_scores).float().cpu().numpy()
+                )
+            pending_indices.clear()
+            pending_scores.clear()
+
+        # Producer stages overlap the consumer's, so stage seconds can add up
+        # to more than the wall time
+        for indices, inputs in iter_prefetched(
+            self.produce_batches(prompts, pin_memory=on_cuda),
+            depth=self.config.prefetch_batches,
+        ):
+            start = time.perf_counter()
+            with self.timer.stage("to_device"):
+                inputs = {
+                    k: v.to(model.device, non_blocking=on_cuda)
+                    for k, v in inputs.items()
+                }
+            with self.timer.stage("forward"):
+                logits = model(**inputs).logits
+            pending_indices.append(indices)
+            pending_scores.append(softmax(logits, dim=-1)[:, 1])
+            if len(pending_scores) >= self.config.transfer_every:
+                flush()
+            self.timer.latencies.append(time.perf_counter() - start)
+
+        if pending_scores:
+            flush()
+        return outputs
+
+    def forward(
+        self, inputs: dict[str, torch.Tensor], model: torch.nn.Module | None = None
+    ) -> np.ndarray:
+        model = model or self.model
+        with self.timer.stage("to_device"):
+            inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        with self.timer.stage("forward"):
+            logits = model(**inputs).logits
+        with self.timer.stage("softmax_to_cpu"):
+            return softmax(logits, dim=-1)[:, 1].float().cpu().numpy()
+
+    def quantization_report(self, data: pd.DataFrame) -> dict:
+        reference = AutoModelForSequenceClassification.from_pretrained(
+            str(self.config.train_path)
+        ).eval()
+
+        report = dict()
+        for name, model in [
+            ("fp32", reference),
+            (self.config.quantization, self.model),
+        ]:
+            start = time.perf_counter()
+            predictions = self.predict(data, model=model)
+            elapsed = time.perf_counter() - start
+
+            report[name] = {"rows_per_sec": len(data) / elapsed}
+            if "rule_violation" in data.columns:
+                report[name]["roc_auc"] = roc_auc_score(
+                    data["rule_violation"], predictions
+                )
+            logger.info(
+                f"{self.config.name} [{name}] : "
+                + ", ".join(f"{k}={v:.4f}" for k, v in report[name].items())
+            )
+
+        del reference
+        save_json(report, self.config.outdir / "quantization_report.json")
+        return report
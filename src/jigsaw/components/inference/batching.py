@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def sequential_batches(n_rows: int, batch_size: int) -> list[np.ndarray]:
+    return [
+        np.arange(idx, min(idx + batch_size, n_rows))
+        for idx in range(0, n_rows, batch_size)
+    ]
+
+
+def length_bucketed_batches(
+    lengths: np.ndarray,
+    batch_size: int | None = None,
+    max_tokens: int | None = None,
+) -> list[np.ndarray]:
+    # Without a batch_size or max_tokens cap every row goes in one batch.
+    # Longest first, so that an oversized batch shows up on the first step
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    lengths = np.asarray(lengths)[order]
+
+    batches = []
+    start = 0
+    while start < len(order):
+        size = len(order) - start
+        if max_tokens:
+            size = min(size, max(1, max_tokens // max(int(lengths[start]), 1)))
+        if batch_size:
+            size = min(size, batch_size)
+        batches.append(order[start : start + size])
+        start += size
+    return batches
+
+
+def padding_ratio(lengths: np.ndarray, batches: list[np.ndarray]) -> float:
+    lengths = np.asarray(lengths)
+    padded = sum(
+        len(batch) * int(lengths[batch].max()) for batch in batches if len(batch)
+    )
+    if not padded:
+        return 0.0
+    return 1 - int(lengths.sum()) / padded
@@ -0,0 +1,127 @@
+from ...core import Directory, FilePath
+from ... import logger
+from collections import OrderedDict
+from hashlib import blake2b
+from pathlib import Path
+import numpy as np
+import unicodedata
+import sqlite3
+import json
+
+FINGERPRINT_SUFFIXES = (".safetensors", ".bin", ".json", ".model", ".txt")
+SQLITE_MAX_VARIABLES = 500
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", prompt).split())
+
+
+def prompt_hashes(prompts: list[str]) -> list[str]:
+    return [
+        blake2b(normalize_prompt(prompt).encode(), digest_size=16).hexdigest()
+        for prompt in prompts
+    ]
+
+
+def model_fingerprint(train_path: FilePath | Directory, **params) -> str:
+    train_path = Path(str(train_path))
+    digest = blake2b(digest_size=16)
+    for file in sorted(train_path.rglob("*")):
+        if file.is_file() and file.suffix in FINGERPRINT_SUFFIXES:
+            stat = file.stat()
+            digest.update(
+                f"{file.relative_to(train_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+            )
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, path: FilePath, fingerprint: str, capacity: int = 100_000):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.capacity = capacity
+        self.memory: OrderedDict[str, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY, score REAL NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+        self.invalidate_stale()
+
+    def invalidate_stale(self):
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'fingerprint'"
+        ).fetchone()
+        if row is not None and row[0] == self.fingerprint:
+            return
+
+        if row is not None:
+            logger.info(f"Model artifact changed, invalidating cache {self.path}")
+        with self.connection:
+            self.connection.execute("DELETE FROM predictions")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)",
+                (self.fingerprint,),
+            )
+
+    def remember(self, key: str, score: float):
+        self.memory[key] = score
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys: list[str]) -> np.ndarray:
+        scores = np.full(len(keys), np.nan, dtype=np.float64)
+        pending = dict()
+        for idx, key in enumerate(keys):
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                scores[idx] = self.memory[key]
+            else:
+                pending.setdefault(key, []).append(idx)
+
+        lookup = list(pending.keys())
+        for start in range(0, len(lookup), SQLITE_MAX_VARIABLES):
+            batch = lookup[start : start + SQLITE_MAX_VARIABLES]
+            rows = self.connection.execute(
+                "SELECT key, score FROM predictions "
+                f"WHERE key IN ({', '.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+            for key, score in rows:
+                scores[pending[key]] = score
+                self.remember(key, score)
+
+        found = ~np.isnan(scores)
+        self.hits += int(found.sum())
+        self.misses += int((~found).sum())
+        return scores
+
+    def put_many(self, keys: list[str], scores: np.ndarray):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?)",
+                zip(keys, map(float, scores)),
+            )
+        for key, score in zip(keys, scores):
+            self.remember(key, float(score))
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "resident": len(self.memory),
+        }
+
+    def close(self):
+        self.connection.close()
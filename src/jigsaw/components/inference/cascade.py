@@ -0,0 +1,39 @@
+from ... import logger
+from sklearn.metrics import roc_auc_score
+import numpy as np
+
+
+def in_band(scores: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    return (scores >= lower) & (scores <= upper)
+
+
+def calibrate_band(
+    labels: np.ndarray,
+    cheap: np.ndarray,
+    full: np.ndarray,
+    target_auc_loss: float,
+    n_grid: int = 20,
+) -> tuple[float, float]:
+    """Narrowest uncertainty band on the cheap scores whose blended AUC stays
+    within ``target_auc_loss`` of the full ensemble on out-of-fold rows."""
+    baseline = roc_auc_score(labels, full)
+    quantiles = np.quantile(cheap, np.linspace(0, 1, 2 * n_grid + 1))
+    lowers, uppers = quantiles[: n_grid + 1], quantiles[n_grid:]
+
+    best = (float(quantiles[0]), float(quantiles[-1]))
+    best_fraction = 1.0
+    for lower in lowers:
+        for upper in uppers:
+            band = in_band(cheap, lower, upper)
+            fraction = band.mean()
+            if fraction >= best_fraction:
+                continue
+            loss = baseline - roc_auc_score(labels, np.where(band, full, cheap))
+            if loss <= target_auc_loss:
+                best, best_fraction = (float(lower), float(upper)), fraction
+
+    logger.info(
+        f"Cascade band [{best[0]:.4f}, {best[1]:.4f}] sends {best_fraction:.2%} "
+        f"of out-of-fold rows to the full ensemble (target AUC loss {target_auc_loss})"
+    )
+    return best
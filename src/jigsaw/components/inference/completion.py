@@ -0,0 +1,184 @@
+from ...constants.prompt import (
+    BODY_SENTINEL,
+    zero_shot_chat_prompt,
+    few_shot_chat_prompt,
+)
+from .batching import length_bucketed_batches
+from .tokenization import TokenizedPrompts
+from .profiling import StageTimer
+from ... import logger
+from torch.nn.functional import softmax
+import pandas as pd
+import numpy as np
+import torch
+import time
+import copy
+
+PROMPT_BUILDERS = {
+    "zero-shot": zero_shot_chat_prompt,
+    "few-shot": few_shot_chat_prompt,
+}
+PREFIX_COLUMNS = {
+    "zero-shot": ["rule"],
+    "few-shot": [
+        "rule",
+        "positive_example_1",
+        "negative_example_1",
+        "positive_example_2",
+        "negative_example_2",
+    ],
+}
+ANSWERS = (" Yes", " No")
+
+
+def split_prompt(
+    row: pd.Series, tokenizer, prompt: str = "zero-shot"
+) -> tuple[str, str] | None:
+    """Prompt text before and after the body, or None when the chat template
+    rewrites the body so that it can't be located"""
+    row = row.copy()
+    row["body"] = BODY_SENTINEL
+    parts = PROMPT_BUILDERS[prompt](row, tokenizer).split(BODY_SENTINEL)
+    if len(parts) != 2:
+        return None
+    prefix, suffix = parts
+    return prefix, suffix
+
+
+class PrefixCachedScorer:
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        prompt: str = "zero-shot",
+        batch_size: int = 8,
+        max_length: int | None = None,
+        timer: StageTimer | None = None,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.prompt = prompt
+        self.timer = timer or StageTimer()
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.answer_ids = [
+            tokenizer(answer, add_special_tokens=False)["input_ids"][0]
+            for answer in ANSWERS
+        ]
+        self.pad_token_id = (
+            tokenizer.pad_token_id
+            if tokenizer.pad_token_id is not None
+            else tokenizer.eos_token_id
+        )
+
+    def encode(self, prompts: list[str]) -> TokenizedPrompts:
+        return TokenizedPrompts.encode(
+            self.tokenizer, prompts, add_special_tokens=False
+        )
+
+    @torch.inference_mode()
+    def __call__(self, data: pd.DataFrame) -> np.ndarray:
+        columns = PREFIX_COLUMNS[self.prompt]
+        # A missing example is an empty one, rather than a group that
+        # groupby would silently leave out
+        data = data.assign(**{column: data[column].fillna("") for column in columns})
+        outputs = np.full(len(data), np.nan, dtype=np.float64)
+        groups = data.groupby(columns, sort=False, dropna=False).indices
+
+        full_tokens, computed_tokens = 0, 0
+        for indices in groups.values():
+            parts = split_prompt(data.iloc[indices[0]], self.tokenizer, self.prompt)
+            if parts is None:
+                outputs[indices], n_tokens = self.score_full(data.iloc[indices])
+                full_tokens += n_tokens
+                computed_tokens += n_tokens
+                continue
+
+            # Whole prompts are tokenized the way training tokenized them, the
+            # cached prefix is the run of tokens they all start with, so no
+            # token is split differently at the boundary
+            prefix, suffix = parts
+            tokens = self.encode(
+                (prefix + data["body"].iloc[indices].str.strip() + suffix).tolist()
+            )
+            n_prefix = min(
+                tokens.common_prefix(self.encode([prefix]).input_ids),
+                int(tokens.lengths.min()) - 1,
+            )
+            prefix_ids = torch.tensor(
+                tokens.input_ids[None, :n_prefix].astype(np.int64),
+                device=self.model.device,
+            )
+            prefix_cache = None
+            if n_prefix:
+                prefix_cache = self.model(prefix_ids, use_cache=True).past_key_values
+                self.timer.count(np.array([n_prefix]), [np.array([0])])
+
+            # Cut from the body's start, the answer cue at the end survives
+            # and prompts stay within max_length
+            rest = tokens.drop_prefix(
+                n_prefix,
+                max_length=max(self.max_length - n_prefix, 1)
+                if self.max_length
+                else None,
+            )
+            batches = length_bucketed_batches(rest.lengths, self.batch_size)
+            self.timer.count(rest.lengths, batches)
+            for batch in batches:
+                outputs[indices[batch]] = self.forward(
+                    prefix_cache, n_prefix, rest.collate(batch, self.pad_token_id)
+                )
+
+            full_tokens += int(tokens.lengths.sum())
+            computed_tokens += n_prefix + int(rest.lengths.sum())
+
+        logger.info(
+            f"Prefix cache : {len(groups)} prefix(es) for {len(data)} row(s), "
+            f"{full_tokens / max(computed_tokens, 1):.2f}x fewer prompt tokens"
+        )
+        return outputs
+
+    @torch.inference_mode()
+    def score_full(self, data: pd.DataFrame) -> tuple[np.ndarray, int]:
+        """Scores whole prompts without a shared prefix, for templates the
+        body can't be cut out of. Cut from the left like in training, so the
+        answer cue survives"""
+        builder = PROMPT_BUILDERS[self.prompt]
+        tokens = self.encode(
+            [builder(row, self.tokenizer) for _, row in data.iterrows()]
+        ).drop_prefix(0, max_length=self.max_length)
+        outputs = np.zeros(len(data), dtype=np.float64)
+        batches = length_bucketed_batches(tokens.lengths, self.batch_size)
+        self.timer.count(tokens.lengths, batches)
+        for batch in batches:
+            outputs[batch] = self.forward(
+                None, 0, tokens.collate(batch, self.pad_token_id)
+            )
+        return outputs, int(tokens.lengths.sum())
+
+    def forward(
+        self, prefix_cache, prefix_length: int, inputs: dict[str, torch.Tensor]
+    ) -> np.ndarray:
+        start = time.perf_counter()
+        n_rows = inputs["input_ids"].shape[0]
+        past_key_values = None
+        if prefix_cache is not None:
+            past_key_values = copy.deepcopy(prefix_cache)
+            past_key_values.batch_repeat_interleave(n_rows)
+
+        attention_mask = inputs["attention_mask"].to(self.model.device)
+        logits = self.model(
+            input_ids=inputs["input_ids"].to(self.model.device),
+            attention_mask=torch.cat(
+                [attention_mask.new_ones(n_rows, prefix_length), attention_mask], dim=1
+            ),
+            past_key_values=past_key_values,
+            use_cache=prefix_cache is not None,
+        ).logits
+
+        # Right padded, so the answer is read off the last real token per row
+        last = attention_mask.sum(dim=1) - 1
+        logits = logits[torch.arange(n_rows, device=logits.device), last]
+        scores = softmax(logits[:, self.answer_ids].float(), dim=-1)[:, 0].cpu().numpy()
+        self.timer.latencies.append(time.perf_counter() - start)
+        return scores
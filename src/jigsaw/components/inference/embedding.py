@@ -0,0 +1,183 @@
+from ...core import FilePath, Directory
+from ...errors import ValidationError
+from ... import logger
+from .batching import length_bucketed_batches
+from .tokenization import TokenizedPrompts
+from .cache import model_fingerprint, prompt_hashes
+from .profiling import StageTimer
+from torch.nn.functional import normalize
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import torch
+import time
+import os
+
+EXAMPLE_COLUMNS = {
+    "positive": ["positive_example_1", "positive_example_2"],
+    "negative": ["negative_example_1", "negative_example_2"],
+}
+TRIPLET_COLUMNS = ["rule", *EXAMPLE_COLUMNS["positive"], *EXAMPLE_COLUMNS["negative"]]
+RULE_INDEX_NAME = "rule_index.{pooling}.npz"
+
+
+def check_columns(data: pd.DataFrame):
+    absent = [column for column in TRIPLET_COLUMNS if column not in data.columns]
+    if absent:
+        e = ValidationError(absent, "triplet scoring needs the rule examples")
+        logger.error(e)
+        raise e
+
+
+class EmbeddingIndex:
+    """L2-normalised float16 embeddings keyed by the hash of their text"""
+
+    def __init__(
+        self,
+        fingerprint: str,
+        keys: np.ndarray | None = None,
+        embeddings: np.ndarray | None = None,
+    ):
+        self.fingerprint = fingerprint
+        self.keys = keys if keys is not None else np.array([], dtype="<U32")
+        self.embeddings = embeddings
+        self.positions = {key: idx for idx, key in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def missing(self, keys: list[str]) -> list[str]:
+        return [key for key in dict.fromkeys(keys) if key not in self.positions]
+
+    def add(self, keys: list[str], embeddings: np.ndarray):
+        self.keys = np.concatenate([self.keys, np.asarray(keys, dtype="<U32")])
+        self.embeddings = (
+            embeddings
+            if self.embeddings is None
+            else np.concatenate([self.embeddings, embeddings])
+        )
+        self.positions.update(
+            {key: len(self.positions) + idx for idx, key in enumerate(keys)}
+        )
+
+    def lookup(self, keys: list[str]) -> np.ndarray:
+        return np.fromiter((self.positions[key] for key in keys), dtype=np.int64)
+
+    def save(self, path: FilePath):
+        # Written aside and swapped in, a crash never leaves a torn index
+        temp_path = f"{path}.tmp.npz"
+        np.savez(
+            temp_path,
+            fingerprint=np.array(self.fingerprint),
+            keys=self.keys,
+            embeddings=self.embeddings,
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: FilePath, fingerprint: str) -> "EmbeddingIndex":
+        if os.path.exists(path):
+            with np.load(path) as stored:
+                if str(stored["fingerprint"]) == fingerprint:
+                    return cls(fingerprint, stored["keys"], stored["embeddings"])
+            logger.info(f"Rule index {path} is stale, rebuilding it")
+        return cls(fingerprint)
+
+
+class TripletScorer:
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        train_path: FilePath | Directory,
+        pooling: str = "mean",
+        batch_size: int = 32,
+        max_length: int | None = None,
+        timer: StageTimer | None = None,
+    ):
+        self.model = model
+        self.timer = timer or StageTimer()
+        self.tokenizer = tokenizer
+        self.pooling = pooling
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.index_path = Path(str(train_path)) / RULE_INDEX_NAME.format(
+            pooling=pooling
+        )
+        self.index = EmbeddingIndex.load(
+            self.index_path,
+            model_fingerprint(train_path, pooling=pooling, max_length=max_length),
+        )
+
+    @torch.inference_mode()
+    def encode(self, texts: list[str]) -> np.ndarray:
+        tokens = TokenizedPrompts.encode(
+            self.tokenizer, texts, max_length=self.max_length
+        )
+        embeddings = np.empty(
+            (len(texts), self.model.config.hidden_size), dtype=np.float16
+        )
+        batches = length_bucketed_batches(tokens.lengths, self.batch_size)
+        self.timer.count(tokens.lengths, batches)
+        for batch in batches:
+            start = time.perf_counter()
+            inputs = {
+                k: v.to(self.model.device)
+                for k, v in tokens.collate(
+                    batch, self.tokenizer.pad_token_id, self.tokenizer.padding_side
+                ).items()
+            }
+            hidden = self.model(**inputs).last_hidden_state
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            embeddings[batch] = normalize(pooled.float(), dim=-1).half().cpu().numpy()
+            self.timer.latencies.append(time.perf_counter() - start)
+        return embeddings
+
+    def update_index(self, data: pd.DataFrame) -> dict[str, np.ndarray]:
+        """Hashes every example column, encoding only texts the index hasn't
+        seen in this or an earlier run"""
+        keys = {
+            column: prompt_hashes(data[column].astype(str).tolist())
+            for columns in EXAMPLE_COLUMNS.values()
+            for column in columns
+        }
+        texts = dict()
+        for column, column_keys in keys.items():
+            for key, text in zip(column_keys, data[column].astype(str)):
+                texts.setdefault(key, text)
+
+        missing = self.index.missing(list(texts))
+        if missing:
+            self.index.add(missing, self.encode([texts[key] for key in missing]))
+            self.index.save(self.index_path)
+        logger.info(
+            f"Rule index : {len(texts)} example(s) referenced, {len(missing)} "
+            f"encoded, {len(self.index)} stored"
+        )
+        return {column: self.index.lookup(keys[column]) for column in keys}
+
+    def __call__(self, data: pd.DataFrame) -> np.ndarray:
+        check_columns(data)
+        if not len(data):
+            return np.zeros(0, dtype=np.float32)
+        positions = self.update_index(data)
+        bodies = self.encode(data["body"].astype(str).tolist()).astype(np.float32)
+
+        # Cosine similarity of every body to its own row's examples, a
+        # (rows, examples) batch of dot products per polarity
+        similarity = {
+            polarity: np.einsum(
+                "nd,nkd->nk",
+                bodies,
+                self.index.embeddings[
+                    np.stack([positions[column] for column in columns], axis=1)
+                ].astype(np.float32),
+            ).mean(axis=1)
+            for polarity, columns in EXAMPLE_COLUMNS.items()
+        }
+        # Monotone map of the margin in [-2, 2] onto [0, 1]
+        return (similarity["positive"] - similarity["negative"] + 2) / 4
@@ -0,0 +1,97 @@
+from ...utils.common import get_physical_cores
+from ... import logger
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections.abc import Mapping
+from typing import Any, Callable
+import multiprocessing as mp
+import os
+import pandas as pd
+import torch
+import time
+
+# Inherited by the forked workers, never pickled
+_MEMBER_TASK: tuple[Callable, Mapping, pd.DataFrame] | None = None
+
+
+def _init_member(n_threads: int):
+    # Each forked worker has its own intra-op pool, so the budget holds
+    torch.set_num_threads(n_threads)
+    # The fast tokenizer's thread pool does not survive a fork
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+
+def _run_member(model_name: str) -> tuple[str, Any, float]:
+    run, members, data = _MEMBER_TASK
+    start = time.perf_counter()
+    result = run(members[model_name], data)
+    return model_name, result, time.perf_counter() - start
+
+
+def member_threads(n_members: int, threads_per_model: int | None = None) -> int:
+    return threads_per_model or max(1, get_physical_cores() // max(n_members, 1))
+
+
+def run_members(
+    run: Callable[[Any, pd.DataFrame], Any],
+    members: Mapping[str, Any],
+    data: pd.DataFrame,
+    executor: str = "sequential",
+    threads_per_model: int | None = None,
+    model_names: list[str] | None = None,
+    prefetch: Callable[[str], None] | None = None,
+) -> dict[str, Any]:
+    global _MEMBER_TASK
+
+    # Members are looked up by name inside the task, so a lazy mapping only
+    # loads each model when its turn comes
+    model_names = list(members) if model_names is None else model_names
+
+    # Every member reads the same frame, none of them is allowed to write to it
+    _MEMBER_TASK = (run, members, data)
+    try:
+        wall = time.perf_counter()
+        if executor == "sequential" or len(model_names) == 1:
+            outputs = []
+            for idx, model_name in enumerate(model_names):
+                # The next member loads in the background while this one runs
+                members[model_name]
+                if prefetch is not None and idx + 1 < len(model_names):
+                    prefetch(model_names[idx + 1])
+                outputs.append(_run_member(model_name))
+        else:
+            n_threads = member_threads(len(model_names), threads_per_model)
+            if executor == "thread":
+                # torch releases the GIL inside its kernels, so members
+                # overlap on threads. The intra-op pool is process-wide, so
+                # there is no per-member budget: all members share one pool
+                # sized to their total budget
+                previous = torch.get_num_threads()
+                torch.set_num_threads(
+                    min(n_threads * len(model_names), get_physical_cores())
+                )
+                try:
+                    with ThreadPoolExecutor(
+                        len(model_names), thread_name_prefix="member"
+                    ) as pool:
+                        outputs = list(pool.map(_run_member, model_names))
+                finally:
+                    torch.set_num_threads(previous)
+            else:
+                # Forked, so the frame and weights are not pickled
+                with ProcessPoolExecutor(
+                    len(model_names),
+                    mp_context=mp.get_context("fork"),
+                    initializer=_init_member,
+                    initargs=(n_threads,),
+                ) as pool:
+                    outputs = list(pool.map(_run_member, model_names))
+        wall = time.perf_counter() - wall
+    finally:
+        _MEMBER_TASK = None
+
+    seconds = [elapsed for _, _, elapsed in outputs]
+    logger.info(
+        f"Ran {len(model_names)} member(s) with the {executor} executor in {wall:.2f}s "
+        f"(sum {sum(seconds):.2f}s, slowest {max(seconds, default=0.0):.2f}s)"
+    )
+    return {model_name: result for model_name, result, _ in outputs}
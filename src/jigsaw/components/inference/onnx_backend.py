@@ -0,0 +1,109 @@
+from ...core import Directory, FilePath
+from ...errors import ValidationError
+from .quantization import is_cache_fresh
+from ... import logger
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from transformers.modeling_outputs import SequenceClassifierOutput
+from torch.nn.functional import softmax
+from pathlib import Path
+import numpy as np
+import torch
+
+ONNX_MODEL_NAME = "model.onnx"
+ONNX_INPUTS = ["input_ids", "attention_mask"]
+PARITY_PROMPTS = [
+    "No spam[SEP]Buy cheap followers now at my site",
+    "No legal advice[SEP]You should sue them, you will win for sure. I did it twice",
+    "No advertising[SEP]ok",
+]
+
+
+@torch.inference_mode()
+def export_onnx(
+    train_path: FilePath | Directory,
+    opset: int = 17,
+    atol: float = 1e-4,
+    cache: bool = True,
+) -> Path:
+    train_path = Path(str(train_path))
+    onnx_path = train_path / ONNX_MODEL_NAME
+    if cache and is_cache_fresh(onnx_path, train_path):
+        logger.info(f"Using cached ONNX graph {onnx_path}")
+        return onnx_path
+
+    model = AutoModelForSequenceClassification.from_pretrained(str(train_path)).eval()
+    tokenizer = AutoTokenizer.from_pretrained(str(train_path))
+    sample = tokenizer(PARITY_PROMPTS[:2], padding="longest", return_tensors="pt")
+
+    logger.info(f"Exporting {train_path} to {onnx_path}")
+    torch.onnx.export(
+        model,
+        tuple(sample[name] for name in ONNX_INPUTS),
+        str(onnx_path),
+        input_names=ONNX_INPUTS,
+        output_names=["logits"],
+        dynamic_axes={
+            **{name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+
+    verify_onnx(model, OnnxSequenceClassifier(onnx_path), tokenizer, atol=atol)
+    return onnx_path
+
+
+@torch.inference_mode()
+def verify_onnx(
+    model: torch.nn.Module,
+    session: "OnnxSequenceClassifier",
+    tokenizer,
+    atol: float = 1e-4,
+) -> float:
+    # Different batch size and sequence length than the export trace, so the
+    # dynamic axes are exercised as well
+    inputs = tokenizer(PARITY_PROMPTS, padding="longest", return_tensors="pt")
+    inputs = {name: inputs[name] for name in ONNX_INPUTS}
+    expected = softmax(model(**inputs).logits, dim=-1).numpy()
+    actual = softmax(session(**inputs).logits, dim=-1).numpy()
+
+    error = float(np.abs(expected - actual).max())
+    if error > atol:
+        e = ValidationError(
+            message=f"ONNX graph diverges from the PyTorch model ({error:.2e} > {atol:.2e})"
+        )
+        logger.error(e)
+        raise e
+
+    logger.info(f"ONNX parity check passed : max abs error {error:.2e}")
+    return error
+
+
+class OnnxSequenceClassifier:
+    def __init__(self, onnx_path: FilePath, n_threads: int | None = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            logger.error("onnxruntime is required for the 'onnx' inference backend")
+            raise e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if n_threads:
+            options.intra_op_num_threads = n_threads
+
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.device = torch.device("cpu")
+
+    def __call__(self, **inputs: torch.Tensor) -> SequenceClassifierOutput:
+        feed = {
+            name: inputs[name].cpu().numpy().astype(np.int64, copy=False)
+            for name in self.input_names
+        }
+        (logits,) = self.session.run(["logits"], feed)
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
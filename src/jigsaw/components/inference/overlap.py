@@ -0,0 +1,56 @@
+from queue import Empty, Full, Queue
+from typing import Iterator, TypeVar
+import threading
+
+T = TypeVar("T")
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iter_prefetched(items: Iterator[T], depth: int = 4) -> Iterator[T]:
+    """Drives ``items`` on a background thread, keeping up to ``depth`` of them
+    ready while the caller works on the current one"""
+    queue: Queue = Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    producer = threading.Thread(target=produce, name="prefetch-batches", daemon=True)
+    producer.start()
+    try:
+        while True:
+            try:
+                item = queue.get(timeout=0.1)
+            except Empty:
+                if not producer.is_alive() and queue.empty():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Unblocks a producer stuck on a full queue when the consumer bails out
+        stop.set()
+        producer.join()
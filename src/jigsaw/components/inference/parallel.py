@@ -0,0 +1,80 @@
+from ... import logger
+from typing import Callable
+import multiprocessing as mp
+import numpy as np
+import torch
+import time
+
+# Inherited by the forked workers, never pickled
+_WORKER_SCORE: Callable[[np.ndarray], np.ndarray] | None = None
+_WORKER_SHARDS: list[list[np.ndarray]] | None = None
+
+
+def _init_worker(n_threads: int):
+    torch.set_num_threads(n_threads)
+
+
+@torch.inference_mode()
+def _score_shard(shard: int) -> tuple[np.ndarray, np.ndarray, list[float]]:
+    batches = _WORKER_SHARDS[shard]
+    scores, latencies = [], []
+    for batch in batches:
+        start = time.perf_counter()
+        scores.append(_WORKER_SCORE(batch))
+        latencies.append(time.perf_counter() - start)
+    return np.concatenate(batches), np.concatenate(scores), latencies
+
+
+def share_weights(model) -> None:
+    # Moves parameters and buffers into shared memory, so the forked workers
+    # map the same pages instead of copying them on first touch
+    if isinstance(model, torch.nn.Module):
+        model.share_memory()
+
+
+def shard_batches(
+    batches: list[np.ndarray], costs: np.ndarray, n_workers: int
+) -> list[list[np.ndarray]]:
+    loads = np.zeros(n_workers)
+    shards = [[] for _ in range(n_workers)]
+    for idx in np.argsort(-np.asarray(costs), kind="stable"):
+        worker = int(np.argmin(loads))
+        shards[worker].append(batches[idx])
+        loads[worker] += costs[idx]
+    return [shard for shard in shards if shard]
+
+
+def parallel_score(
+    score_batch: Callable[[np.ndarray], np.ndarray],
+    batches: list[np.ndarray],
+    costs: np.ndarray,
+    n_rows: int,
+    n_workers: int,
+    n_threads: int,
+    latencies: list[float] | None = None,
+) -> np.ndarray:
+    global _WORKER_SCORE, _WORKER_SHARDS
+
+    # Prompts are tokenized in the parent: the fast tokenizer's thread pool
+    # does not survive a fork, so workers only run forward passes
+    shards = shard_batches(batches, costs, n_workers)
+    logger.info(
+        f"Scoring {n_rows} row(s) in {len(batches)} batch(es) on "
+        f"{len(shards)} worker(s) x {n_threads} thread(s)"
+    )
+
+    _WORKER_SCORE, _WORKER_SHARDS = score_batch, shards
+    try:
+        outputs = np.zeros(n_rows, dtype=np.float64)
+        with mp.get_context("fork").Pool(
+            len(shards), initializer=_init_worker, initargs=(n_threads,)
+        ) as pool:
+            for indices, scores, shard_latencies in pool.imap_unordered(
+                _score_shard, range(len(shards))
+            ):
+                outputs[indices] = scores
+                if latencies is not None:
+                    latencies.extend(shard_latencies)
+        return outputs
+    finally:
+        _WORKER_SCORE, _WORKER_SHARDS = None, None
@@ -0,0 +1,65 @@
+from ...core import FilePath, InferenceMetric
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from torch.profiler import ProfilerActivity, profile, record_function
+import numpy as np
+import torch
+import time
+
+
+class StageTimer:
+    def __init__(self, device: torch.device | None = None, trace: bool = False):
+        self.trace = trace
+        # Kernels run asynchronously on CUDA, so stages are only exact when
+        # each one waits for the device, which is left to traced runs
+        self.sync = trace and device is not None and device.type == "cuda"
+        self.reset()
+
+    def reset(self):
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.latencies: list[float] = []
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        with record_function(name) if self.trace else nullcontext():
+            yield
+            if self.sync:
+                torch.cuda.synchronize()
+        self.seconds[name] += time.perf_counter() - start
+
+    def count(self, lengths: np.ndarray, batches: list[np.ndarray]):
+        self.tokens += int(lengths.sum())
+        self.padded_tokens += int(
+            sum(len(batch) * lengths[batch].max() for batch in batches if len(batch))
+        )
+
+    def profiler(self, device: torch.device | None = None):
+        if not self.trace:
+            return nullcontext()
+        activities = [ProfilerActivity.CPU]
+        if device is not None and device.type == "cuda":
+            activities.append(ProfilerActivity.CUDA)
+        return profile(activities=activities, record_shapes=True)
+
+    def metric(
+        self, rows: int, seconds: float, trace_path: FilePath | None = None
+    ) -> InferenceMetric:
+        latencies = np.array(self.latencies or [0.0]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return InferenceMetric(
+            rows=rows,
+            seconds=seconds,
+            rows_per_sec=rows / max(seconds, 1e-9),
+            tokens_per_sec=self.tokens / max(seconds, 1e-9),
+            padding_fraction=1 - self.tokens / max(self.padded_tokens, 1)
+            if self.padded_tokens
+            else 0.0,
+            latency_p50_ms=float(p50),
+            latency_p95_ms=float(p95),
+            latency_p99_ms=float(p99),
+            stage_seconds=dict(self.seconds),
+            trace_path=trace_path,
+        )
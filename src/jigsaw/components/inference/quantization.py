@@ -0,0 +1,51 @@
+from ...core import Directory, FilePath
+from ... import logger
+from transformers import AutoModelForSequenceClassification
+from pathlib import Path
+import torch
+
+QUANTIZED_MODEL_NAMES = {"dynamic-int8": "model.dynamic-int8.pt"}
+CHECKPOINT_SUFFIXES = (".safetensors", ".bin", ".json")
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def is_cache_fresh(cache_path: Path, train_path: Path) -> bool:
+    if not cache_path.exists():
+        return False
+    checkpoint_mtime = max(
+        (
+            file.stat().st_mtime
+            for file in train_path.iterdir()
+            if file.suffix in CHECKPOINT_SUFFIXES
+        ),
+        default=0,
+    )
+    return cache_path.stat().st_mtime >= checkpoint_mtime
+
+
+def load_quantized_model(
+    train_path: FilePath | Directory, mode: str = "dynamic-int8", cache: bool = True
+) -> torch.nn.Module:
+    train_path = Path(str(train_path))
+    cache_path = train_path / QUANTIZED_MODEL_NAMES[mode]
+
+    model = AutoModelForSequenceClassification.from_pretrained(str(train_path)).eval()
+    model = quantize_dynamic_int8(model)
+
+    # Only the quantized weights are cached, loading them back never
+    # unpickles arbitrary objects
+    if cache and is_cache_fresh(cache_path, train_path):
+        logger.info(f"Loading cached {mode} weights from {cache_path}")
+        model.load_state_dict(torch.load(cache_path, weights_only=True))
+        return model
+
+    logger.info(f"Quantized {train_path} to {mode}")
+    if cache:
+        torch.save(model.state_dict(), cache_path)
+        logger.info(f"Cached {mode} weights at {cache_path}")
+    return model
@@ -0,0 +1,216 @@
+from ...core import FilePath, ModelInferenceConfig
+from ...utils.common import load_json
+from ... import logger
+from . import ModelInferenceComponent
+from .onnx_backend import OnnxSequenceClassifier
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import threading
+import torch
+import time
+import gc
+import os
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin")
+GIB = 2**30
+
+
+def estimate_size(config: ModelInferenceConfig) -> int:
+    """Bytes of weights on disk, used to make room before a model is loaded"""
+    train_path = Path(str(config.train_path))
+    if not train_path.is_dir():
+        return 0
+    return sum(
+        file.stat().st_size
+        for file in train_path.iterdir()
+        if file.suffix in WEIGHT_SUFFIXES
+    )
+
+
+def tensor_bytes(value) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(tensor_bytes(item) for item in value)
+    return 0
+
+
+def resident_size(component: ModelInferenceComponent) -> int:
+    if isinstance(component.model, OnnxSequenceClassifier):
+        return os.path.getsize(component.model.onnx_path)
+    # The state dict also covers the packed weights of quantized modules,
+    # which don't show up as parameters
+    return sum(tensor_bytes(value) for value in component.model.state_dict().values())
+
+
+class ModelRegistry(Mapping):
+    def __init__(
+        self,
+        configs: dict[str, FilePath | ModelInferenceConfig],
+        budget_bytes: int | None = None,
+    ):
+        self.configs: dict[str, ModelInferenceConfig] = {
+            model_name: config
+            if isinstance(config, ModelInferenceConfig)
+            else ModelInferenceConfig(**load_json(config))
+            for model_name, config in configs.items()
+        }
+        self.budget_bytes = budget_bytes
+        self.resident: OrderedDict[str, ModelInferenceComponent] = OrderedDict()
+        self.sizes: dict[str, int] = dict()
+        self.pending: dict[str, tuple[Future, int]] = dict()
+        self.stats = {
+            "loads": 0,
+            "evictions": 0,
+            "hits": 0,
+            "prefetched": 0,
+            "load_seconds": 0.0,
+            "wait_seconds": 0.0,
+        }
+        self.lock = threading.RLock()
+        self.loader: ThreadPoolExecutor | None = None
+
+    def __getitem__(self, model_name: str) -> ModelInferenceComponent:
+        with self.lock:
+            if model_name in self.resident:
+                self.resident.move_to_end(model_name)
+                self.stats["hits"] += 1
+                return self.resident[model_name]
+
+            config = self.configs[model_name]
+            future, _ = self.pending.pop(model_name, (None, 0))
+            if future is None:
+                self.make_room(self.expected_size(model_name))
+
+        # Loads run outside the lock, so a prefetch can be queued meanwhile
+        start = time.perf_counter()
+        if future is None:
+            component, load_seconds = self.load(config)
+        else:
+            component, load_seconds = future.result()
+        wait_seconds = time.perf_counter() - start
+
+        with self.lock:
+            self.stats["prefetched"] += future is not None
+            self.resident[model_name] = component
+            self.sizes[model_name] = resident_size(component)
+            self.stats["loads"] += 1
+            self.stats["load_seconds"] += load_seconds
+            self.stats["wait_seconds"] += wait_seconds
+            logger.info(
+                f"Loaded {model_name} ({self.sizes[model_name] / GIB:.2f} GiB) in "
+                f"{load_seconds:.2f}s, waited {wait_seconds:.2f}s, "
+                f"{self.resident_bytes / GIB:.2f} GiB resident over "
+                f"{len(self.resident)} model(s)"
+            )
+            return component
+
+    @staticmethod
+    def load(config: ModelInferenceConfig) -> tuple[ModelInferenceComponent, float]:
+        start = time.perf_counter()
+        component = ModelInferenceComponent(config)
+        return component, time.perf_counter() - start
+
+    def prefetch(self, model_name: str):
+        """Starts loading a model on a background thread, as long as it fits
+        the budget without evicting the model currently in use"""
+        with self.lock:
+            if model_name in self.resident or model_name in self.pending:
+                return
+
+            needed = self.expected_size(model_name)
+            if not self.make_room(needed, keep=1):
+                logger.info(f"Not prefetching {model_name}, it doesn't fit the budget")
+                return
+
+            if self.loader is None:
+                self.loader = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="prefetch"
+                )
+            self.pending[model_name] = (
+                self.loader.submit(self.load, self.configs[model_name]),
+                needed,
+            )
+
+    def overlap_efficiency(self, since: dict | None = None) -> float:
+        """Share of the loading time hidden behind inference, optionally
+        counted from an earlier snapshot of ``stats``"""
+        since = since or dict()
+        load_seconds = self.stats["load_seconds"] - since.get("load_seconds", 0.0)
+        wait_seconds = self.stats["wait_seconds"] - since.get("wait_seconds", 0.0)
+        if load_seconds <= 0:
+            return 0.0
+        return max(0.0, 1 - wait_seconds / load_seconds)
+
+    def __iter__(self):
+        return iter(self.configs)
+
+    def __len__(self) -> int:
+        return len(self.configs)
+
+    def __contains__(self, model_name) -> bool:
+        # Membership never loads a model
+        return model_name in self.configs
+
+    @property
+    def resident_bytes(self) -> int:
+        # Models still being prefetched already hold their share of the budget
+        return sum(self.sizes[model_name] for model_name in self.resident) + sum(
+            needed for _, needed in self.pending.values()
+        )
+
+    def expected_size(self, model_name: str) -> int:
+        return self.sizes.get(model_name) or estimate_size(self.configs[model_name])
+
+    def resident_sizes(self) -> dict[str, int]:
+        return {model_name: self.sizes[model_name] for model_name in self.resident}
+
+    def make_room(self, needed: int, keep: int = 0) -> bool:
+        """Evicts least recently used models, sparing the ``keep`` most recent
+        ones, until ``needed`` bytes fit the budget"""
+        if self.budget_bytes is None:
+            return True
+
+        if keep:
+            spared = list(self.resident)[-keep:]
+            spared_bytes = sum(self.sizes[model_name] for model_name in spared)
+            pending_bytes = sum(needed for _, needed in self.pending.values())
+            if spared_bytes + pending_bytes + needed > self.budget_bytes:
+                return False
+
+        while len(self.resident) > keep and (
+            self.resident_bytes + needed > self.budget_bytes
+        ):
+            self.evict(next(iter(self.resident)))
+        if needed > self.budget_bytes:
+            logger.warning(
+                f"A {needed / GIB:.2f} GiB model exceeds the "
+                f"{self.budget_bytes / GIB:.2f} GiB memory budget"
+            )
+        return True
+
+    def evict(self, model_name: str):
+        with self.lock:
+            component = self.resident.pop(model_name)
+            if component.cache is not None:
+                component.cache.close()
+            del component
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            self.stats["evictions"] += 1
+            logger.info(f"Evicted {model_name} to stay within the memory budget")
+
+    def order(self, model_names: list[str]) -> list[str]:
+        """Resident models first, most recently used leading, so a sweep over
+        the ensemble reuses what is still loaded before evicting it"""
+        resident = [
+            model_name
+            for model_name in reversed(self.resident)
+            if model_name in model_names
+        ]
+        return resident + [
+            model_name for model_name in model_names if model_name not in resident
+        ]
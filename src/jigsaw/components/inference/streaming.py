@@ -0,0 +1,41 @@
+from ...core import Directory, FilePath
+from typing import Iterator
+from pathlib import Path
+import pyarrow.parquet as pq
+import pandas as pd
+import os
+
+PART_PREFIX = "part-"
+PART_SUFFIX = ".parquet"
+
+
+def iter_chunks(path: FilePath, chunksize: int) -> Iterator[pd.DataFrame]:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def part_path(outdir: Directory, index: int) -> Path:
+    return outdir / f"{PART_PREFIX}{index:05d}{PART_SUFFIX}"
+
+
+def completed_parts(outdir: Directory) -> set[int]:
+    return {
+        int(name[len(PART_PREFIX) : -len(PART_SUFFIX)])
+        for name in os.listdir(outdir.path)
+        if name.startswith(PART_PREFIX) and name.endswith(PART_SUFFIX)
+    }
+
+
+def write_part(data: pd.DataFrame, outdir: Directory, index: int) -> Path:
+    # Write to a temporary file first so an interrupted run never leaves a
+    # truncated part behind that would be taken as finished on resume
+    path = part_path(outdir, index)
+    temp_path = path.with_suffix(".tmp")
+    data.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+    return path
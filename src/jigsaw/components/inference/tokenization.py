@@ -0,0 +1,116 @@
+from itertools import chain
+import numpy as np
+import torch
+
+
+class TokenizedPrompts:
+    def __init__(self, input_ids: np.ndarray, offsets: np.ndarray):
+        self.input_ids = input_ids
+        self.offsets = offsets
+
+    @classmethod
+    def encode(
+        cls,
+        tokenizer,
+        prompts: list[str],
+        max_length: int | None = None,
+        chunk_size: int = 4096,
+        add_special_tokens: bool = True,
+    ) -> "TokenizedPrompts":
+        ids, lengths = [], []
+        for idx in range(0, len(prompts), chunk_size):
+            encoded = tokenizer(
+                prompts[idx : idx + chunk_size],
+                truncation=max_length is not None,
+                max_length=max_length,
+                add_special_tokens=add_special_tokens,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )["input_ids"]
+            lengths.append(
+                np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+            )
+            ids.append(np.fromiter(chain.from_iterable(encoded), dtype=np.int32))
+
+        offsets = np.zeros(len(prompts) + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(np.concatenate(lengths), out=offsets[1:])
+        input_ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int32)
+        return cls(input_ids, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def append(self, suffix_ids: np.ndarray) -> "TokenizedPrompts":
+        suffix_ids = np.asarray(suffix_ids, dtype=np.int32)
+        n_rows, n_suffix = len(self), len(suffix_ids)
+        offsets = self.offsets + np.arange(n_rows + 1, dtype=np.int64) * n_suffix
+
+        input_ids = np.empty(len(self.input_ids) + n_rows * n_suffix, dtype=np.int32)
+        rows = np.repeat(np.arange(n_rows, dtype=np.int64), self.lengths)
+        input_ids[np.arange(len(self.input_ids)) + rows * n_suffix] = self.input_ids
+        input_ids[(offsets[1:, None] - n_suffix + np.arange(n_suffix)).ravel()] = (
+            np.tile(suffix_ids, n_rows)
+        )
+        return TokenizedPrompts(input_ids, offsets)
+
+    def drop_prefix(
+        self, n_tokens: int, max_length: int | None = None
+    ) -> "TokenizedPrompts":
+        """Drops the first ``n_tokens`` of every row and, with ``max_length``,
+        keeps at most the last ``max_length`` tokens of what is left"""
+        starts = self.offsets[:-1] + n_tokens
+        stops = self.offsets[1:]
+        if max_length is not None:
+            starts = np.maximum(starts, stops - max_length)
+        lengths = stops - starts
+
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        source = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return TokenizedPrompts(self.input_ids[source], offsets)
+
+    def common_prefix(self, prefix_ids: np.ndarray) -> int:
+        """Number of leading ``prefix_ids`` every row starts with"""
+        prefix_ids = np.asarray(prefix_ids, dtype=np.int32)
+        if not len(self) or not len(prefix_ids):
+            return 0
+        columns = np.arange(len(prefix_ids))
+        positions = np.minimum(
+            self.offsets[:-1, None] + columns, max(len(self.input_ids) - 1, 0)
+        )
+        matches = (self.input_ids[positions] == prefix_ids) & (
+            columns < self.lengths[:, None]
+        )
+        return int(np.cumprod(matches, axis=1).sum(axis=1).min())
+
+    def collate(
+        self,
+        indices: np.ndarray,
+        pad_token_id: int,
+        padding_side: str = "right",
+    ) -> dict[str, torch.Tensor]:
+        indices = np.asarray(indices)
+        lengths = self.offsets[indices + 1] - self.offsets[indices]
+        width = int(lengths.max()) if len(lengths) else 0
+
+        rows = np.repeat(np.arange(len(indices)), lengths)
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cols = np.arange(int(lengths.sum())) - starts
+        source = np.repeat(self.offsets[indices], lengths) + cols
+        if padding_side == "left":
+            cols += np.repeat(width - lengths, lengths)
+
+        input_ids = np.full((len(indices), width), pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(indices), width), dtype=np.int64)
+        input_ids[rows, cols] = self.input_ids[source]
+        attention_mask[rows, cols] = 1
+
+        return {
+            "input_ids": torch.from_numpy(input_ids),
+            "attention_mask": torch.from_numpy(attention_mask),
+        }
@@ -0,0 +1,249 @@
+from ..core import (
+    FilePath,
+    DataSplitConfig,
+    DataTransformationArtifact,
+    ModelTrainingConfig,
+    ModelTrainingArtifact,
+    OutOfFoldArtifact,
+    ClassificationMetric,
+)
+from ..errors import ConfigurationError
+from ..utils.common import load_csv, load_json, save_csv, get_physical_cores
+from .. import logger
+from .train import ModelTrainingComponent, JigsawDataset, augment_data
+from .data.transformation import DataTransformationComponent
+from .data.transformation.folding import split_dataset
+from .inference.registry import WEIGHT_SUFFIXES, GIB
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from sklearn.metrics import roc_auc_score, accuracy_score
+from transformers import AutoTokenizer
+from pathlib import Path
+import multiprocessing as mp
+import pandas as pd
+import numpy as np
+import torch
+import time
+import os
+
+# Adam keeps fp32 weights, gradients and two moments, activations come on top
+TRAINING_MEMORY_FACTOR = 4
+
+
+def _train_fold(
+    config: ModelTrainingConfig,
+    transform_artifact: DataTransformationArtifact,
+    n_threads: int,
+    device: str | None = None,
+) -> ModelTrainingArtifact:
+    # Each fold runs in a fresh process, so pinning the device before CUDA
+    # initialises is enough to keep folds on their own GPU
+    if device is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = device
+    torch.set_num_threads(n_threads)
+    return ModelTrainingComponent(config, transform_artifact=transform_artifact)()
+
+
+def available_memory() -> int | None:
+    try:
+        with open("/proc/meminfo") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_job_memory(config: ModelTrainingConfig) -> int:
+    if config.fold_memory_gb is not None:
+        return int(config.fold_memory_gb * GIB)
+    model_path = Path(str(config.model))
+    if not model_path.is_dir():
+        return 0
+    return TRAINING_MEMORY_FACTOR * sum(
+        file.stat().st_size
+        for file in model_path.iterdir()
+        if file.suffix in WEIGHT_SUFFIXES
+    )
+
+
+class OutOfFoldTrainingComponent:
+    def __init__(self, config: FilePath | ModelTrainingConfig):
+        if isinstance(config, FilePath):
+            config = ModelTrainingConfig(**load_json(config))
+
+        if config.n_folds < 2:
+            e = ConfigurationError(
+                config.name, "out-of-fold training needs at least 2 folds"
+            )
+            logger.error(e)
+            raise e
+
+        self.config = config
+        self.outdir = config.outdir // "oof"
+
+    def __call__(self) -> OutOfFoldArtifact:
+        start = time.perf_counter()
+        # Transformation, folding and tokenization happen once, for every fold
+        transform_artifact = DataTransformationComponent(self.config.transformation)()
+        data, oof_file_path = self.prepare_folds(transform_artifact)
+        # Built from the file the folds read, so their prompts match exactly
+        self.warm_token_cache(load_csv(oof_file_path))
+
+        jobs = {
+            fold: self.config.model_copy(
+                update={
+                    "fold": fold,
+                    "out_of_fold": True,
+                    "outdir": self.config.outdir // f"fold_{fold}",
+                    "oof_file_path": oof_file_path,
+                }
+            )
+            for fold in range(self.config.n_folds)
+        }
+        folds = self.schedule(jobs, transform_artifact)
+
+        predictions = np.full(len(data), np.nan, dtype=np.float32)
+        for artifact in folds.values():
+            with np.load(artifact.prediction_file_path) as fold_predictions:
+                predictions[fold_predictions["rows"]] = fold_predictions["predictions"]
+
+        prediction_file_path = self.outdir / "oof.npy"
+        np.save(prediction_file_path, predictions)
+        save_csv(data.assign(oof_prediction=predictions), self.outdir / "oof.csv")
+
+        labels = data["rule_violation"].to_numpy()
+        metrics = ClassificationMetric(
+            roc_auc=roc_auc_score(labels, predictions),
+            accuracy=accuracy_score(labels, (predictions > 0.5).astype(np.int32)),
+        )
+        wall_seconds = time.perf_counter() - start
+        logger.info(
+            f"{self.config.name} : {self.config.n_folds}-fold OOF roc_auc "
+            f"{metrics.roc_auc:.4f} in {wall_seconds:.1f}s"
+        )
+        return OutOfFoldArtifact(
+            name=self.config.name,
+            oof_file_path=oof_file_path,
+            prediction_file_path=prediction_file_path,
+            folds=folds,
+            best_fold=max(folds, key=lambda fold: folds[fold].metrics.roc_auc),
+            metrics=metrics,
+            wall_seconds=wall_seconds,
+        )
+
+    def prepare_folds(
+        self, transform_artifact: DataTransformationArtifact
+    ) -> tuple[pd.DataFrame, FilePath]:
+        frames = [load_csv(transform_artifact.train_file_path)]
+        if transform_artifact.valid_file_path and os.path.exists(
+            transform_artifact.valid_file_path
+        ):
+            frames.append(load_csv(transform_artifact.valid_file_path))
+        data = pd.concat(frames, axis=0).reset_index(drop=True)
+        if self.config.transformation.augmentations:
+            data = augment_data(data).reset_index(drop=True)
+
+        transformation = self.config.transformation.model_copy(
+            update={
+                "splitter": DataSplitConfig(
+                    type="mlskfold",
+                    n_splits=self.config.n_folds,
+                    labels=["rule", "rule_violation"],
+                )
+            }
+        )
+        data = split_dataset(
+            transformation,
+            data=data,
+            dataname=next(iter(transformation.schemas)),
+            filename="oof.csv",
+        )
+
+        oof_file_path = self.outdir / "folds.csv"
+        save_csv(data, oof_file_path)
+        return data, oof_file_path
+
+    def warm_token_cache(self, data: pd.DataFrame):
+        # Completion folds tokenize their own rows, they share no store
+        if self.config.type == "completion":
+            return
+        tokenizer = AutoTokenizer.from_pretrained(self.config.model)
+        JigsawDataset(self.config, data.copy(), tokenizer)
+
+    def get_slots(self) -> tuple[int, list[str | None]]:
+        if torch.cuda.is_available():
+            devices = [str(idx) for idx in range(torch.cuda.device_count())]
+        else:
+            devices = [None]
+        n_slots = len(devices) if devices[0] is not None else get_physical_cores()
+        return min(self.config.fold_workers or n_slots, self.config.n_folds), devices
+
+    def schedule(
+        self,
+        jobs: dict[int, ModelTrainingConfig],
+        transform_artifact: DataTransformationArtifact,
+    ) -> dict[int, ModelTrainingArtifact]:
+        n_slots, devices = self.get_slots()
+        n_threads = max(1, get_physical_cores() // n_slots)
+        job_bytes = estimate_job_memory(self.config)
+        budget = available_memory()
+        logger.info(
+            f"{self.config.name} : {len(jobs)} fold(s) over {n_slots} slot(s), "
+            f"{n_threads} thread(s) each, ~{job_bytes / GIB:.2f} GiB per fold"
+            + (f" within {budget / GIB:.2f} GiB" if budget else "")
+        )
+
+        pending = list(jobs)
+        running: dict[Future, tuple[int, str | None]] = dict()
+        artifacts = dict()
+        # Fresh processes per fold: spawn keeps CUDA and the tokenizer's
+        # thread pool out of the parent's state
+        with ProcessPoolExecutor(
+            n_slots, mp_context=mp.get_context("spawn"), max_tasks_per_child=1
+        ) as pool:
+            try:
+                while pending or running:
+                    while pending and len(running) < n_slots:
+                        reserved = job_bytes * len(running)
+                        if running and budget and reserved + job_bytes > budget:
+                            break
+                        if not running and budget and job_bytes > budget:
+                            logger.warning(
+                                f"A fold needs ~{job_bytes / GIB:.2f} GiB, more than "
+                                f"the {budget / GIB:.2f} GiB available"
+                            )
+
+                        fold = pending.pop(0)
+                        # Least loaded device, when folds outnumber GPUs
+                        busy = [device for _, device in running.values()]
+                        device = min(devices, key=busy.count)
+                        future = pool.submit(
+                            _train_fold,
+                            jobs[fold],
+                            transform_artifact,
+                            n_threads,
+                            device,
+                        )
+                        running[future] = (fold, device)
+                        logger.info(
+                            f"{self.config.name} : fold {fold} started"
+                            + (f" on cuda:{device}" if device is not None else "")
+                        )
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        fold, _ = running.pop(future)
+                        artifacts[fold] = future.result()
+                        logger.info(
+                            f"{self.config.name} : fold {fold} finished, roc_auc "
+                            f"{artifacts[fold].metrics.roc_auc:.4f}"
+                        )
+            except Exception as e:
+                pool.shutdown(cancel_futures=True)
+                logger.error(e)
+                raise e
+        return dict(sorted(artifacts.items()))
@@ -4,13 +4,14 @@ import torch
 
 from transformers import (
     AutoTokenizer,
+    AutoModelForCausalLM,
     AutoModelForSequenceClassification,
     TrainingArguments,
     Trainer,
     DataCollatorWithPadding,
 )
 
-from .. import PROJECT_NAME
+from .. import PROJECT_NAME, logger
 
 from ..core import (
     FilePath,
@@ -21,28 +22,51 @@ from ..core import (
 )
 
 from .data.transformation import DataTransformationComponent
+from .dataset.token_store import TokenStore
+from .dataset.sampler import LengthGroupedBatchSampler
+from .dataset.packing import (
+    PackedCompletionCollator,
+    encode_completions,
+    pack_examples,
+)
+from .inference.completion import ANSWERS, PrefixCachedScorer
+from ..constants.prompt import render_prompts
+from torch.utils.data import DataLoader
 
 from transformers.utils import is_torch_bf16_gpu_available
 from sklearn.metrics import roc_auc_score, accuracy_score
 import mlflow
 from scipy.special import softmax as softmax_scipy
 import numpy as np
+import pandas as pd
 
 
 class ModelTrainingComponent:
-    def __init__(self, config: FilePath | ModelTrainingConfig):
+    def __init__(
+        self,
+        config: FilePath | ModelTrainingConfig,
+        transform_artifact: DataTransformationArtifact | None = None,
+    ):
         if isinstance(config, FilePath):
             config = ModelTrainingConfig(**load_json(config))
 
         self.config = config
         self.transform_config = config.transformation
+        # Fold jobs share the transformation their orchestrator already ran
         self.transform_artifact: DataTransformationArtifact = (
-            DataTransformationComponent(self.transform_config)()
+            transform_artifact or DataTransformationComponent(self.transform_config)()
         )
         print(self.transform_artifact)
         self.exp_name = f"{PROJECT_NAME}_{config.name.replace('/', '_')}"
 
-    def get_dataset(self, valid=False):
+    def get_data(self, valid=False) -> tuple[pd.DataFrame, np.ndarray | None]:
+        if self.config.out_of_fold:
+            # Every fold reads the whole prepared frame, so they all hit the
+            # same token store, and keeps its own rows
+            data = load_csv(self.config.oof_file_path)
+            in_fold = (data["fold"] == self.config.fold).to_numpy()
+            return data, np.flatnonzero(in_fold if valid else ~in_fold)
+
         file_path = (
             self.transform_artifact.valid_file_path
             if valid
@@ -51,29 +75,49 @@ class ModelTrainingComponent:
 
         data = load_csv(file_path)
         if self.transform_config.augmentations:
-            augs = Augmentor(
-                augments=[["url_to_semantics", 1.0]],
-                frac=1.0,
-                resample=1,
-                include_original=False,
-                weight=1,
-            )
-            data = augs.augment(data)
+            data = augment_data(data)
+        return data, None
 
-        dataset = JigsawDataset(self.config, data, self.tokenizer)
-        return dataset
+    def get_dataset(self, valid=False):
+        data, rows = self.get_data(valid=valid)
+        if self.config.type == "completion":
+            return CompletionDataset(
+                self.config,
+                data,
+                self.tokenizer,
+                rows=rows,
+                pack=self.config.pack_sequences and not valid,
+            )
+        return JigsawDataset(self.config, data, self.tokenizer, rows=rows)
 
     def get_model_tokenizer(self):
+        self.tokenizer = AutoTokenizer.from_pretrained(self.config.model)
+        if self.config.type == "completion":
+            self.model = AutoModelForCausalLM.from_pretrained(self.config.model)
+            return
         self.model = AutoModelForSequenceClassification.from_pretrained(
             self.config.model, num_labels=2
         )
-        self.tokenizer = AutoTokenizer.from_pretrained(self.config.model)
+
+    def get_collator(self):
+        if self.config.type != "completion":
+            return DataCollatorWithPadding(tokenizer=self.tokenizer)
+
+        # Flash attention splits packs on the position resets, the others
+        # need the block-diagonal mask
+        flash = (self.model.config._attn_implementation or "").startswith("flash")
+        return PackedCompletionCollator(
+            pad_token_id=self.tokenizer.pad_token_id
+            if self.tokenizer.pad_token_id is not None
+            else self.tokenizer.eos_token_id,
+            attention="position-ids" if flash else "block-diagonal",
+        )
 
     def get_trainer(self):
         self.get_model_tokenizer()
         train_dataset = self.get_dataset()
 
-        collator = DataCollatorWithPadding(tokenizer=self.tokenizer)
+        collator = self.get_collator()
 
         training_args = TrainingArguments(
             output_dir=str(self.config.outdir),
@@ -106,11 +150,32 @@ class ModelTrainingComponent:
             report_to=["mlflow"],
             optim=self.config.optimizer,
         )
-        return Trainer(
+        if not self.config.group_by_length:
+            return Trainer(
+                model=self.model,
+                args=training_args,
+                train_dataset=train_dataset,
+                data_collator=collator,
+            )
+
+        batch_sampler = LengthGroupedBatchSampler(
+            train_dataset.lengths,
+            batch_size=training_args.per_device_train_batch_size,
+            max_tokens=self.config.max_tokens_per_batch,
+            seed=self.config.seed,
+        )
+        random_waste, grouped_waste = batch_sampler.padding_waste()
+        logger.info(
+            f"{self.config.name} : padding waste {random_waste:.2%} with random "
+            f"batches, {grouped_waste:.2%} grouped by length over "
+            f"{len(batch_sampler)} batch(es)"
+        )
+        return LengthGroupedTrainer(
             model=self.model,
             args=training_args,
             train_dataset=train_dataset,
             data_collator=collator,
+            batch_sampler=batch_sampler,
         )
 
     def __call__(
@@ -142,6 +207,9 @@ class ModelTrainingComponent:
             name=self.config.name,
             model_path=self.config.outdir,
             metrics=metrics,
+            prediction_file_path=self.config.outdir / "oof_predictions.npz"
+            if self.config.out_of_fold
+            else None,
             # metrics=ClassificationMetric(roc_auc=0.5, accuracy=0.5),
         )
 
@@ -150,42 +218,160 @@ class ModelTrainingComponent:
         self.trainer.save_model(str(self.config.outdir))
 
     def evaluate(self) -> ClassificationMetric:
-        test_dataset = self.get_dataset(valid=True)
-        predictions = self.trainer.predict(test_dataset)
-        preds, labels = (
-            softmax_scipy(predictions.predictions, axis=1)[:, 1],
-            test_dataset.labels,
-        )
+        if self.config.type == "completion":
+            preds, labels, rows = self.evaluate_completion()
+        else:
+            test_dataset = self.get_dataset(valid=True)
+            predictions = self.trainer.predict(test_dataset)
+            preds, labels, rows = (
+                softmax_scipy(predictions.predictions, axis=1)[:, 1],
+                test_dataset.labels,
+                test_dataset.rows,
+            )
+        if self.config.out_of_fold:
+            np.savez(
+                self.config.outdir / "oof_predictions.npz",
+                rows=rows,
+                predictions=preds,
+            )
         roc_auc = roc_auc_score(labels, preds)
         accuracy = accuracy_score(labels, (preds > 0.5).astype(np.int32))
         return ClassificationMetric(roc_auc=roc_auc, accuracy=accuracy)
 
+    def evaluate_completion(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Scored the way inference scores, the answer read off the prompt's
+        # last token, rather than through full-vocabulary logits per token
+        data, rows = self.get_data(valid=True)
+        rows = np.arange(len(data)) if rows is None else rows
+        scorer = PrefixCachedScorer(
+            self.model.eval(),
+            self.tokenizer,
+            batch_size=self.config.valid_batch_size or 8,
+            max_length=self.config.max_length,
+        )
+        subset = data.iloc[rows]
+        return scorer(subset), subset["rule_violation"].to_numpy(), rows
+
+
+def augment_data(data: pd.DataFrame) -> pd.DataFrame:
+    augs = Augmentor(
+        augments=[["url_to_semantics", 1.0]],
+        frac=1.0,
+        resample=1,
+        include_original=False,
+        weight=1,
+    )
+    return augs.augment(data)
+
+
+class LengthGroupedTrainer(Trainer):
+    def __init__(self, *args, batch_sampler: LengthGroupedBatchSampler, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sampler = batch_sampler
+
+    def get_train_dataloader(self) -> DataLoader:
+        # Accelerate forwards set_epoch to the batch sampler, which reseeds it
+        return self.accelerator.prepare(
+            DataLoader(
+                self.train_dataset,
+                batch_sampler=self.batch_sampler,
+                collate_fn=self.data_collator,
+                num_workers=self.args.dataloader_num_workers,
+                pin_memory=self.args.dataloader_pin_memory,
+            )
+        )
+
 
 class JigsawDataset:
-    def __init__(self, config, data, tokenizer):
+    def __init__(self, config, data, tokenizer, rows=None):
         data["prompt"] = data["rule"] + "[SEP]" + data["body"]
         self.data = data
         if isinstance(tokenizer, str):
             tokenizer = AutoTokenizer.from_pretrained(config.model_name)
 
-        self.encodings = tokenizer(
-            data["prompt"].tolist(), truncation=True, max_length=config.max_length
+        # The store always covers the whole frame, ``rows`` picks the subset
+        self.encodings = TokenStore.build(
+            tokenizer,
+            data["prompt"].tolist(),
+            cache_dir=config.token_cache_dir or config.outdir // "tokens",
+            max_length=config.max_length,
         )
+        self.rows = np.arange(len(data)) if rows is None else np.asarray(rows)
         self.labels = (
-            self.data["rule_violation"].tolist()
+            self.data["rule_violation"].to_numpy()[self.rows].tolist()
             if "rule_violation" in self.data.columns
             else None
         )
 
     def __len__(self) -> int:
-        return len(self.encodings["input_ids"])
+        return len(self.rows)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.encodings.lengths[self.rows]
 
     def __getitem__(
         self,
         idx: int,
     ):
-        item = {key: torch.tensor(val[idx]) for key, val in self.encodings.items()}
+        item = self.encodings[self.rows[idx]]
         if self.labels:
             item["labels"] = torch.tensor(self.labels[idx])
 
         return item
+
+
+class CompletionDataset:
+    """Prompts followed by their " Yes"/" No" answer, the loss on the answer
+    alone. Packed, the examples are concatenated into sequences of up to
+    ``pack_length`` tokens instead of one padded row each"""
+
+    def __init__(self, config, data, tokenizer, rows=None, pack=False):
+        self.data = data
+        self.rows = np.arange(len(data)) if rows is None else np.asarray(rows)
+        subset = data.iloc[self.rows]
+        self.labels = subset["rule_violation"].to_numpy().tolist()
+
+        input_ids, labels, offsets = encode_completions(
+            tokenizer,
+            render_prompts(subset, tokenizer).tolist(),
+            np.where(subset["rule_violation"] == 1, *ANSWERS).tolist(),
+        )
+        if pack:
+            table = pack_examples(
+                input_ids,
+                labels,
+                offsets,
+                max_length=config.pack_length or config.max_length,
+                seed=config.seed,
+            )
+            # Flat values sharing one offsets index, like the token store
+            self.offsets = table["input_ids"].combine_chunks().offsets.to_numpy()
+            self.starts = self.offsets[:-1]
+            self.fields = {
+                name: table[name].combine_chunks().values.to_numpy()
+                for name in table.column_names
+            }
+        else:
+            # Prompts are cut from the left, so the answer always survives
+            self.offsets = offsets
+            self.starts = (
+                np.maximum(offsets[:-1], offsets[1:] - config.max_length)
+                if config.max_length
+                else offsets[:-1]
+            )
+            self.fields = {"input_ids": input_ids, "labels": labels}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.offsets[1:] - self.starts
+
+    def __getitem__(self, idx: int) -> dict[str, torch.Tensor]:
+        start, stop = self.starts[idx], self.offsets[idx + 1]
+        return {
+            name: torch.from_numpy(values[start:stop].astype(np.int64))
+            for name, values in self.fields.items()
+        }
@@ -18,6 +18,7 @@ from ..core import (
     DataDriftConfig,
     TripletDataConfig,
     DataSplitConfig,
+    CascadeConfig,
     DataIngestionConfig,
     DataValidationConfig,
     DataTransformationConfig,
@@ -25,6 +26,7 @@ from ..core import (
     MultiModelTrainingConfig,
     ModelInferenceConfig,
     MultiModelInferenceConfig,
+    EnsembleConfig,
     DataIngestionArtifact,
     DataValidationArtifact,
     MultiModelTrainingArtifact,
@@ -269,7 +271,31 @@ class ConfigurationManager:
                 padding=model_config.get(
                     "padding", self.config.get("padding", "longest")
                 ),
+                token_cache_dir=model_config.get(
+                    "token-cache-dir",
+                    self.config.get("token-cache-dir", None),
+                )
+                or self.artifact_root // "tokens",
+                group_by_length=model_config.get(
+                    "group-by-length", self.config.get("group-by-length", False)
+                ),
+                max_tokens_per_batch=model_config.get(
+                    "train-max-tokens", self.config.get("train-max-tokens", None)
+                ),
+                pack_sequences=model_config.get(
+                    "pack-sequences", self.config.get("pack-sequences", False)
+                ),
+                pack_length=model_config.get(
+                    "pack-length", self.config.get("pack-length", None)
+                ),
                 fold=model_config.get("fold", self.config.get("fold", -1)),
+                n_folds=model_config.get("n-folds", self.config.get("n-folds", 1)),
+                fold_workers=model_config.get(
+                    "fold-workers", self.config.get("fold-workers", None)
+                ),
+                fold_memory_gb=model_config.get(
+                    "fold-memory-gb", self.config.get("fold-memory-gb", None)
+                ),
             )
 
             json_path = training_params.outdir / "training_params.json"
@@ -298,11 +324,100 @@ class ConfigurationManager:
                 max_length=model_config.get("max-lenght")
                 or self.config.get("max-length")
                 or 256,
-                tta=False,
-                ensmeble_weight=1,
+                tta=model_config.get("tta", self.config.get("tta", False)),
+                tta_views=model_config.get(
+                    "tta-views", self.config.get("tta-views", 4)
+                ),
+                tta_augments=model_config.get("tta-augments")
+                or self.config.get("tta-augments", [["url_to_semantics", 1.0]]),
+                seed=model_config.get("seed", self.config.get("seed", 1234)),
+                ensemble_weight=model_config.get("ensemble-weight", 1.0),
+                bucketing=model_config.get(
+                    "inference-bucketing",
+                    self.config.get("inference-bucketing", False),
+                ),
+                max_tokens_per_batch=model_config.get("inference-max-tokens")
+                or self.config.get("inference-max-tokens"),
+                quantization=model_config.get(
+                    "inference-quantization",
+                    self.config.get("inference-quantization", None),
+                ),
+                compare_reference=model_config.get(
+                    "compare-reference", self.config.get("compare-reference", False)
+                ),
+                backend=model_config.get(
+                    "inference-backend", self.config.get("inference-backend", "torch")
+                ),
+                cache_dir=model_config.get(
+                    "inference-cache-dir", self.config.get("inference-cache-dir", None)
+                ),
+                cache_size=model_config.get(
+                    "inference-cache-size",
+                    self.config.get("inference-cache-size", 100_000),
+                ),
+                prompt=model_config.get(
+                    "prompt", self.config.get("prompt", "zero-shot")
+                ),
+                pooling=model_config.get("pooling", self.config.get("pooling", "mean")),
+                n_workers=model_config.get(
+                    "inference-workers", self.config.get("inference-workers", 1)
+                ),
+                onnx_atol=model_config.get(
+                    "onnx-atol", self.config.get("onnx-atol", 1e-4)
+                ),
+                profile=model_config.get(
+                    "inference-profile", self.config.get("inference-profile", False)
+                ),
+                overlap=model_config.get(
+                    "inference-overlap", self.config.get("inference-overlap", False)
+                ),
+                prefetch_batches=model_config.get(
+                    "inference-prefetch-batches",
+                    self.config.get("inference-prefetch-batches", 4),
+                ),
+                transfer_every=model_config.get(
+                    "inference-transfer-every",
+                    self.config.get("inference-transfer-every", 16),
+                ),
             )
             json_path = inference_params.outdir / "inference_params.json"
             save_json(inference_params.model_dump(mode="json"), json_path)
             model_configs[model_name] = json_path
 
-        return MultiModelInferenceConfig(outdir=target_dir, models=model_configs)
+        cascade_config = None
+        if self.config.get("cascade", None):
+            try:
+                band = self.config.cascade.get("band", None) or [None, None]
+                cascade_config = CascadeConfig(
+                    model=self.config.cascade.model,
+                    lower=band[0],
+                    upper=band[1],
+                    oof_path=self.config.cascade.get("oof-path", None),
+                    target_auc_loss=self.config.cascade.get("target-auc-loss", 0.002),
+                )
+            except Exception as e:
+                e = ConfigurationError(message=e)
+                logger.error(e)
+                raise e
+
+        ensemble_config = EnsembleConfig(
+            outdir=target_dir // "ensemble",
+            weights={
+                model_name: model_config.get("ensemble-weight", 1.0)
+                for model_name, model_config in self.config.models.items()
+            },
+            method=self.config.get("ensemble-method", "weighted"),
+            chunksize=self.config.get("inference-chunksize", 100_000),
+        )
+
+        return MultiModelInferenceConfig(
+            outdir=target_dir,
+            models=model_configs,
+            chunksize=self.config.get("inference-chunksize", 100_000),
+            cascade=cascade_config,
+            ensemble=ensemble_config,
+            executor=self.config.get("inference-executor", "sequential"),
+            threads_per_model=self.config.get("inference-threads-per-model", None),
+            memory_budget_gb=self.config.get("inference-memory-budget-gb", None),
+            prefetch=self.config.get("inference-prefetch", True),
+        )
@@ -1,3 +1,5 @@
+import pandas as pd
+
 POSITIVE_ANSWER = "YES"
 NEGATIVE_ANSWER = "NO"
 
@@ -6,6 +8,8 @@ You are given a comment from reddit and a rule. Your task is classify if it viol
 """
 
 COMPLETION_PHRASE = "Violation"
+RULE_SENTINEL = "<<jigsaw-rule>>"
+BODY_SENTINEL = "<<jigsaw-body>>"
 
 
 def few_shot_completion_prompt(row, *args):
@@ -70,3 +74,31 @@ def zero_shot_chat_prompt(row, tokenizer):
     )
 
     return messages
+
+
+def render_prompts(data: pd.DataFrame, tokenizer) -> pd.Series:
+    """Renders the chat template once around placeholders and fills in every
+    row with vectorised string concatenation"""
+    template = zero_shot_chat_prompt(
+        pd.Series({"rule": RULE_SENTINEL, "body": BODY_SENTINEL}), tokenizer
+    )
+    # A template that rewrites the content can't be filled in, render each row
+    if (
+        template.count(RULE_SENTINEL) != 1
+        or template.count(BODY_SENTINEL) != 1
+        or template.index(RULE_SENTINEL) > template.index(BODY_SENTINEL)
+    ):
+        return render_rows(data, tokenizer)
+
+    head, rest = template.split(RULE_SENTINEL)
+    middle, tail = rest.split(BODY_SENTINEL)
+    prompts = head + data["rule"].str.strip() + middle + data["body"].str.strip() + tail
+    if len(data) and prompts.iloc[0] != zero_shot_chat_prompt(data.iloc[0], tokenizer):
+        return render_rows(data, tokenizer)
+    return prompts
+
+
+def render_rows(data: pd.DataFrame, tokenizer) -> pd.Series:
+    if not len(data):
+        return pd.Series([], index=data.index, dtype=object)
+    return data.apply(zero_shot_chat_prompt, args=(tokenizer,), axis=1)
@@ -6,6 +6,7 @@ from .config_entity import (
     MultiModelTrainingConfig,
     ModelInferenceConfig,
     MultiModelInferenceConfig,
+    EnsembleConfig,
 )
 from .util_entity import (
     DataSchema,
@@ -13,6 +14,8 @@ from .util_entity import (
     DataSplitConfig,
     DataDriftConfig,
     TripletDataConfig,
+    CascadeConfig,
+    InferenceMetric,
     ClassificationMetric,
 )
 
@@ -21,9 +24,13 @@ from .artifact_entity import (
     DataValidationArtifact,
     DataTransformationArtifact,
     ModelTrainingArtifact,
+    OutOfFoldArtifact,
     MultiModelTrainingArtifact,
     ModelInferenceArtifact,
     MultiModelInferenceArtifact,
+    EnsembleArtifact,
+    StreamingInferenceArtifact,
+    CascadeInferenceArtifact,
 )
 
 from .io_types import ZipFile, Directory, FilePath
@@ -37,6 +44,8 @@ __all__ = [
     "DataDriftConfig",
     "DataSplitConfig",
     "TripletDataConfig",
+    "CascadeConfig",
+    "InferenceMetric",
     "ClassificationMetric",
     "DataIngestionConfig",
     "DataValidationConfig",
@@ -45,11 +54,16 @@ __all__ = [
     "MultiModelTrainingConfig",
     "ModelInferenceConfig",
     "MultiModelInferenceConfig",
+    "EnsembleConfig",
     "DataIngestionArtifact",
     "DataValidationArtifact",
     "DataTransformationArtifact",
     "ModelTrainingArtifact",
+    "OutOfFoldArtifact",
     "MultiModelTrainingArtifact",
     "ModelInferenceArtifact",
     "MultiModelInferenceArtifact",
+    "EnsembleArtifact",
+    "StreamingInferenceArtifact",
+    "CascadeInferenceArtifact",
 ]
@@ -2,7 +2,7 @@ from .io_types import Directory, FilePath
 from pydantic import BaseModel
 from typing import Optional
 from .util_entity import DataSchema
-from .util_entity import ClassificationMetric
+from .util_entity import ClassificationMetric, InferenceMetric
 
 
 class DataIngestionArtifact(BaseModel):
@@ -28,11 +28,40 @@ class DataTransformationArtifact(BaseModel):
 class ModelInferenceArtifact(BaseModel):
     name: str
     prediction_file_path: FilePath
+    score_file_path: Optional[FilePath] = None
+    metrics: Optional[InferenceMetric] = None
+
+
+class EnsembleArtifact(BaseModel):
+    submission_file_path: FilePath
+    blend_file_path: FilePath
+    method: str
+    n_rows: int
 
 
 class MultiModelInferenceArtifact(BaseModel):
     outdir: Directory
     models: dict[str, ModelInferenceArtifact]
+    ensemble: Optional[EnsembleArtifact] = None
+    wall_seconds: Optional[float] = None
+    load_seconds: Optional[float] = None
+    overlap_efficiency: Optional[float] = None
+
+
+class StreamingInferenceArtifact(BaseModel):
+    prediction_dir: Directory
+    models: list[str]
+    n_rows: int
+    n_chunks: int
+    resumed_chunks: int = 0
+
+
+class CascadeInferenceArtifact(BaseModel):
+    prediction_file_path: FilePath
+    report_file_path: FilePath
+    band: tuple[float, float]
+    stage_fractions: dict[str, float]
+    compute_saved: float
 
 
 class ModelTrainingArtifact(BaseModel):
@@ -41,8 +70,20 @@ class ModelTrainingArtifact(BaseModel):
     config_path: Optional[str] = None
     model_path: FilePath | Directory
     metrics: ClassificationMetric
+    prediction_file_path: Optional[FilePath] = None
+
+
+class OutOfFoldArtifact(BaseModel):
+    name: str
+    oof_file_path: FilePath
+    prediction_file_path: FilePath
+    folds: dict[int, ModelTrainingArtifact]
+    best_fold: int
+    metrics: ClassificationMetric
+    wall_seconds: float
 
 
 class MultiModelTrainingArtifact(BaseModel):
     outdir: Directory
     models: dict[str, ModelTrainingArtifact]
+    out_of_fold: dict[str, OutOfFoldArtifact] = dict()
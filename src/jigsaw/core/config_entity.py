@@ -7,6 +7,7 @@ from .util_entity import (
     DataDriftConfig,
     TripletDataConfig,
     DataSplitConfig,
+    CascadeConfig,
 )
 import json
 import os
@@ -83,8 +84,17 @@ class ModelTrainingConfig(BaseModel):
 
     max_length: Optional[int] = None
     padding: Optional[bool | str] = None
+    token_cache_dir: Optional[Directory] = None
+    group_by_length: bool = False
+    max_tokens_per_batch: Optional[int] = None
+    pack_sequences: bool = False
+    pack_length: Optional[int] = None
     fold: int = -1
     out_of_fold: bool = False
+    n_folds: int = 1
+    fold_workers: Optional[int] = None
+    fold_memory_gb: Optional[float] = None
+    oof_file_path: Optional[FilePath] = None
 
     model_config = {
         "ser_json_t": True,
@@ -101,6 +111,13 @@ class ModelTrainingConfig(BaseModel):
             outdir = Directory(path=outdir)
         return outdir
 
+    @field_validator("token_cache_dir", mode="before")
+    @classmethod
+    def fix_token_cache_dir(cls, token_cache_dir: FilePath | None) -> Directory | None:
+        if isinstance(token_cache_dir, FilePath):
+            token_cache_dir = Directory(path=token_cache_dir)
+        return token_cache_dir
+
     def model_post_init(self, __context):
         if os.path.basename(self.outdir.path) != self.name:
             self.outdir //= self.name
@@ -167,8 +184,27 @@ class ModelInferenceConfig(BaseModel):
     batch_size: Optional[int] = None
     train_path: Optional[Directory | FilePath] = None
     tta: bool = False
+    tta_views: int = 4
+    tta_augments: list[tuple[str, float]] = [("url_to_semantics", 1.0)]
+    seed: int = 1234
     max_length: int = 256
-    ensemble_weight: int = 1
+    ensemble_weight: float = 1.0
+    bucketing: bool = False
+    max_tokens_per_batch: Optional[int] = None
+    quantization: Optional[Literal["dynamic-int8"]] = None
+    compare_reference: bool = False
+    backend: Literal["torch", "onnx"] = "torch"
+    onnx_atol: float = 1e-4
+    cache_dir: Optional[Directory] = None
+    cache_size: int = 100_000
+    n_workers: int = 1
+    prompt: Literal["zero-shot", "few-shot"] = "zero-shot"
+    pooling: Literal["mean", "cls"] = "mean"
+    profile: bool = False
+    overlap: bool = False
+    overlap_window: int = 64
+    prefetch_batches: int = 4
+    transfer_every: int = 16
 
     model_config = {
         "ser_json_t": True,
@@ -185,11 +221,34 @@ class ModelInferenceConfig(BaseModel):
             outdir = Directory(path=outdir)
         return outdir
 
+    @field_validator("cache_dir", mode="before")
+    @classmethod
+    def fix_cache_dir(cls, cache_dir: FilePath | None) -> Directory | None:
+        if isinstance(cache_dir, FilePath):
+            cache_dir = Directory(path=cache_dir)
+        return cache_dir
+
     def model_post_init(self, __context):
         if os.path.basename(self.outdir.path) != self.name:
             self.outdir //= self.name
 
 
+class EnsembleConfig(BaseModel):
+    outdir: Directory
+    weights: dict[str, float]
+    method: Literal["weighted", "rank", "geometric"] = "weighted"
+    chunksize: int = 100_000
+    id_column: str = "row_id"
+    target_column: str = "rule_violation"
+
+
 class MultiModelInferenceConfig(BaseModel):
     outdir: Directory
     models: dict[str, FilePath]
+    chunksize: int = 100_000
+    cascade: Optional[CascadeConfig] = None
+    ensemble: Optional[EnsembleConfig] = None
+    executor: Literal["sequential", "thread", "process"] = "sequential"
+    threads_per_model: Optional[int] = None
+    memory_budget_gb: Optional[float] = None
+    prefetch: bool = True
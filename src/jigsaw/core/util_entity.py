@@ -75,6 +75,27 @@ class TripletDataConfig(BaseModel):
     reversed: bool = False
 
 
+class CascadeConfig(BaseModel):
+    model: str
+    lower: float | None = None
+    upper: float | None = None
+    oof_path: FilePath | None = None
+    target_auc_loss: float = 0.002
+
+
+class InferenceMetric(BaseModel):
+    rows: int
+    seconds: float
+    rows_per_sec: float
+    tokens_per_sec: float
+    padding_fraction: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_p99_ms: float
+    stage_seconds: dict[str, float]
+    trace_path: FilePath | None = None
+
+
 class ClassificationMetric(BaseModel):
     roc_auc: float
     accuracy: float
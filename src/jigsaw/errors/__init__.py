@@ -66,3 +66,17 @@ class TransformationWarning(Warning):
         self, message: str = "", dataname: str = "", file_name: str = "", error=""
     ):
         super().__init__(f"{message} : {dataname}.{file_name} : {error}")
+
+
+class OverloadedError(Exception):
+    def __init__(self, queue_size: int, error: str = ""):
+        super().__init__(
+            f"Inference queue is full ({queue_size} pending request(s)) {error}".strip()
+        )
+
+
+class DeadlineExceededError(Exception):
+    def __init__(self, deadline_ms: float, error: str = ""):
+        super().__init__(
+            f"Request deadline of {deadline_ms:.0f}ms exceeded {error}".strip()
+        )
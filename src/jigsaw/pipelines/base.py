@@ -4,15 +4,18 @@ from ..core import (
     DataValidationConfig,
     DataIngestionArtifact,
     DataValidationArtifact,
+    ModelTrainingConfig,
     ModelTrainingArtifact,
     MultiModelTrainingArtifact,
 )
 
 from typeguard import typechecked
+from ..utils.common import load_json, save_json
 from .. import logger
 
 from ..components.data import DataIngestionComponent, DataValidationComponent
 from ..components.train import ModelTrainingComponent
+from ..components.oof import OutOfFoldTrainingComponent
 
 
 class BasePipeline:
@@ -72,22 +75,43 @@ class BasePipeline:
                 self.config.get_model_training_config(data_validation_artifact)
             )
             model_training_artifacts = dict()
+            out_of_fold_artifacts = dict()
 
             try:
                 while True:
                     model_name, model_training_config = next(model_training_configs)
                     logger.info(f"Model Training : {model_name}")
-                    model_training_artifacts[model_name] = ModelTrainingComponent(
-                        model_training_config,
-                    )()
+                    model_training_config = ModelTrainingConfig(
+                        **load_json(model_training_config)
+                    )
+                    if model_training_config.n_folds > 1:
+                        # The best fold stands in for the model at inference
+                        oof_artifact = OutOfFoldTrainingComponent(
+                            model_training_config
+                        )()
+                        out_of_fold_artifacts[model_name] = oof_artifact
+                        model_training_artifacts[model_name] = oof_artifact.folds[
+                            oof_artifact.best_fold
+                        ]
+                    else:
+                        model_training_artifacts[model_name] = ModelTrainingComponent(
+                            model_training_config,
+                        )()
             except StopIteration as e:
                 model_training_configs = e.value
 
             logger.info("Model Training Completed")
             logger.info("Training Pipeline Completed")
-            return MultiModelTrainingArtifact(
-                outdir=model_training_configs.outdir, models=model_training_artifacts
+            multi_model_training_artifact = MultiModelTrainingArtifact(
+                outdir=model_training_configs.outdir,
+                models=model_training_artifacts,
+                out_of_fold=out_of_fold_artifacts,
             )
+            save_json(
+                multi_model_training_artifact.model_dump(mode="json"),
+                model_training_configs.outdir / "training_artifact.json",
+            )
+            return multi_model_training_artifact
 
         except Exception as e:
             logger.error(f"Error during model training {e}")
@@ -1,11 +1,30 @@
 from ..core import (
+    Directory,
+    FilePath,
     MultiModelInferenceConfig,
     ModelInferenceArtifact,
     MultiModelInferenceArtifact,
+    StreamingInferenceArtifact,
+    CascadeInferenceArtifact,
 )
+from ..errors import ConfigurationError
+from ..utils.common import load_csv, load_json, save_csv, save_json
 from .. import logger
+import numpy as np
 import pandas as pd
-from ..components.inference import ModelInferenceComponent
+import torch
+import time
+import os
+from ..components.inference.registry import ModelRegistry
+from ..components.inference import member_fingerprint
+from ..components.ensemble import EnsembleComponent
+from ..components.inference.cascade import calibrate_band, in_band
+from ..components.inference.executor import run_members
+from ..components.inference.streaming import iter_chunks, completed_parts, write_part
+
+# Rows the expensive members score to time themselves when the cascade
+# sends them nothing
+CASCADE_PROBE_ROWS = 32
 
 
 class PredictorPipeline:
@@ -17,26 +36,310 @@ class PredictorPipeline:
             model_training_artifact
         )
 
-        self.model_inference_component = dict()
-        for model_name, model_inference_config in self.config.models.items():
-            self.model_inference_component[model_name] = ModelInferenceComponent(
-                model_inference_config,
+        self.model_inference_component = ModelRegistry(
+            self.config.models,
+            budget_bytes=int(self.config.memory_budget_gb * 2**30)
+            if self.config.memory_budget_gb
+            else None,
+        )
+        self.check_executor()
+
+    def check_executor(self):
+        if self.config.executor == "sequential":
+            return
+        if self.config.memory_budget_gb:
+            e = ConfigurationError(
+                self.config.executor,
+                "a memory budget needs the 'sequential' executor",
+            )
+            logger.error(e)
+            raise e
+        if self.config.executor != "process":
+            return
+        for model_name, model_config in self.model_inference_component.configs.items():
+            # Forked members can neither reuse a CUDA context nor share the
+            # parent's SQLite connection
+            if torch.cuda.is_available() or model_config.cache_dir:
+                e = ConfigurationError(
+                    model_name,
+                    "the 'process' executor needs CPU members without a prediction cache",
+                )
+                logger.error(e)
+                raise e
+
+    def run_members(
+        self,
+        run,
+        data: pd.DataFrame,
+        members: list[str] | None = None,
+    ) -> dict:
+        model_names = self.model_inference_component.order(
+            members or list(self.model_inference_component)
+        )
+        if self.config.executor != "sequential":
+            # Concurrent members are loaded up front, forked workers then
+            # inherit the weights instead of loading their own copy
+            for model_name in model_names:
+                self.model_inference_component[model_name]
+
+        return run_members(
+            run,
+            self.model_inference_component,
+            data,
+            executor=self.config.executor,
+            threads_per_model=self.config.threads_per_model,
+            model_names=model_names,
+            prefetch=self.model_inference_component.prefetch
+            if self.config.prefetch
+            else None,
+        )
+
+    def __call__(
+        self, data: pd.DataFrame
+    ) -> MultiModelInferenceArtifact | CascadeInferenceArtifact:
+        if self.config.cascade:
+            return self.cascade(data)
+
+        try:
+            start = time.perf_counter()
+            registry_stats = dict(self.model_inference_component.stats)
+            model_inference_artifacts: dict[str, ModelInferenceArtifact] = (
+                self.run_members(
+                    lambda predict_component, data: predict_component(data), data
+                )
+            )
+            wall_seconds = time.perf_counter() - start
+            load_seconds = (
+                self.model_inference_component.stats["load_seconds"]
+                - registry_stats["load_seconds"]
+            )
+            overlap_efficiency = self.model_inference_component.overlap_efficiency(
+                since=registry_stats
+            )
+
+            logger.info(
+                f"Model Inferencing Completed in {wall_seconds:.2f}s, "
+                f"{load_seconds:.2f}s spent loading models with "
+                f"{overlap_efficiency:.2%} of it overlapped with inference"
+            )
+            multi_model_inference_artifact = MultiModelInferenceArtifact(
+                outdir=self.config.outdir,
+                models=model_inference_artifacts,
+                wall_seconds=wall_seconds,
+                load_seconds=load_seconds,
+                overlap_efficiency=overlap_efficiency,
+            )
+            # A single member's scores are already its submission
+            if self.config.ensemble and len(model_inference_artifacts) > 1:
+                multi_model_inference_artifact.ensemble = EnsembleComponent(
+                    self.config.ensemble
+                )(multi_model_inference_artifact)
+            return multi_model_inference_artifact
+
+        except Exception as e:
+            logger.error(f"Error during model inference {e}")
+            raise e
+
+    def predict(self, data: pd.DataFrame) -> pd.DataFrame:
+        scores = self.run_members(
+            lambda predict_component, data: predict_component.predict(data), data
+        )
+        return pd.DataFrame(
+            {
+                model_name: scores[model_name].astype(np.float32)
+                for model_name in self.model_inference_component
+            },
+            index=data.index,
+        )
+
+    def blend(self, scores: pd.DataFrame) -> np.ndarray:
+        weights = np.array(
+            [
+                self.model_inference_component.configs[model_name].ensemble_weight
+                for model_name in scores.columns
+            ],
+            dtype=np.float64,
+        )
+        return scores.to_numpy(dtype=np.float64) @ weights / weights.sum()
+
+    def predict_members(self, data: pd.DataFrame, members: list[str]) -> dict:
+        return self.run_members(
+            lambda predict_component, data: predict_component.predict(data),
+            data,
+            members=members,
+        )
+
+    def get_cascade_band(self) -> tuple[float, float]:
+        cascade = self.config.cascade
+        if cascade.lower is not None and cascade.upper is not None:
+            return cascade.lower, cascade.upper
+
+        if cascade.oof_path is None:
+            e = ConfigurationError(
+                message="cascade needs either a band or out-of-fold predictions"
             )
+            logger.error(e)
+            raise e
+
+        oof = load_csv(cascade.oof_path)
+        members = [name for name in self.model_inference_component if name in oof]
+        return calibrate_band(
+            oof["rule_violation"].to_numpy(),
+            oof[cascade.model].to_numpy(),
+            self.blend(oof[members]),
+            cascade.target_auc_loss,
+        )
+
+    def cascade(self, data: pd.DataFrame) -> CascadeInferenceArtifact:
+        cascade = self.config.cascade
+        if cascade.model not in self.model_inference_component:
+            e = ConfigurationError(cascade.model, "Unknown cascade model")
+            logger.error(e)
+            raise e
 
-    def __call__(self, data: pd.DataFrame) -> MultiModelInferenceArtifact:
-        model_inference_artifacts = dict()
         try:
-            for model_name, predict_component in self.model_inference_component.items():
-                model_inference_artifact: ModelInferenceArtifact = predict_component(
-                    data.copy()
+            lower, upper = self.get_cascade_band()
+
+            start = time.perf_counter()
+            cheap = self.model_inference_component[cascade.model].predict(data)
+            cheap_time = time.perf_counter() - start
+
+            uncertain = np.flatnonzero(in_band(cheap, lower, upper))
+            prediction = cheap.copy()
+            members = [
+                model_name
+                for model_name in self.model_inference_component
+                if model_name != cascade.model
+            ]
+            expensive_time, probe_time = 0.0, 0.0
+            if len(uncertain) and members:
+                subset = data.iloc[uncertain]
+                start = time.perf_counter()
+                scores = {cascade.model: cheap[uncertain]}
+                scores.update(self.predict_members(subset, members))
+                expensive_time = time.perf_counter() - start
+                prediction[uncertain] = self.blend(pd.DataFrame(scores))
+                row_time = expensive_time / len(uncertain)
+            elif members and len(data):
+                # Nothing reached the ensemble, so its per-row cost is
+                # measured on a few rows rather than assumed
+                probe = data.iloc[:CASCADE_PROBE_ROWS]
+                start = time.perf_counter()
+                self.predict_members(probe, members)
+                probe_time = time.perf_counter() - start
+                row_time = probe_time / len(probe)
+            else:
+                row_time = 0.0
+
+            # Cost of the plain ensemble, extrapolating the expensive members'
+            # measured per-row time to every row
+            full_time = cheap_time + row_time * len(data)
+            n_rows = max(len(data), 1)
+            stage_fractions = {
+                cascade.model: 1 - len(uncertain) / n_rows,
+                "ensemble": len(uncertain) / n_rows,
+            }
+            report = {
+                "band": [lower, upper],
+                "rows": len(data),
+                "stage_fractions": stage_fractions,
+                "stage_seconds": {
+                    cascade.model: cheap_time,
+                    "ensemble": expensive_time,
+                },
+                "probe_seconds": probe_time,
+                "compute_saved": 1 - (cheap_time + expensive_time) / full_time
+                if full_time > 0
+                else 0.0,
+            }
+            logger.info(
+                f"Cascade : {stage_fractions[cascade.model]:.2%} of rows finalized "
+                f"by {cascade.model}, {stage_fractions['ensemble']:.2%} sent to the "
+                f"ensemble, {report['compute_saved']:.2%} compute saved"
+            )
+
+            stage = np.where(in_band(cheap, lower, upper), "ensemble", cascade.model)
+            output = pd.DataFrame({"prediction": prediction, "stage": stage})
+            if "row_id" in data.columns:
+                output.insert(0, "row_id", data["row_id"].to_numpy())
+
+            save_csv(output, self.config.outdir / "cascade_prediction.csv")
+            save_json(report, self.config.outdir / "cascade_report.json")
+            return CascadeInferenceArtifact(
+                prediction_file_path=self.config.outdir / "cascade_prediction.csv",
+                report_file_path=self.config.outdir / "cascade_report.json",
+                band=(lower, upper),
+                stage_fractions=stage_fractions,
+                compute_saved=report["compute_saved"],
+            )
+
+        except Exception as e:
+            logger.error(f"Error during cascade inference {e}")
+            raise e
+
+    def stream(
+        self,
+        input_path: FilePath,
+        outdir: FilePath | Directory | None = None,
+        chunksize: int | None = None,
+    ) -> StreamingInferenceArtifact:
+        chunksize = chunksize or self.config.chunksize
+        if outdir is None:
+            outdir = self.config.outdir // "stream"
+        elif not isinstance(outdir, Directory):
+            outdir = Directory(path=outdir)
+
+        manifest = {
+            "input_path": str(input_path),
+            "chunksize": chunksize,
+            "models": list(self.model_inference_component.keys()),
+            # Parts scored by another checkpoint or with other settings
+            # can't be mixed with new ones
+            "fingerprints": {
+                model_name: member_fingerprint(config)
+                for model_name, config in self.model_inference_component.configs.items()
+            },
+        }
+        manifest_path = outdir / "stream_manifest.json"
+        if os.path.exists(manifest_path):
+            if load_json(manifest_path) != manifest:
+                e = ConfigurationError(
+                    str(manifest_path),
+                    "Streaming run doesn't match the run found in the output directory",
                 )
-                model_inference_artifacts[model_name] = model_inference_artifact
+                logger.error(e)
+                raise e
+        else:
+            save_json(manifest, manifest_path)
+
+        completed = completed_parts(outdir)
+        if completed:
+            logger.info(
+                f"Resuming streaming inference : {len(completed)} chunk(s) done"
+            )
+
+        n_rows, n_chunks = 0, 0
+        try:
+            for index, chunk in enumerate(iter_chunks(input_path, chunksize)):
+                n_rows += len(chunk)
+                n_chunks += 1
+                if index in completed:
+                    continue
+
+                scores = self.predict(chunk)
+                scores.insert(0, "row_id", chunk["row_id"].to_numpy())
+                write_part(scores, outdir, index)
+                logger.info(f"Streamed chunk {index} : {n_rows} rows so far")
 
-            logger.info("Model Inferencing Completed")
-            return MultiModelInferenceArtifact(
-                outdir=self.config.outdir, models=model_inference_artifacts
+            logger.info("Streaming Inference Completed")
+            return StreamingInferenceArtifact(
+                prediction_dir=outdir,
+                models=manifest["models"],
+                n_rows=n_rows,
+                n_chunks=n_chunks,
+                resumed_chunks=len(completed),
             )
 
         except Exception as e:
-            logger.error(f"Error during model training {e}")
+            logger.error(f"Error during streaming inference {e}")
             raise e
@@ -0,0 +1,264 @@
+from ..errors import OverloadedError, DeadlineExceededError
+from .inference import PredictorPipeline
+from .. import logger
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import pandas as pd
+import numpy as np
+import asyncio
+import json
+
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+def ensemble_predictor(
+    pipeline: PredictorPipeline,
+) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    weights = np.array(
+        [
+            model_config.ensemble_weight
+            for model_config in pipeline.model_inference_component.configs.values()
+        ],
+        dtype=np.float64,
+    )
+
+    def predict(data: pd.DataFrame) -> pd.DataFrame:
+        scores = pipeline.predict(data)
+        scores["prediction"] = np.average(scores.to_numpy(), axis=1, weights=weights)
+        return scores
+
+    return predict
+
+
+class PendingRequest:
+    __slots__ = ("row", "deadline", "future")
+
+    def __init__(self, row: dict, deadline: float | None, future: asyncio.Future):
+        self.row = row
+        self.deadline = deadline
+        self.future = future
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        predict: Callable[[pd.DataFrame], pd.DataFrame],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+    ):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        # The model is not re-entrant, so every batch runs on one worker thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batcher")
+        self.stats = {"served": 0, "shed": 0, "expired": 0, "batches": 0, "rows": 0}
+        self.queue: asyncio.Queue | None = None
+        self.worker: asyncio.Task | None = None
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.worker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, row: dict, timeout_ms: float | None = None) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_ms / 1000 if timeout_ms else None
+        request = PendingRequest(row, deadline, loop.create_future())
+
+        try:
+            self.queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.stats["shed"] += 1
+            raise OverloadedError(self.queue.qsize())
+
+        if deadline is None:
+            return await request.future
+        try:
+            return await asyncio.wait_for(request.future, deadline - loop.time())
+        except asyncio.TimeoutError:
+            self.stats["expired"] += 1
+            raise DeadlineExceededError(timeout_ms)
+
+    async def collect(self) -> list[PendingRequest]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        flush_at = loop.time() + self.max_wait
+
+        # A lone request is dispatched right away; stragglers are only waited
+        # for once there is concurrent traffic to coalesce
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = flush_at - loop.time()
+            if len(batch) == 1 or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect()
+            now = loop.time()
+            live = [
+                request
+                for request in batch
+                if not request.future.done()
+                and (request.deadline is None or request.deadline > now)
+            ]
+            if not live:
+                continue
+
+            data = pd.DataFrame([request.row for request in live])
+            try:
+                scores = await loop.run_in_executor(self.executor, self.predict, data)
+            except Exception as e:
+                logger.error(f"Error during micro-batch inference {e}")
+                for request in live:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["rows"] += len(live)
+            for request, row in zip(live, scores.to_dict(orient="records")):
+                if not request.future.done():
+                    request.future.set_result(
+                        {key: float(value) for key, value in row.items()}
+                    )
+                    self.stats["served"] += 1
+
+
+class InferenceServer:
+    def __init__(
+        self,
+        batcher: MicroBatcher,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        timeout_ms: float | None = None,
+    ):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.timeout_ms = timeout_ms
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        if method == "GET" and path == "/health":
+            stats = dict(self.batcher.stats)
+            stats["queued"] = self.batcher.queue.qsize()
+            stats["mean_batch_size"] = stats["rows"] / max(stats["batches"], 1)
+            return 200, {"status": "ok", **stats}
+
+        if method != "POST" or path != "/predict":
+            return 404, {"error": f"{method} {path} is not served"}
+
+        try:
+            row = json.loads(body)
+            if not isinstance(row, dict):
+                raise ValueError("the body has to be a JSON object")
+            timeout_ms = row.pop("timeout_ms", self.timeout_ms)
+            if timeout_ms is not None and (
+                isinstance(timeout_ms, bool)
+                or not isinstance(timeout_ms, (int, float))
+                or not 0 < timeout_ms < float("inf")
+            ):
+                raise ValueError("'timeout_ms' has to be a positive number")
+            if not isinstance(row.get("rule"), str) or not isinstance(
+                row.get("body"), str
+            ):
+                raise ValueError("'rule' and 'body' have to be strings")
+        except (ValueError, AttributeError) as e:
+            return 400, {"error": f"Invalid request : {e}"}
+
+        try:
+            return 200, await self.batcher.submit(row, timeout_ms)
+        except OverloadedError as e:
+            return 503, {"error": str(e)}
+        except DeadlineExceededError as e:
+            return 504, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self.route(method, path, body)
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                content = json.dumps(payload).encode()
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(content)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode("latin-1")
+                    + content
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        await self.batcher.start()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        logger.info(f"Serving inference on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def serve(
+    pipeline: PredictorPipeline,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    max_batch_size: int = 32,
+    max_wait_ms: float = 5.0,
+    max_queue_size: int = 1024,
+    timeout_ms: float | None = None,
+):
+    batcher = MicroBatcher(
+        ensemble_predictor(pipeline),
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        max_queue_size=max_queue_size,
+    )
+    asyncio.run(InferenceServer(batcher, host, port, timeout_ms).serve_forever())
@@ -79,6 +79,17 @@ def get_hw_details():
     return n_procs, n_threads
 
 
+def get_physical_cores() -> int:
+    # get_hw_details reports (threads per core, cores per socket) on Linux and
+    # (physical cores, threads per core) on macOS
+    try:
+        n_procs, n_threads = get_hw_details()
+        return max(1, n_threads if get_os_type() == "Linux" else n_procs)
+    except Exception as e:
+        logger.warning(f"Unable to read the core count, using os.cpu_count() : {e}")
+        return os.cpu_count() or 1
+
+
 @typechecked
 def seed_everything(seed: int):
     random.seed(seed)
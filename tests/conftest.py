@@ -0,0 +1,89 @@
+from benchmarks.synthetic import RULES, make_comments
+from benchmarks.tiny_models import build_tiny_checkpoint
+from src.jigsaw.constants.prompt import SYSTEM_PROMPT
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import (
+    BertTokenizerFast,
+    PreTrainedTokenizerFast,
+    Qwen2Config,
+    Qwen2ForCausalLM,
+)
+import pytest
+import torch
+
+
+@pytest.fixture(scope="session")
+def checkpoint(tmp_path_factory):
+    return build_tiny_checkpoint(tmp_path_factory.mktemp("tiny"), max_length=128)
+
+
+@pytest.fixture(scope="session")
+def causal_lm(tmp_path_factory):
+    """Randomly initialised Qwen2 with a word-level vocab that has the
+    answer tokens"""
+    path = build_tiny_checkpoint(tmp_path_factory.mktemp("tinyq"), max_length=128)
+    vocab = path / "vocab.txt"
+    vocab.write_text(vocab.read_text() + "\nyes\nno")
+    tokenizer = BertTokenizerFast(str(vocab))
+
+    torch.manual_seed(0)
+    model = Qwen2ForCausalLM(
+        Qwen2Config(
+            vocab_size=tokenizer.vocab_size,
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+            intermediate_size=64,
+            max_position_embeddings=512,
+            pad_token_id=tokenizer.pad_token_id,
+        )
+    ).eval()
+    return model, tokenizer
+
+
+@pytest.fixture(scope="session")
+def bpe_lm():
+    """Randomly initialised Qwen2 with a byte-level BPE tokenizer, whose
+    merges cross word and turn boundaries the way real chat models' do"""
+    corpus = [
+        SYSTEM_PROMPT,
+        "Violation: Yes No",
+        *make_comments(200, "short", seed=0)["body"],
+        *RULES,
+    ]
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(
+        corpus,
+        trainers.BpeTrainer(
+            vocab_size=400,
+            special_tokens=["<|endoftext|>", "<|im_start|>", "<|im_end|>"],
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        ),
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe, eos_token="<|im_end|>", pad_token="<|endoftext|>"
+    )
+    # The content follows a space, which BPE merges into its first word
+    tokenizer.chat_template = (
+        "{% for message in messages %}<|im_start|>{{ message['role'] }}: "
+        "{{ message['content'] }}<|im_end|>\n{% endfor %}"
+        "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+    )
+
+    torch.manual_seed(0)
+    model = Qwen2ForCausalLM(
+        Qwen2Config(
+            vocab_size=len(tokenizer),
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+            intermediate_size=64,
+            max_position_embeddings=1024,
+            pad_token_id=tokenizer.pad_token_id,
+        )
+    ).eval()
+    return model, tokenizer
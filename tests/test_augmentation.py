@@ -0,0 +1,51 @@
+from src.jigsaw.components.data.augmentation import Augmentor
+import random
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "rule": ["no spam", "no legal advice", "no spam"],
+            "body": [
+                "see https://example.com/buy-now",
+                "talk to a lawyer",
+                "free stuff at http://spam.io",
+            ],
+        }
+    )
+
+
+@pytest.mark.parametrize("include_original", [True, False])
+def test_views_are_blocks_of_rows(data, include_original):
+    augmentor = Augmentor(
+        augments=[["url_to_semantics", 1.0]],
+        resample=2,
+        include_original=include_original,
+    )
+    views, owners = augmentor.views(data)
+
+    n_blocks = 3 if include_original else 2
+    assert len(views) == len(owners) == n_blocks * len(data)
+    np.testing.assert_array_equal(owners, np.tile(np.arange(len(data)), n_blocks))
+    # Rules are never augmented, so each view lines up with its source row
+    assert (views["rule"].to_numpy() == data["rule"].to_numpy()[owners]).all()
+    if include_original:
+        pd.testing.assert_frame_equal(views.iloc[: len(data)], data)
+
+
+def test_views_are_reproducible_with_a_seed(data):
+    augments = [["transileration", 0.5], ["sentence_shuffle", 0.5]]
+    data = data.assign(body=data["body"] + ". one more sentence here. and a last one")
+
+    def views(seed):
+        return Augmentor(augments=augments, resample=4, seed=seed).views(data)[0]
+
+    first = views(0)
+    # Draws from the global generator don't leak into a seeded augmentor
+    random.random()
+    pd.testing.assert_frame_equal(views(0), first)
+    assert not views(1).equals(first)
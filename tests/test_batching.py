@@ -0,0 +1,50 @@
+from src.jigsaw.components.inference.batching import (
+    length_bucketed_batches,
+    padding_ratio,
+    sequential_batches,
+)
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def lengths():
+    return np.random.default_rng(0).integers(1, 200, size=103)
+
+
+def test_batches_run_longest_first(lengths):
+    batches = length_bucketed_batches(lengths, batch_size=8)
+    assert all(len(batch) <= 8 for batch in batches)
+    order = np.concatenate(batches)
+    assert (np.diff(lengths[order]) <= 0).all()
+    assert padding_ratio(lengths, batches) < padding_ratio(
+        lengths, sequential_batches(len(lengths), 8)
+    )
+
+
+@pytest.mark.parametrize("batch_size", [None, 1, 8, 1000])
+@pytest.mark.parametrize("max_tokens", [None, 150, 512])
+def test_outputs_reorder_back_to_input_order(lengths, batch_size, max_tokens):
+    batches = length_bucketed_batches(lengths, batch_size, max_tokens)
+    np.testing.assert_array_equal(np.sort(np.concatenate(batches)), np.arange(103))
+
+    # Scattering each batch's outputs by its indices restores the input rows
+    outputs = np.empty(len(lengths), dtype=lengths.dtype)
+    for batch in batches:
+        outputs[batch] = lengths[batch]
+    np.testing.assert_array_equal(outputs, lengths)
+
+
+def test_max_tokens_caps_padded_batches(lengths):
+    batches = length_bucketed_batches(lengths, batch_size=64, max_tokens=512)
+    for batch in batches:
+        assert len(batch) == 1 or len(batch) * lengths[batch].max() <= 512
+    # A row longer than the budget still gets a batch of its own
+    (batch,) = length_bucketed_batches(np.array([900]), max_tokens=512)
+    assert batch.tolist() == [0]
+
+
+def test_no_cap_is_one_batch(lengths):
+    (batch,) = length_bucketed_batches(lengths)
+    assert len(batch) == len(lengths)
+    assert length_bucketed_batches(np.array([], dtype=int)) == []
@@ -0,0 +1,88 @@
+from src.jigsaw.components.inference import ModelInferenceComponent
+from src.jigsaw.core import ModelInferenceConfig
+import pandas as pd
+import numpy as np
+import pytest
+
+EXAMPLES = {
+    "positive_example_1": "buy now free crypto",
+    "positive_example_2": "check out my channel",
+    "negative_example_1": "read the sidebar",
+    "negative_example_2": "talk to a lawyer",
+}
+
+
+@pytest.fixture(scope="module")
+def completion_checkpoint(causal_lm, tmp_path_factory):
+    model, tokenizer = causal_lm
+    path = tmp_path_factory.mktemp("completion")
+    tokenizer.chat_template = (
+        "{% for message in messages %}<|{{ message['role'] }}|> "
+        "{{ message['content'] }} [SEP] {% endfor %}<|assistant|> "
+    )
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "rule": ["no spam", "no legal advice", "no spam"],
+            "body": ["click here", "talk to a lawyer", "the mod removed this"],
+            **{column: [text] * 3 for column, text in EXAMPLES.items()},
+        }
+    )
+
+
+def component(tmp_path, train_path, **settings) -> ModelInferenceComponent:
+    return ModelInferenceComponent(
+        ModelInferenceConfig(
+            name="cached",
+            outdir=tmp_path / "out",
+            model_path=str(train_path),
+            train_path=str(train_path),
+            cache_dir=tmp_path / "cache",
+            batch_size=2,
+            **settings,
+        )
+    )
+
+
+def test_cache_is_reused_for_the_same_settings(tmp_path, checkpoint, data):
+    first = component(tmp_path, checkpoint, type="text-classification")
+    scores = first.predict(data)
+    first.cache.close()
+
+    second = component(tmp_path, checkpoint, type="text-classification")
+    np.testing.assert_array_equal(second.predict(data), scores)
+    assert second.cache.stats()["hits"] == len(data)
+
+
+def test_prompt_is_part_of_the_key(tmp_path, completion_checkpoint, data):
+    zero_shot = component(
+        tmp_path, completion_checkpoint, type="completion", prompt="zero-shot"
+    )
+    zero_shot_scores = zero_shot.predict(data)
+    zero_shot.cache.close()
+
+    few_shot = component(
+        tmp_path, completion_checkpoint, type="completion", prompt="few-shot"
+    )
+    assert few_shot.cache.fingerprint != zero_shot.cache.fingerprint
+    few_shot_scores = few_shot.predict(data)
+    assert few_shot.cache.stats()["hits"] == 0
+    assert not np.allclose(few_shot_scores, zero_shot_scores)
+
+
+def test_pooling_is_part_of_the_key(tmp_path, checkpoint, data):
+    mean = component(tmp_path, checkpoint, type="triplet", pooling="mean")
+    mean_scores = mean.predict(data)
+    mean.cache.close()
+
+    cls = component(tmp_path, checkpoint, type="triplet", pooling="cls")
+    assert cls.cache.fingerprint != mean.cache.fingerprint
+    cls_scores = cls.predict(data)
+    assert cls.cache.stats()["hits"] == 0
+    assert not np.allclose(cls_scores, mean_scores)
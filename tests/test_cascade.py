@@ -0,0 +1,71 @@
+from benchmarks.synthetic import make_comments
+from benchmarks.tiny_models import build_tiny_checkpoint
+from src.jigsaw.config import ConfigurationManager
+from src.jigsaw.core import (
+    ClassificationMetric,
+    Directory,
+    ModelTrainingArtifact,
+    MultiModelTrainingArtifact,
+)
+from src.jigsaw.pipelines.inference import CASCADE_PROBE_ROWS, PredictorPipeline
+from src.jigsaw.utils.common import load_json
+import pytest
+import yaml
+
+
+@pytest.fixture
+def pipeline(tmp_path, checkpoint, request):
+    checkpoints = {"cheap": checkpoint, "expensive": checkpoint}
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        yaml.safe_dump(
+            {
+                "artifact-root": str(tmp_path / "artifact"),
+                "seed": 2345,
+                "max-length": 64,
+                "cascade": {"model": "cheap", "band": request.param},
+                "models": {
+                    model_name: {"type": "text-classification", "model": str(path)}
+                    for model_name, path in checkpoints.items()
+                },
+            }
+        )
+    )
+    training_artifact = MultiModelTrainingArtifact(
+        outdir=Directory(path=tmp_path / "models"),
+        models={
+            model_name: ModelTrainingArtifact(
+                name=model_name,
+                model_path=str(path),
+                metrics=ClassificationMetric(roc_auc=0.0, accuracy=0.0),
+            )
+            for model_name, path in checkpoints.items()
+        },
+    )
+    return PredictorPipeline(ConfigurationManager(str(config_path)), training_artifact)
+
+
+@pytest.mark.parametrize(
+    "pipeline, ensemble_fraction",
+    [([2.0, 3.0], 0.0), ([0.0, 1.0], 1.0)],
+    indirect=["pipeline"],
+)
+def test_compute_saved_is_measured(pipeline, ensemble_fraction):
+    data = make_comments(2 * CASCADE_PROBE_ROWS, "short", seed=0)
+    artifact = pipeline.cascade(data)
+    report = load_json(artifact.report_file_path)
+
+    assert artifact.stage_fractions["ensemble"] == ensemble_fraction
+    seconds = report["stage_seconds"]
+    if ensemble_fraction:
+        # Every row went through the ensemble, nothing is saved
+        assert report["probe_seconds"] == 0.0
+        assert artifact.compute_saved == pytest.approx(0.0, abs=1e-9)
+    else:
+        # Extrapolated from the probe rows instead of assumed
+        assert seconds["ensemble"] == 0.0
+        assert report["probe_seconds"] > 0.0
+        full = (
+            seconds["cheap"] + report["probe_seconds"] * len(data) / CASCADE_PROBE_ROWS
+        )
+        assert artifact.compute_saved == pytest.approx(1 - seconds["cheap"] / full)
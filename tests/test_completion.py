@@ -0,0 +1,157 @@
+from src.jigsaw.components.inference import join_columns
+from src.jigsaw.components.inference.completion import (
+    ANSWERS,
+    PrefixCachedScorer,
+    split_prompt,
+)
+from src.jigsaw.constants.prompt import zero_shot_chat_prompt
+from benchmarks.synthetic import RULES, make_comments
+from torch.nn.functional import softmax
+import pandas as pd
+import numpy as np
+import pytest
+import torch
+
+TEMPLATES = {
+    "plain": (
+        "{% for message in messages %}<|{{ message['role'] }}|> "
+        "{{ message['content'] }} [SEP] {% endfor %}<|assistant|> "
+    ),
+    # Rewrites the body, so there is no prefix to cache
+    "upper": (
+        "{% for message in messages %}<|{{ message['role'] }}|> "
+        "{{ message['content'] | upper }} [SEP] {% endfor %}<|assistant|> "
+    ),
+}
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "rule": ["no spam", "no spam", "no legal advice", "no spam"],
+            "body": [
+                "check out my channel",
+                "the mod removed this post",
+                "you should talk to someone qualified about this",
+                "free crypto giveaway click here",
+            ],
+        }
+    )
+
+
+@torch.inference_mode()
+def reference_scores(model, tokenizer, data: pd.DataFrame) -> np.ndarray:
+    yes, no = [tokenizer(a, add_special_tokens=False)["input_ids"][0] for a in ANSWERS]
+    scores = []
+    for _, row in data.iterrows():
+        input_ids = tokenizer(
+            zero_shot_chat_prompt(row, tokenizer),
+            add_special_tokens=False,
+            return_tensors="pt",
+        )["input_ids"]
+        logits = model(input_ids).logits[0, -1]
+        scores.append(softmax(logits[[yes, no]], dim=-1)[0].item())
+    return np.array(scores)
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_scores_match_full_prompts(causal_lm, data, template):
+    model, tokenizer = causal_lm
+    tokenizer.chat_template = TEMPLATES[template]
+    assert (split_prompt(data.iloc[0], tokenizer) is None) == (template == "upper")
+
+    scores = PrefixCachedScorer(model, tokenizer, batch_size=2)(data)
+    np.testing.assert_allclose(
+        scores, reference_scores(model, tokenizer, data), atol=1e-5
+    )
+
+
+def test_empty_frame(causal_lm, data):
+    model, tokenizer = causal_lm
+    tokenizer.chat_template = TEMPLATES["plain"]
+    assert PrefixCachedScorer(model, tokenizer)(data.iloc[:0]).shape == (0,)
+    assert join_columns(data.iloc[:0], ["rule", "body"]) == []
+    assert join_columns(data.iloc[:1], ["rule", "body"]) == [
+        "no spam[SEP]check out my channel"
+    ]
+
+
+@pytest.fixture
+def comments():
+    data = make_comments(24, "mixed", seed=3)
+    return data.assign(rule=np.resize(RULES, len(data)))
+
+
+def test_bpe_scores_match_full_prompts(bpe_lm, comments):
+    model, tokenizer = bpe_lm
+    # Tokenizing prefix, body and suffix apart would split differently
+    prefix, suffix = split_prompt(comments.iloc[0], tokenizer)
+    body = comments["body"].iloc[0].strip()
+    apart = sum(
+        (
+            tokenizer(text, add_special_tokens=False)["input_ids"]
+            for text in (prefix, body, suffix)
+        ),
+        [],
+    )
+    assert (
+        apart
+        != tokenizer(prefix + body + suffix, add_special_tokens=False)["input_ids"]
+    )
+
+    scorer = PrefixCachedScorer(model, tokenizer, batch_size=4)
+    expected = reference_scores(model, tokenizer, comments)
+    np.testing.assert_allclose(scorer(comments), expected, atol=1e-5)
+    np.testing.assert_allclose(scorer.score_full(comments)[0], expected, atol=1e-5)
+
+
+def test_prompts_fit_max_length(bpe_lm, comments):
+    model, tokenizer = bpe_lm
+    widths = []
+
+    class Recorder(PrefixCachedScorer):
+        def forward(self, prefix_cache, prefix_length, inputs):
+            ends = inputs["input_ids"][
+                torch.arange(len(inputs["input_ids"])),
+                inputs["attention_mask"].sum(dim=1) - 1,
+            ]
+            assert (ends == self.cue).all()
+            widths.extend(
+                (prefix_length + inputs["attention_mask"].sum(dim=1)).tolist()
+            )
+            return super().forward(prefix_cache, prefix_length, inputs)
+
+    prefix, _ = split_prompt(comments.iloc[0], tokenizer)
+    max_length = len(tokenizer(prefix, add_special_tokens=False)["input_ids"]) + 12
+    scorer = Recorder(model, tokenizer, batch_size=4, max_length=max_length)
+    # Whichever token ends the prompt, the answer is read right after it
+    scorer.cue = tokenizer(
+        zero_shot_chat_prompt(comments.iloc[0], tokenizer), add_special_tokens=False
+    )["input_ids"][-1]
+    assert np.isfinite(scorer(comments)).all()
+    assert max(widths) == max_length
+
+
+def test_missing_prefix_values_are_scored(causal_lm, data):
+    model, tokenizer = causal_lm
+    tokenizer.chat_template = TEMPLATES["plain"]
+    missing = data.assign(rule=[np.nan, "", "no spam", np.nan])
+
+    scores = PrefixCachedScorer(model, tokenizer, batch_size=2)(missing)
+    assert np.isfinite(scores).all()
+    expected = reference_scores(model, tokenizer, missing.fillna(""))
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_tokens_are_counted(causal_lm, data, template):
+    model, tokenizer = causal_lm
+    tokenizer.chat_template = TEMPLATES[template]
+    scorer = PrefixCachedScorer(model, tokenizer, batch_size=2)
+    scorer(data)
+
+    metric = scorer.timer.metric(len(data), 1.0)
+    assert metric.tokens_per_sec > 0
+    assert 0 <= metric.padding_fraction < 1
+    assert len(scorer.timer.latencies) >= 2
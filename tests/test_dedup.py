@@ -0,0 +1,57 @@
+from src.jigsaw.components.inference import ModelInferenceComponent, join_columns
+from src.jigsaw.components.inference.cache import prompt_hashes
+from src.jigsaw.core import ModelInferenceConfig
+from benchmarks.synthetic import make_comments
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def component(tmp_path, checkpoint):
+    return ModelInferenceComponent(
+        ModelInferenceConfig(
+            name="dedup",
+            type="text-classification",
+            outdir=tmp_path / "out",
+            model_path=str(checkpoint),
+            train_path=str(checkpoint),
+            batch_size=4,
+            max_length=64,
+            bucketing=True,
+        )
+    )
+
+
+def test_keys_only_collapse_equivalent_prompts():
+    prompts = join_columns(make_comments(2000, "mixed", seed=0), ["rule", "body"])
+    keys = prompt_hashes(prompts)
+    assert len(set(keys)) == len(set(prompts))
+
+    # Whitespace and compatibility forms are normalized, case and content are not
+    same, *different = prompt_hashes(
+        ["free  crypto\nhere", "free crypto here", "ﬁne", "Free crypto here"]
+    )
+    assert same == different[0]
+    assert prompt_hashes(["fine"])[0] == different[1]
+    assert different[2] != same
+    assert prompt_hashes(["no spam[SEP]ok"]) != prompt_hashes(["no legal[SEP]ok"])
+
+
+def test_duplicates_are_scored_once_in_any_order(component):
+    unique = make_comments(10, "mixed", duplicate_fraction=0.0, seed=1)
+    order = np.random.default_rng(0).integers(0, len(unique), size=40)
+    data = unique.iloc[order].reset_index(drop=True)
+
+    scored = []
+    score_rows = component.score_rows
+
+    def spy(rows, prompts, **kwargs):
+        scored.append(len(rows))
+        return score_rows(rows, prompts, **kwargs)
+
+    component.score_rows = spy
+    scores = component.predict(data)
+
+    assert sum(scored) == len(np.unique(order))
+    expected = component.predict(unique)
+    np.testing.assert_allclose(scores, expected[order], atol=1e-6)
@@ -0,0 +1,64 @@
+from src.jigsaw.components.inference.embedding import (
+    TRIPLET_COLUMNS,
+    EmbeddingIndex,
+    TripletScorer,
+)
+from src.jigsaw.components.inference import join_columns
+from transformers import AutoModel, AutoTokenizer
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def scorer(checkpoint):
+    model = AutoModel.from_pretrained(checkpoint).eval()
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    return TripletScorer(model, tokenizer, checkpoint, batch_size=2)
+
+
+@pytest.fixture
+def data():
+    row = {
+        "rule": "no spam",
+        "positive_example_1": "buy now free crypto",
+        "positive_example_2": "check out my channel",
+        "negative_example_1": "read the sidebar",
+        "negative_example_2": "talk to a lawyer",
+        "body": "click here for a free giveaway",
+    }
+    return pd.DataFrame([row, {**row, "body": "the mod removed this post"}])
+
+
+def test_encode_empty(scorer):
+    embeddings = scorer.encode([])
+    assert embeddings.shape == (0, scorer.model.config.hidden_size)
+    assert embeddings.dtype == np.float16
+
+
+def test_empty_frame(scorer, data):
+    assert scorer(data.iloc[:0]).shape == (0,)
+    assert join_columns(data.iloc[:0], TRIPLET_COLUMNS + ["body"]) == []
+
+
+def test_index_grows_and_reloads(scorer, data):
+    scores = scorer(data)
+    assert scores.shape == (2,)
+    assert ((scores >= 0) & (scores <= 1)).all()
+    assert len(scorer.index) == 4
+
+    scorer.index.add([], scorer.encode([]))
+    assert len(scorer.index) == 4
+
+    reloaded = EmbeddingIndex.load(scorer.index_path, scorer.index.fingerprint)
+    np.testing.assert_array_equal(reloaded.keys, scorer.index.keys)
+    np.testing.assert_array_equal(reloaded.embeddings, scorer.index.embeddings)
+
+
+def test_tokens_are_counted(scorer, data):
+    scorer.timer.reset()
+    scorer(data)
+    metric = scorer.timer.metric(len(data), 1.0)
+    assert metric.tokens_per_sec > 0
+    assert 0 <= metric.padding_fraction < 1
+    assert scorer.timer.latencies
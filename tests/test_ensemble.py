@@ -0,0 +1,118 @@
+from benchmarks.synthetic import make_comments
+from src.jigsaw.components.ensemble import EPS, EnsembleComponent
+from src.jigsaw.config import ConfigurationManager
+from src.jigsaw.core import (
+    ClassificationMetric,
+    Directory,
+    EnsembleConfig,
+    ModelInferenceArtifact,
+    ModelTrainingArtifact,
+    MultiModelInferenceArtifact,
+    MultiModelTrainingArtifact,
+)
+from src.jigsaw.pipelines.inference import PredictorPipeline
+import pandas as pd
+import numpy as np
+import pytest
+import yaml
+
+WEIGHTS = {"a": 2.0, "b": 1.0, "c": 0.5}
+N_ROWS = 1000
+
+
+@pytest.fixture
+def scores():
+    rng = np.random.default_rng(0)
+    # Rounded, so the rank blend has ties to break
+    scores = {name: rng.random(N_ROWS).round(2) for name in WEIGHTS}
+    scores["c"][:10] = 0.0
+    return scores
+
+
+@pytest.fixture
+def artifact(tmp_path, scores):
+    models = {}
+    for name, member_scores in scores.items():
+        np.save(tmp_path / f"{name}.npy", member_scores)
+        pd.DataFrame({"row_id": np.arange(N_ROWS) + 7, "score": member_scores}).to_csv(
+            tmp_path / f"{name}.csv", index=False
+        )
+        models[name] = ModelInferenceArtifact(
+            name=name,
+            prediction_file_path=tmp_path / f"{name}.csv",
+            score_file_path=tmp_path / f"{name}.npy",
+        )
+    return MultiModelInferenceArtifact(outdir=Directory(path=tmp_path), models=models)
+
+
+def reference_blends(scores: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    weights = np.array([WEIGHTS[name] for name in scores])
+    weights /= weights.sum()
+    members = np.stack(list(scores.values()))
+    ranks = np.stack(
+        [
+            (pd.Series(member).rank(method="average").to_numpy() - 1) / (N_ROWS - 1)
+            for member in members
+        ]
+    )
+    return {
+        "weighted": weights @ members,
+        "rank": weights @ ranks,
+        "geometric": np.exp(weights @ np.log(np.clip(members, EPS, 1.0))),
+    }
+
+
+@pytest.mark.parametrize("method", ["weighted", "rank", "geometric"])
+def test_blends_match_numpy(tmp_path, scores, artifact, method):
+    outdir = tmp_path / "ensemble"
+    outdir.mkdir()
+    config = EnsembleConfig(
+        outdir=Directory(path=outdir), weights=WEIGHTS, method=method, chunksize=128
+    )
+    ensemble = EnsembleComponent(config)(artifact)
+    assert ensemble.n_rows == N_ROWS
+
+    expected = reference_blends(scores)
+    blends = pd.read_csv(ensemble.blend_file_path)
+    for name, values in expected.items():
+        np.testing.assert_allclose(blends[name], values, rtol=1e-9, atol=1e-12)
+
+    submission = pd.read_csv(ensemble.submission_file_path)
+    assert submission.columns.tolist() == ["row_id", "rule_violation"]
+    np.testing.assert_array_equal(submission["row_id"], np.arange(N_ROWS) + 7)
+    np.testing.assert_allclose(submission["rule_violation"], expected[method])
+
+
+@pytest.mark.parametrize("n_members", [1, 2])
+def test_single_member_skips_the_ensemble(tmp_path, checkpoint, n_members):
+    names = ["a", "b"][:n_members]
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        yaml.safe_dump(
+            {
+                "artifact-root": str(tmp_path / "artifact"),
+                "seed": 2345,
+                "max-length": 64,
+                "models": {
+                    name: {"type": "text-classification", "model": str(checkpoint)}
+                    for name in names
+                },
+            }
+        )
+    )
+    training_artifact = MultiModelTrainingArtifact(
+        outdir=Directory(path=tmp_path / "models"),
+        models={
+            name: ModelTrainingArtifact(
+                name=name,
+                model_path=str(checkpoint),
+                metrics=ClassificationMetric(roc_auc=0.0, accuracy=0.0),
+            )
+            for name in names
+        },
+    )
+    pipeline = PredictorPipeline(
+        ConfigurationManager(str(config_path)), training_artifact
+    )
+    artifact = pipeline(make_comments(8, "short", seed=0))
+    assert (artifact.ensemble is None) == (n_members == 1)
@@ -0,0 +1,32 @@
+from src.jigsaw.components.inference.executor import run_members
+from src.jigsaw.utils.common import get_physical_cores
+import pandas as pd
+import pytest
+import torch
+
+MEMBERS = {"a": None, "b": None}
+
+
+def threads(member, data: pd.DataFrame) -> int:
+    return torch.get_num_threads()
+
+
+def test_thread_members_share_one_pool():
+    before = torch.get_num_threads()
+    seen = run_members(
+        threads, MEMBERS, pd.DataFrame(), executor="thread", threads_per_model=1
+    )
+    assert set(seen.values()) == {min(2, get_physical_cores())}
+    assert torch.get_num_threads() == before
+
+
+@pytest.mark.parametrize("threads_per_model", [1, 2])
+def test_process_members_own_budget(threads_per_model):
+    seen = run_members(
+        threads,
+        MEMBERS,
+        pd.DataFrame(),
+        executor="process",
+        threads_per_model=threads_per_model,
+    )
+    assert set(seen.values()) == {threads_per_model}
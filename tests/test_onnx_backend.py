@@ -0,0 +1,66 @@
+from src.jigsaw.core import ModelInferenceConfig
+from src.jigsaw.errors import ValidationError
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from torch.nn.functional import softmax
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from src.jigsaw.components.inference.onnx_backend import (
+    ONNX_INPUTS,
+    OnnxSequenceClassifier,
+    export_onnx,
+    verify_onnx,
+)
+
+ONNX_ATOL = ModelInferenceConfig.model_fields["onnx_atol"].default
+PROMPTS = [
+    "No Advertising[SEP]check out my channel",
+    "No legal advice[SEP]you should talk to someone qualified about this post",
+    (
+        "No legal advice[SEP]the mod removed this post because it breaks the "
+        "rule about spam links and self promotion please read the sidebar"
+    ),
+    "No Advertising[SEP]free",
+]
+
+
+@pytest.fixture(scope="module")
+def onnx_path(checkpoint):
+    return export_onnx(checkpoint, atol=ONNX_ATOL)
+
+
+@torch.inference_mode()
+def test_onnx_matches_pytorch(checkpoint, onnx_path):
+    model = AutoModelForSequenceClassification.from_pretrained(checkpoint).eval()
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    session = OnnxSequenceClassifier(onnx_path)
+
+    # One row at a time and padded batches, so both dynamic axes vary
+    for batch in ([PROMPTS[0]], PROMPTS):
+        inputs = tokenizer(batch, padding="longest", return_tensors="pt")
+        inputs = {name: inputs[name] for name in ONNX_INPUTS}
+        expected = softmax(model(**inputs).logits, dim=-1).numpy()
+        actual = softmax(session(**inputs).logits, dim=-1).numpy()
+
+        assert actual.shape == expected.shape
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=ONNX_ATOL)
+
+
+def test_export_reuses_fresh_graph(checkpoint, onnx_path):
+    modified = onnx_path.stat().st_mtime_ns
+    assert export_onnx(checkpoint, atol=ONNX_ATOL) == onnx_path
+    assert onnx_path.stat().st_mtime_ns == modified
+
+
+@torch.inference_mode()
+def test_verify_rejects_divergent_graph(checkpoint, onnx_path):
+    model = AutoModelForSequenceClassification.from_pretrained(checkpoint).eval()
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    model.classifier.bias.add_(torch.tensor([5.0, -5.0]))
+
+    with pytest.raises(ValidationError):
+        verify_onnx(model, OnnxSequenceClassifier(onnx_path), tokenizer)
@@ -0,0 +1,123 @@
+from src.jigsaw.components import oof
+from src.jigsaw.components.oof import OutOfFoldTrainingComponent, estimate_job_memory
+from src.jigsaw.core import (
+    ClassificationMetric,
+    Directory,
+    ModelTrainingArtifact,
+    ModelTrainingConfig,
+)
+from src.jigsaw.errors import ConfigurationError
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pytest
+import time
+
+GIB = 2**30
+
+
+class FoldRecorder:
+    """Stands in for a fold's training process, keeping track of how many
+    folds run at once and where"""
+
+    def __init__(self, failing: int | None = None):
+        self.failing = failing
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.devices: dict[int, str | None] = dict()
+
+    def __call__(self, config, transform_artifact, n_threads, device=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.devices[config.fold] = device
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if config.fold == self.failing:
+            raise RuntimeError(f"fold {config.fold} diverged")
+        return ModelTrainingArtifact(
+            name=f"{config.name}-{config.fold}",
+            model_path=str(config.outdir),
+            metrics=ClassificationMetric(roc_auc=config.fold / 10, accuracy=0.0),
+        )
+
+
+class ThreadPool(ThreadPoolExecutor):
+    # Folds are plain functions here, threads stand in for spawned processes
+    def __init__(self, max_workers, mp_context=None, max_tasks_per_child=None):
+        super().__init__(max_workers)
+
+
+def make_config(tmp_path, **params) -> ModelTrainingConfig:
+    params = {"n_folds": 5, "fold_workers": 3, "fold_memory_gb": 1.0, **params}
+    return ModelTrainingConfig.model_construct(
+        name="member",
+        model=str(tmp_path),
+        outdir=Directory(path=tmp_path / "member"),
+        **params,
+    )
+
+
+def schedule(tmp_path, monkeypatch, recorder, budget=None, **params) -> dict:
+    monkeypatch.setattr(oof, "_train_fold", recorder)
+    monkeypatch.setattr(oof, "ProcessPoolExecutor", ThreadPool)
+    monkeypatch.setattr(oof, "available_memory", lambda: budget)
+    component = OutOfFoldTrainingComponent(make_config(tmp_path, **params))
+    jobs = {
+        fold: component.config.model_copy(
+            update={"fold": fold, "outdir": component.config.outdir // f"fold_{fold}"}
+        )
+        for fold in range(component.config.n_folds)
+    }
+    return component.schedule(jobs, transform_artifact=None)
+
+
+def test_every_fold_runs_within_the_slots(tmp_path, monkeypatch):
+    recorder = FoldRecorder()
+    artifacts = schedule(tmp_path, monkeypatch, recorder)
+    assert list(artifacts) == [0, 1, 2, 3, 4]
+    assert [artifact.name for artifact in artifacts.values()] == [
+        f"member-{fold}" for fold in range(5)
+    ]
+    assert recorder.peak == 3
+
+
+def test_memory_budget_admits_fewer_folds(tmp_path, monkeypatch):
+    recorder = FoldRecorder()
+    artifacts = schedule(tmp_path, monkeypatch, recorder, budget=int(2.5 * GIB))
+    assert len(artifacts) == 5
+    assert recorder.peak == 2
+
+    # A fold larger than the budget still runs, one at a time
+    recorder = FoldRecorder()
+    schedule(tmp_path, monkeypatch, recorder, budget=GIB // 2)
+    assert recorder.peak == 1
+
+
+def test_folds_spread_over_devices(tmp_path, monkeypatch):
+    monkeypatch.setattr(oof.torch.cuda, "is_available", lambda: True)
+    monkeypatch.setattr(oof.torch.cuda, "device_count", lambda: 2)
+    recorder = FoldRecorder()
+    schedule(tmp_path, monkeypatch, recorder, fold_workers=None)
+
+    assert recorder.peak == 2
+    assert set(recorder.devices.values()) == {"0", "1"}
+    assert recorder.devices[0] != recorder.devices[1]
+
+
+def test_failed_fold_stops_the_run(tmp_path, monkeypatch):
+    recorder = FoldRecorder(failing=1)
+    with pytest.raises(RuntimeError, match="fold 1"):
+        schedule(tmp_path, monkeypatch, recorder, fold_workers=1)
+    # Folds queued behind the failure never start
+    assert sorted(recorder.devices) == [0, 1]
+
+
+def test_fold_settings(tmp_path):
+    assert estimate_job_memory(make_config(tmp_path)) == GIB
+    (tmp_path / "model.safetensors").write_bytes(b"0" * 1000)
+    assert estimate_job_memory(make_config(tmp_path, fold_memory_gb=None)) == 4000
+
+    with pytest.raises(ConfigurationError):
+        OutOfFoldTrainingComponent(make_config(tmp_path, n_folds=1))
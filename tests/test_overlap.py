@@ -0,0 +1,79 @@
+from src.jigsaw.components.inference import ModelInferenceComponent
+from src.jigsaw.components.inference.overlap import iter_prefetched
+from src.jigsaw.core import ModelInferenceConfig
+from benchmarks.synthetic import make_comments
+import numpy as np
+import threading
+import pytest
+import time
+
+
+def slow_items(n: int, seconds: float, produced: list[int]):
+    for idx in range(n):
+        time.sleep(seconds)
+        produced.append(idx)
+        yield idx
+
+
+def test_items_arrive_in_order():
+    assert list(iter_prefetched(iter(range(100)), depth=3)) == list(range(100))
+    assert list(iter_prefetched(iter([]))) == []
+
+
+def test_producer_overlaps_the_consumer():
+    start = time.perf_counter()
+    for _ in iter_prefetched(slow_items(8, 0.05, []), depth=2):
+        time.sleep(0.05)
+    # Run back to back, the two sides would take 0.8s
+    assert time.perf_counter() - start < 0.65
+
+
+def test_producer_stays_within_depth():
+    produced = []
+    items = iter_prefetched(slow_items(20, 0.0, produced), depth=2)
+    next(items)
+    time.sleep(0.3)
+    # Queued items plus the one waiting for a free slot
+    assert len(produced) <= 1 + 2 + 1
+    items.close()
+
+
+def test_failures_reach_the_consumer():
+    def failing():
+        yield 1
+        raise KeyError("bad batch")
+
+    with pytest.raises(KeyError):
+        list(iter_prefetched(failing()))
+
+
+def test_stopping_early_stops_the_producer():
+    produced = []
+    for idx in iter_prefetched(slow_items(1000, 0.001, produced), depth=2):
+        if idx == 3:
+            break
+    assert not any(t.name == "prefetch-batches" for t in threading.enumerate())
+    assert len(produced) < 1000
+
+
+def test_overlapped_scores_match(tmp_path, checkpoint):
+    data = make_comments(30, "mixed", seed=0)
+    scores = {}
+    for overlap in (False, True):
+        component = ModelInferenceComponent(
+            ModelInferenceConfig(
+                name=f"overlap-{overlap}",
+                type="text-classification",
+                outdir=tmp_path / "out",
+                model_path=str(checkpoint),
+                train_path=str(checkpoint),
+                batch_size=4,
+                max_length=64,
+                bucketing=True,
+                overlap=overlap,
+                overlap_window=8,
+                prefetch_batches=2,
+            )
+        )
+        scores[overlap] = component.predict(data)
+    np.testing.assert_allclose(scores[True], scores[False], atol=1e-6)
@@ -0,0 +1,114 @@
+from src.jigsaw.components.dataset.packing import (
+    IGNORE_INDEX,
+    PackedCompletionCollator,
+    encode_completions,
+    pack_examples,
+)
+from src.jigsaw.components.train import CompletionDataset
+from types import SimpleNamespace
+import pandas as pd
+import numpy as np
+import pytest
+import torch
+
+TEMPLATE = (
+    "{% for message in messages %}<|{{ message['role'] }}|> "
+    "{{ message['content'] }} [SEP] {% endfor %}<|assistant|> "
+)
+BODIES = [
+    "check out my channel",
+    "the mod removed this post because it breaks the rule about spam links",
+    "you should talk to someone qualified about this",
+    "free crypto giveaway click here",
+    "ok",
+]
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "rule": ["no spam", "no legal advice"] * 2 + ["no spam"],
+            "body": BODIES,
+            "rule_violation": [1, 0, 0, 1, 0],
+        }
+    )
+
+
+@pytest.fixture
+def config():
+    return SimpleNamespace(max_length=256, pack_length=512, seed=0)
+
+
+def encode(tokenizer):
+    return encode_completions(tokenizer, BODIES, [" Yes", " No", " No", " Yes", " No"])
+
+
+def test_pack_examples_keeps_every_token(causal_lm):
+    _, tokenizer = causal_lm
+    input_ids, labels, offsets = encode(tokenizer)
+    table = pack_examples(input_ids, labels, offsets, max_length=24, seed=1)
+
+    packs = table["input_ids"].to_pylist()
+    assert all(len(pack) <= 24 for pack in packs)
+    assert sum(map(len, packs)) == len(input_ids)
+    assert sorted(sum(packs, [])) == sorted(input_ids.tolist())
+
+    # Every example starts at position 0 and keeps its answer label
+    positions = np.concatenate(table["position_ids"].to_pylist())
+    assert (positions == 0).sum() == len(BODIES)
+    assert (np.concatenate(table["labels"].to_pylist()) != IGNORE_INDEX).sum() == (
+        labels != IGNORE_INDEX
+    ).sum()
+
+
+def test_pack_examples_truncates_from_the_left(causal_lm):
+    _, tokenizer = causal_lm
+    input_ids, labels, offsets = encode(tokenizer)
+    table = pack_examples(input_ids, labels, offsets, max_length=4)
+    longest = int(np.diff(offsets).argmax())
+    tail = input_ids[offsets[longest + 1] - 4 : offsets[longest + 1]].tolist()
+    # Cut to exactly the pack length, the example fills a pack alone
+    assert tail in table["input_ids"].to_pylist()
+
+
+@pytest.mark.parametrize("attn_implementation", ["eager", "sdpa"])
+@torch.inference_mode()
+def test_packed_logits_match_separate_examples(causal_lm, attn_implementation):
+    model, tokenizer = causal_lm
+    model.config._attn_implementation = attn_implementation
+    input_ids, labels, offsets = encode(tokenizer)
+    table = pack_examples(input_ids, labels, offsets, max_length=48)
+    features = table.to_pylist()
+    batch = PackedCompletionCollator(tokenizer.pad_token_id)(features)
+    logits = model(**{k: v for k, v in batch.items() if k != "labels"}).logits
+    assert not torch.isnan(logits).any()
+
+    for row, feature in enumerate(features):
+        starts = [i for i, p in enumerate(feature["position_ids"]) if p == 0]
+        for start, stop in zip(starts, starts[1:] + [len(feature["input_ids"])]):
+            alone = model(torch.tensor([feature["input_ids"][start:stop]])).logits
+            torch.testing.assert_close(
+                logits[row, start:stop], alone[0], atol=1e-4, rtol=1e-4
+            )
+
+
+@pytest.mark.parametrize("pack", [False, True])
+def test_completion_dataset(causal_lm, config, data, pack):
+    model, tokenizer = causal_lm
+    tokenizer.chat_template = TEMPLATE
+    dataset = CompletionDataset(config, data, tokenizer, rows=[0, 1, 3, 4], pack=pack)
+    assert dataset.labels == [1, 0, 1, 0]
+
+    items = [dataset[idx] for idx in range(len(dataset))]
+    assert [len(item["input_ids"]) for item in items] == dataset.lengths.tolist()
+    assert all(len(item["input_ids"]) <= (512 if pack else 256) for item in items)
+    # Only the answer tokens carry loss, one per example
+    answers = sum(int((item["labels"] != IGNORE_INDEX).sum()) for item in items)
+    assert answers == 4
+    if pack:
+        assert len(dataset) < 4
+
+    batch = PackedCompletionCollator(tokenizer.pad_token_id)(items)
+    loss = model(**batch).loss
+    assert torch.isfinite(loss)
@@ -0,0 +1,60 @@
+from src.jigsaw.components.inference import ModelInferenceComponent
+from src.jigsaw.components.inference.parallel import parallel_score, shard_batches
+from src.jigsaw.core import ModelInferenceConfig
+from benchmarks.synthetic import make_comments
+import numpy as np
+import pytest
+import torch
+
+
+def test_shards_balance_batch_costs():
+    batches = [np.array([idx]) for idx in range(7)]
+    costs = np.array([9, 1, 8, 2, 7, 3, 6])
+    shards = shard_batches(batches, costs, n_workers=3)
+
+    assert sorted(int(batch[0]) for shard in shards for batch in shard) == list(
+        range(7)
+    )
+    loads = [sum(costs[batch[0]] for batch in shard) for shard in shards]
+    assert max(loads) - min(loads) <= 2
+    # More workers than batches leaves no empty shard
+    assert len(shard_batches(batches[:2], costs[:2], n_workers=4)) == 2
+
+
+def test_forked_workers_score_every_row():
+    weights = torch.linspace(-1, 1, 40)
+    batches = [np.arange(start, min(start + 6, 40)) for start in range(0, 40, 6)]
+    latencies = []
+    scores = parallel_score(
+        lambda batch: weights[batch].sigmoid().numpy(),
+        batches,
+        costs=np.array([len(batch) for batch in batches]),
+        n_rows=40,
+        n_workers=3,
+        n_threads=1,
+        latencies=latencies,
+    )
+    np.testing.assert_allclose(scores, weights.sigmoid().numpy(), rtol=1e-6)
+    assert len(latencies) == len(batches)
+
+
+@pytest.mark.parametrize("bucketing", [False, True])
+def test_workers_match_a_single_process(tmp_path, checkpoint, bucketing):
+    data = make_comments(24, "mixed", seed=0)
+    scores = {}
+    for n_workers in (1, 2):
+        component = ModelInferenceComponent(
+            ModelInferenceConfig(
+                name=f"workers-{n_workers}",
+                type="text-classification",
+                outdir=tmp_path / "out",
+                model_path=str(checkpoint),
+                train_path=str(checkpoint),
+                batch_size=4,
+                max_length=64,
+                bucketing=bucketing,
+                n_workers=n_workers,
+            )
+        )
+        scores[n_workers] = component.predict(data)
+    np.testing.assert_allclose(scores[2], scores[1], atol=1e-6)
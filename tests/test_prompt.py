@@ -0,0 +1,56 @@
+from src.jigsaw.constants.prompt import render_prompts, zero_shot_chat_prompt
+from transformers import AutoTokenizer
+import pandas as pd
+import pytest
+
+TEMPLATES = {
+    "plain": (
+        "{% for message in messages %}<|{{ message['role'] }}|>"
+        "{{ message['content'] }}\n{% endfor %}<|assistant|>"
+    ),
+    # Rewrites the content, so the placeholders no longer match
+    "upper": (
+        "{% for message in messages %}<|{{ message['role'] }}|>"
+        "{{ message['content'] | upper }}\n{% endfor %}<|assistant|>"
+    ),
+    # Drops the system turn, the rule placeholder never appears
+    "no-system": (
+        "{% for message in messages %}{% if message['role'] != 'system' %}"
+        "<|{{ message['role'] }}|>{{ message['content'] }}\n{% endif %}"
+        "{% endfor %}<|assistant|>"
+    ),
+    # Renders the turns in reverse, the body comes before the rule
+    "reversed": (
+        "{% for message in messages | reverse %}<|{{ message['role'] }}|>"
+        "{{ message['content'] }}\n{% endfor %}<|assistant|>"
+    ),
+}
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "rule": ["No Advertising ", "No legal advice"],
+            "body": [" check out my channel", "you should talk to a lawyer\n"],
+        }
+    )
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_render_prompts_matches_rows(checkpoint, data, template):
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    tokenizer.chat_template = TEMPLATES[template]
+
+    prompts = render_prompts(data, tokenizer)
+    expected = [zero_shot_chat_prompt(row, tokenizer) for _, row in data.iterrows()]
+    assert prompts.tolist() == expected
+
+
+def test_render_prompts_empty(checkpoint, data):
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    for template in ("plain", "upper"):
+        tokenizer.chat_template = TEMPLATES[template]
+        prompts = render_prompts(data.iloc[:0], tokenizer)
+        assert isinstance(prompts, pd.Series)
+        assert prompts.tolist() == []
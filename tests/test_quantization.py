@@ -0,0 +1,25 @@
+from src.jigsaw.components.inference.quantization import (
+    QUANTIZED_MODEL_NAMES,
+    load_quantized_model,
+)
+import shutil
+import pytest
+import torch
+
+
+@pytest.fixture
+def train_path(checkpoint, tmp_path):
+    return shutil.copytree(checkpoint, tmp_path / "model")
+
+
+@torch.inference_mode()
+def test_cache_holds_weights_only(train_path):
+    model = load_quantized_model(train_path)
+    cache_path = train_path / QUANTIZED_MODEL_NAMES["dynamic-int8"]
+    state_dict = torch.load(cache_path, weights_only=True)
+    assert state_dict.keys() == model.state_dict().keys()
+
+    cached = load_quantized_model(train_path)
+    assert isinstance(cached.classifier, torch.ao.nn.quantized.dynamic.Linear)
+    input_ids = torch.randint(5, 50, (2, 12))
+    torch.testing.assert_close(cached(input_ids).logits, model(input_ids).logits)
@@ -0,0 +1,103 @@
+from src.jigsaw.components.inference.executor import run_members
+from src.jigsaw.components.inference.registry import ModelRegistry, estimate_size
+from src.jigsaw.core import ModelInferenceConfig
+import pytest
+
+NAMES = ["a", "b", "c"]
+
+
+@pytest.fixture
+def configs(tmp_path, checkpoint):
+    return {
+        name: ModelInferenceConfig(
+            name=name,
+            type="text-classification",
+            outdir=tmp_path / "out",
+            model_path=str(checkpoint),
+            train_path=str(checkpoint),
+            max_length=64,
+        )
+        for name in NAMES
+    }
+
+
+def registry(configs, n_models: float | None) -> ModelRegistry:
+    size = estimate_size(configs["a"])
+    return ModelRegistry(
+        configs, budget_bytes=None if n_models is None else int(n_models * size)
+    )
+
+
+def test_lookups_load_lazily(configs):
+    models = registry(configs, None)
+    assert "a" in models and len(models) == 3
+    assert not models.resident
+
+    assert models["a"] is models["a"]
+    assert models.stats["loads"] == 1
+    assert models.stats["hits"] == 1
+
+
+def test_budget_evicts_least_recently_used(configs):
+    models = registry(configs, 2.5)
+    models["a"], models["b"]
+    models["a"]
+    models["c"]
+
+    # b was used least recently, a and c fit the budget together
+    assert list(models.resident) == ["a", "c"]
+    assert models.stats["evictions"] == 1
+    assert models.resident_bytes <= models.budget_bytes
+    assert models.order(NAMES) == ["c", "a", "b"]
+
+
+def test_oversized_model_still_loads(configs):
+    models = registry(configs, 0.5)
+    for name in NAMES:
+        models[name]
+        assert list(models.resident) == [name]
+    assert models.stats["evictions"] == 2
+
+
+def test_prefetched_model_is_picked_up(configs):
+    models = registry(configs, 2.5)
+    models["a"]
+    models.prefetch("b")
+    models.prefetch("b")
+    assert list(models.pending) == ["b"]
+
+    models["b"]
+    assert not models.pending
+    assert models.stats["prefetched"] == 1
+    assert models.stats["loads"] == 2
+    assert models.overlap_efficiency() >= 0.0
+
+
+def test_prefetch_never_evicts_the_model_in_use(configs):
+    models = registry(configs, 1.5)
+    models["a"]
+    models.prefetch("b")
+    assert not models.pending
+    assert list(models.resident) == ["a"]
+
+    # A resident model is not loaded again
+    models.prefetch("a")
+    assert not models.pending
+
+
+def test_sequential_members_prefetch_the_next_one(configs):
+    models = registry(configs, None)
+    prefetched = []
+
+    def prefetch(model_name: str):
+        prefetched.append(model_name)
+        models.prefetch(model_name)
+
+    run_members(
+        lambda component, data: component.config.name,
+        models,
+        data=None,
+        prefetch=prefetch,
+    )
+    assert prefetched == ["b", "c"]
+    assert models.stats["prefetched"] == 2
@@ -0,0 +1,141 @@
+from src.jigsaw.pipelines.serving import InferenceServer, MicroBatcher
+import pandas as pd
+import threading
+import asyncio
+import pytest
+import json
+import time
+
+ROW = {"rule": "no spam", "body": "buy now"}
+
+
+class Predictor:
+    """Scores the length of each body, recording the batches it was given"""
+
+    def __init__(self, delay: float = 0.0, gate: threading.Event | None = None):
+        self.delay = delay
+        self.gate = gate
+        self.batch_sizes = []
+
+    def __call__(self, data: pd.DataFrame) -> pd.DataFrame:
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.batch_sizes.append(len(data))
+        return pd.DataFrame({"prediction": data["body"].str.len().astype(float)})
+
+
+async def with_server(predictor, test, **params):
+    batcher = MicroBatcher(predictor, **params)
+    await batcher.start()
+    try:
+        return await test(InferenceServer(batcher))
+    finally:
+        await batcher.stop()
+
+
+def post(row) -> bytes:
+    return json.dumps(row).encode()
+
+
+def test_batches_coalesce():
+    # The first request holds the worker, the rest queue up behind it
+    predictor = Predictor(delay=0.05)
+
+    async def test(server):
+        rows = [{**ROW, "body": "x" * idx} for idx in range(1, 10)]
+        return await asyncio.gather(
+            *(server.route("POST", "/predict", post(row)) for row in rows)
+        )
+
+    responses = asyncio.run(
+        with_server(predictor, test, max_batch_size=4, max_wait_ms=20)
+    )
+    assert [status for status, _ in responses] == [200] * 9
+    # Every request gets its own row back
+    assert [payload["prediction"] for _, payload in responses] == list(range(1, 10))
+    assert sum(predictor.batch_sizes) == 9
+    assert max(predictor.batch_sizes) == 4
+    assert len(predictor.batch_sizes) < 9
+
+
+def test_full_queue_sheds_load():
+    gate = threading.Event()
+
+    async def test(server):
+        tasks = []
+        for _ in range(4):
+            tasks.append(
+                asyncio.create_task(server.route("POST", "/predict", post(ROW)))
+            )
+            # Lets the worker take the first request off the queue
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.05)
+        gate.set()
+        return await asyncio.gather(*tasks), server.batcher.stats["shed"]
+
+    responses, shed = asyncio.run(
+        with_server(Predictor(gate=gate), test, max_batch_size=1, max_queue_size=1)
+    )
+    statuses = sorted(status for status, _ in responses)
+    # One in flight, one queued, the others turned away
+    assert statuses == [200, 200, 503, 503]
+    assert shed == 2
+
+
+def test_deadline_expires():
+    async def test(server):
+        return await server.route(
+            "POST", "/predict", post({**ROW, "timeout_ms": 20})
+        ), server.batcher.stats["expired"]
+
+    (status, payload), expired = asyncio.run(with_server(Predictor(delay=0.2), test))
+    assert status == 504
+    assert expired == 1
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"not json",
+        b"[1, 2]",
+        b'"body"',
+        post({"rule": "no spam"}),
+        post({**ROW, "body": 3}),
+        post({**ROW, "timeout_ms": "fast"}),
+        post({**ROW, "timeout_ms": -5}),
+        post({**ROW, "timeout_ms": True}),
+    ],
+)
+def test_malformed_body(body):
+    async def test(server):
+        return await server.route("POST", "/predict", body)
+
+    status, payload = asyncio.run(with_server(Predictor(), test))
+    assert status == 400
+    assert payload["error"].startswith("Invalid request")
+
+
+def test_malformed_body_over_http():
+    async def request(port: int, body: bytes) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            b"POST /predict HTTP/1.1\r\nConnection: close\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    async def test(server):
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await request(port, b"[1, 2]"), await request(port, post(ROW))
+
+    bad, good = asyncio.run(with_server(Predictor(), test))
+    assert bad.startswith(b"HTTP/1.1 400")
+    assert good.startswith(b"HTTP/1.1 200")
+    assert json.loads(good.split(b"\r\n\r\n", 1)[1]) == {"prediction": 7.0}
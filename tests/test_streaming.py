@@ -0,0 +1,88 @@
+from benchmarks.synthetic import make_comments
+from src.jigsaw.components.inference.streaming import part_path
+from src.jigsaw.config import ConfigurationManager
+from src.jigsaw.core import (
+    ClassificationMetric,
+    Directory,
+    ModelTrainingArtifact,
+    MultiModelTrainingArtifact,
+)
+from src.jigsaw.errors import ConfigurationError
+from src.jigsaw.pipelines.inference import PredictorPipeline
+import pandas as pd
+import pytest
+import yaml
+
+
+def build_pipeline(tmp_path, checkpoint, max_length: int = 64) -> PredictorPipeline:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        yaml.safe_dump(
+            {
+                "artifact-root": str(tmp_path / "artifact"),
+                "seed": 2345,
+                "max-length": max_length,
+                "models": {
+                    "member": {"type": "text-classification", "model": str(checkpoint)}
+                },
+            }
+        )
+    )
+    training_artifact = MultiModelTrainingArtifact(
+        outdir=Directory(path=tmp_path / "models"),
+        models={
+            "member": ModelTrainingArtifact(
+                name="member",
+                model_path=str(checkpoint),
+                metrics=ClassificationMetric(roc_auc=0.0, accuracy=0.0),
+            )
+        },
+    )
+    return PredictorPipeline(ConfigurationManager(str(config_path)), training_artifact)
+
+
+@pytest.fixture
+def input_path(tmp_path):
+    path = tmp_path / "test.csv"
+    make_comments(20, "short", seed=0).to_csv(path, index=False)
+    return path
+
+
+def read_parts(outdir: Directory, n_chunks: int) -> pd.DataFrame:
+    return pd.concat(
+        [pd.read_parquet(part_path(outdir, index)) for index in range(n_chunks)],
+        ignore_index=True,
+    )
+
+
+def test_resume_rescores_only_missing_parts(tmp_path, checkpoint, input_path):
+    pipeline = build_pipeline(tmp_path, checkpoint)
+    outdir = Directory(path=tmp_path / "stream")
+    artifact = pipeline.stream(input_path, outdir, chunksize=6)
+    assert (artifact.n_rows, artifact.n_chunks, artifact.resumed_chunks) == (20, 4, 0)
+    expected = read_parts(outdir, 4)
+
+    part_path(outdir, 2).unlink()
+    scored = []
+    predict = pipeline.predict
+
+    def spy(chunk: pd.DataFrame) -> pd.DataFrame:
+        scored.append(chunk["row_id"].tolist())
+        return predict(chunk)
+
+    pipeline.predict = spy
+    artifact = pipeline.stream(input_path, outdir, chunksize=6)
+
+    assert artifact.resumed_chunks == 3
+    assert scored == [expected["row_id"].tolist()[12:18]]
+    pd.testing.assert_frame_equal(read_parts(outdir, 4), expected)
+
+
+def test_changed_members_refuse_to_resume(tmp_path, checkpoint, input_path):
+    outdir = Directory(path=tmp_path / "stream")
+    build_pipeline(tmp_path, checkpoint).stream(input_path, outdir, chunksize=6)
+
+    # Same members and input, scored with other settings
+    pipeline = build_pipeline(tmp_path, checkpoint, max_length=32)
+    with pytest.raises(ConfigurationError):
+        pipeline.stream(input_path, outdir, chunksize=6)
@@ -0,0 +1,61 @@
+from src.jigsaw.components.dataset.sampler import LengthGroupedBatchSampler
+from src.jigsaw.components.dataset.token_store import TokenStore
+from benchmarks.synthetic import make_comments
+from transformers import AutoTokenizer
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def tokenizer(checkpoint):
+    return AutoTokenizer.from_pretrained(checkpoint)
+
+
+@pytest.fixture
+def prompts():
+    return make_comments(50, "mixed", seed=0)["body"].tolist()
+
+
+@pytest.mark.parametrize("max_length", [None, 24])
+def test_store_round_trips_the_tokenizer(tmp_path, tokenizer, prompts, max_length):
+    store = TokenStore.build(tokenizer, prompts, tmp_path, max_length, chunk_size=7)
+    expected = tokenizer(
+        prompts, truncation=max_length is not None, max_length=max_length
+    )
+
+    assert len(store) == len(prompts)
+    assert store.lengths.tolist() == list(map(len, expected["input_ids"]))
+    for idx in (0, 13, 49):
+        item = store[idx]
+        assert item.keys() == set(store.fields)
+        for field, values in item.items():
+            assert values.tolist() == expected[field][idx]
+
+
+def test_store_is_reused_and_keyed(tmp_path, tokenizer, prompts):
+    store = TokenStore.build(tokenizer, prompts, tmp_path)
+    assert TokenStore.build(tokenizer, prompts, tmp_path).path == store.path
+    assert TokenStore.build(tokenizer, prompts, tmp_path, 16).path != store.path
+    assert TokenStore.build(tokenizer, prompts[1:], tmp_path).path != store.path
+    # Only complete stores are left behind
+    assert not list(tmp_path.glob("*.tmp-*"))
+
+    empty = TokenStore.build(tokenizer, [], tmp_path)
+    assert len(empty) == 0
+
+
+def test_sampler_groups_store_lengths(tmp_path, tokenizer, prompts):
+    lengths = TokenStore.build(tokenizer, prompts, tmp_path).lengths
+    sampler = LengthGroupedBatchSampler(lengths, batch_size=4, mega_batch_mult=5)
+
+    batches = sampler.batches(epoch=0)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(prompts)))
+    assert lengths[batches[0]].max() == lengths.max()
+    random_waste, grouped_waste = sampler.padding_waste(epoch=0)
+    assert grouped_waste < random_waste
+
+    # Reshuffled every epoch, reproducibly
+    first = [batch.tolist() for batch in sampler.batches(epoch=1)]
+    again = LengthGroupedBatchSampler(lengths, batch_size=4, mega_batch_mult=5)
+    assert [batch.tolist() for batch in again.batches(epoch=1)] == first
+    assert first != [batch.tolist() for batch in batches]
@@ -0,0 +1,70 @@
+from src.jigsaw.components.inference.tokenization import TokenizedPrompts
+from benchmarks.synthetic import make_comments
+from transformers import AutoTokenizer
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def tokenizer(checkpoint):
+    return AutoTokenizer.from_pretrained(checkpoint)
+
+
+@pytest.fixture
+def prompts():
+    return make_comments(11, "mixed", seed=0)["body"].tolist()
+
+
+def rows(tokens: TokenizedPrompts) -> list[list[int]]:
+    return [
+        tokens.input_ids[start:stop].tolist()
+        for start, stop in zip(tokens.offsets[:-1], tokens.offsets[1:])
+    ]
+
+
+@pytest.mark.parametrize("max_length", [None, 16])
+def test_offsets_index_every_prompt(tokenizer, prompts, max_length):
+    # Small chunks, so rows span several tokenizer calls
+    tokens = TokenizedPrompts.encode(tokenizer, prompts, max_length, chunk_size=4)
+    expected = tokenizer(
+        prompts, truncation=max_length is not None, max_length=max_length
+    )["input_ids"]
+
+    assert len(tokens) == len(prompts)
+    assert tokens.input_ids.dtype == np.int32
+    assert tokens.lengths.tolist() == list(map(len, expected))
+    assert rows(tokens) == expected
+
+
+def test_empty_prompts(tokenizer):
+    tokens = TokenizedPrompts.encode(tokenizer, [])
+    assert len(tokens) == 0
+    assert tokens.offsets.tolist() == [0]
+    assert tokens.collate(np.array([], dtype=int), 0)["input_ids"].shape == (0, 0)
+
+
+@pytest.mark.parametrize("padding_side", ["right", "left"])
+def test_collate_matches_tokenizer_padding(tokenizer, prompts, padding_side):
+    tokens = TokenizedPrompts.encode(tokenizer, prompts)
+    indices = np.array([7, 2, 9, 0])
+    batch = tokens.collate(indices, tokenizer.pad_token_id, padding_side)
+
+    tokenizer.padding_side = padding_side
+    expected = tokenizer(
+        [prompts[idx] for idx in indices], padding=True, return_tensors="pt"
+    )
+    assert (batch["input_ids"] == expected["input_ids"]).all()
+    assert (batch["attention_mask"] == expected["attention_mask"]).all()
+
+
+def test_append_and_drop_prefix(tokenizer, prompts):
+    tokens = TokenizedPrompts.encode(tokenizer, prompts)
+    suffix = np.array([5, 6, 7])
+    assert rows(tokens.append(suffix)) == [row + [5, 6, 7] for row in rows(tokens)]
+
+    n_prefix = tokens.common_prefix(tokens.input_ids[:1])
+    assert n_prefix == 1
+    assert rows(tokens.drop_prefix(n_prefix)) == [row[1:] for row in rows(tokens)]
+    assert rows(tokens.drop_prefix(1, max_length=4)) == [
+        row[1:][-4:] for row in rows(tokens)
+    ]